@@ -1,10 +1,19 @@
-from flask import Flask, jsonify
+from flask import Flask, Request, jsonify
 from flask_cors import CORS
+from auth import cache_stats, calibrate_bcrypt
+from catalog import catalog_cache
+from collection_cache import collection_cache
+from compression import init_compression
 from config import get_config
-from database import connect_db, close_db, create_indexes
+from json_provider import MongoJSONProvider
+from metrics import init_metrics
+from database import connect_db, close_db, create_indexes, pool_stats
 from routes.auth import auth_bp
 from routes.cards import cards_bp
 from routes.binders import binders_bp
+from routes.sync import sync_bp
+from routes.uploads import uploads_bp
+from uploads import request_limit
 import logging
 import os
 
@@ -14,17 +23,46 @@ logger = logging.getLogger(__name__)
 
 config = get_config()
 
+
+class CardVaultRequest(Request):
+    """Request that caps image upload bodies at UPLOAD_MAX_BYTES
+
+    Werkzeug answers 413 from the Content-Length (or once a chunked body
+    passes the limit) before the multipart form is spooled. Other routes
+    keep MAX_CONTENT_LENGTH, which is unset so bulk imports can stream.
+    """
+
+    @property
+    def max_content_length(self):
+        if self.blueprint == 'uploads':
+            return request_limit()
+        return super().max_content_length
+
+
 # Create Flask app
 app = Flask(__name__)
+app.request_class = CardVaultRequest
 app.config.from_object(config)
+app.json = MongoJSONProvider(app)
 
 # Enable CORS
 CORS(app, origins=config.CORS_ORIGINS)
 
+# Compress large responses
+init_compression(app, config)
+
+# Request timing and /api/metrics
+init_metrics(app, config)
+
+# Time one bcrypt hash now rather than on the first login (see auth.wait_timeout)
+calibrate_bcrypt()
+
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(cards_bp)
 app.register_blueprint(binders_bp)
+app.register_blueprint(sync_bp)
+app.register_blueprint(uploads_bp)
 
 
 @app.before_request
@@ -42,7 +80,14 @@ def teardown_db(exception):
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'message': 'Card Vault API is running'}), 200
+    return jsonify({
+        'status': 'ok',
+        'message': 'Card Vault API is running',
+        'auth_cache': cache_stats(),
+        'collection_cache': collection_cache.stats(),
+        'catalog_cache': catalog_cache.stats(),
+        'db_pool': pool_stats()
+    }), 200
 
 
 @app.route('/', methods=['GET'])
@@ -55,7 +100,10 @@ def index():
             'auth': '/api/auth',
             'cards': '/api/cards',
             'binders': '/api/binders',
-            'health': '/api/health'
+            'sync': '/api/sync',
+            'upload': '/api/upload',
+            'health': '/api/health',
+            'metrics': '/api/metrics'
         }
     }), 200
 
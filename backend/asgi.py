@@ -0,0 +1,628 @@
+"""
+Async (ASGI) entry point for the Card Vault API.
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+Auth, card and binder endpoints run here as coroutines on an async MongoDB
+driver (pymongo's AsyncMongoClient where available, Motor otherwise), so a
+request waiting on Mongo no longer holds a worker thread. Handlers drive
+the same data_access generators as the Flask routes; only request parsing
+and response plumbing differ. Every other endpoint (bulk import, batch
+updates, search, stats, health) falls through to the Flask app, which is
+mounted underneath and runs in a thread pool.
+"""
+
+from a2wsgi import WSGIMiddleware
+from bson.objectid import ObjectId
+from contextlib import asynccontextmanager
+from functools import wraps
+from starlette.applications import Starlette
+from starlette.convertors import Convertor, register_url_convertor
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+from app import app as flask_app
+from auth import (
+    PasswordHasherBusy, authenticate, create_token, hash_password_async,
+    password_needs_rehash, rehash_password_later, verify_password_async
+)
+from binder_slots import SlotPatchError, present
+from collection_cache import use_memory_backend
+from config import get_config
+from database import client_options
+from json_provider import encode
+from metrics import IN_FLIGHT, REQUEST_DURATION, REQUESTS, finish_request, start_request
+from mongo_ops import run_async
+from pagination import PaginationError
+from streaming import NDJSON_MIMETYPE
+import asyncio
+import catalog
+import data_access
+import logging
+import time
+import versioning
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # pymongo < 4.9 has no async client
+    from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+# The Redis cache backend makes blocking calls, which would stall the event loop
+use_memory_backend()
+
+client = None
+db = None
+
+
+class ObjectIdConvertor(Convertor):
+    """Path segment that only matches a 24-character hex ObjectId
+
+    Anything else (e.g. /api/cards/search) is left to the Flask app, which
+    also answers malformed IDs with its usual 400.
+    """
+    regex = '[0-9a-fA-F]{24}'
+
+    def convert(self, value: str) -> ObjectId:
+        return ObjectId(value)
+
+    def to_string(self, value) -> str:
+        return str(value)
+
+
+register_url_convertor('objectid', ObjectIdConvertor())
+
+
+def connect_db():
+    """Create this worker's async client; it connects lazily on the first operation"""
+    global client, db
+    client = AsyncMongoClient(config.MONGODB_URI, **client_options())
+    db = client[config.DATABASE_NAME]
+    return db
+
+
+async def close_db():
+    """Close the async client"""
+    if client is not None:
+        closed = client.close()
+        # AsyncMongoClient.close() is a coroutine; Motor's is not
+        if asyncio.iscoroutine(closed):
+            await closed
+
+
+@asynccontextmanager
+async def lifespan(app):
+    connect_db()
+    logger.info(f"Async MongoDB client ready: {config.DATABASE_NAME}")
+    yield
+    await close_db()
+
+
+def json_response(data, status_code: int = 200, headers=None) -> Response:
+    return Response(encode(data), status_code=status_code, headers=headers, media_type='application/json')
+
+
+def error_response(message: str, status_code: int, headers=None) -> Response:
+    return json_response({'error': message}, status_code, headers)
+
+
+async def get_json(request):
+    """Parse the request body as JSON, or return None when it is not valid JSON"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def wants_ndjson(request) -> bool:
+    """Check whether the client asked for a streamed NDJSON listing"""
+    if request.query_params.get('stream') in ('1', 'true'):
+        return True
+    accept = parse_accept_header(request.headers.get('Accept'), MIMEAccept)
+    return accept.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(cursor, transform=None, prepare=None) -> StreamingResponse:
+    """Stream every document of an async cursor as newline-delimited JSON
+
+    prepare, when given, is awaited with each batch of documents before
+    transform is applied to them (see streaming.ndjson_response).
+    """
+    cursor = cursor.batch_size(config.STREAM_BATCH_SIZE)
+
+    async def encode_batch(docs):
+        if prepare:
+            await prepare(docs)
+        return b''.join(encode(transform(doc) if transform else doc) + b'\n' for doc in docs)
+
+    async def generate():
+        try:
+            docs = []
+            async for doc in cursor:
+                docs.append(doc)
+                if len(docs) >= config.STREAM_BATCH_SIZE:
+                    yield await encode_batch(docs)
+                    docs = []
+            if docs:
+                yield await encode_batch(docs)
+        except Exception as e:
+            # Headers are already sent, so all we can do is cut the stream short
+            logger.error(f"NDJSON stream error: {str(e)}")
+        finally:
+            await cursor.close()
+
+    return StreamingResponse(generate(), media_type=NDJSON_MIMETYPE)
+
+
+async def request_etag(request, user_id, kind: str) -> str:
+    """Async counterpart of versioning.request_etag"""
+    return versioning.make_etag(
+        kind,
+        await run_async(versioning.current_ops(user_id, kind), db),
+        request.url.query,
+        request.headers.get('Accept', ''),
+        request.headers.get('Accept-Encoding', ''),
+    )
+
+
+def not_modified(request, etag: str) -> bool:
+    return parse_etags(request.headers.get('If-None-Match')).contains(etag)
+
+
+def tag_response(response: Response, etag: str) -> Response:
+    """Attach the ETag and make clients revalidate before reusing the body"""
+    response.headers['ETag'] = quote_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def token_required(handler):
+    """Decorator to protect handlers that require authentication"""
+    @wraps(handler)
+    async def decorated_handler(request):
+        user_id, error = authenticate(request.headers.get('Authorization'))
+        if error:
+            return error_response(error, 401)
+
+        request.state.user_id = user_id
+        return await handler(request)
+
+    return decorated_handler
+
+
+def instrumented(blueprint: str, handler):
+    """Record request metrics for a handler under the same labels as its Flask route
+
+    The mounted Flask app records its own requests. Under Motor, driver
+    calls run on a thread pool without this context, so their commands are
+    counted but not attributed to the endpoint.
+    """
+    endpoint = f'{blueprint}.{handler.__name__}'
+
+    @wraps(handler)
+    async def instrumented_handler(request):
+        labels = {'blueprint': blueprint, 'endpoint': endpoint, 'method': request.method}
+        IN_FLIGHT.labels(blueprint=blueprint).inc()
+        token = start_request(endpoint)
+        start = time.perf_counter()
+        try:
+            response = await handler(request)
+        finally:
+            finish_request(token)
+            IN_FLIGHT.labels(blueprint=blueprint).dec()
+        REQUEST_DURATION.labels(**labels).observe(time.perf_counter() - start)
+        REQUESTS.labels(status=response.status_code, **labels).inc()
+        return response
+
+    return instrumented_handler
+
+
+def _busy_response() -> Response:
+    """Shed a signup/login while the bcrypt queue is full"""
+    return error_response('Server is busy, please try again', 503, {'Retry-After': '1'})
+
+
+# Auth
+
+async def signup(request):
+    """Create a new user account"""
+    try:
+        data = await get_json(request)
+
+        # Validate input
+        if not data.get('username') or not data.get('password'):
+            return error_response('Username and password are required', 400)
+
+        if len(data['password']) < 6:
+            return error_response('Password must be at least 6 characters', 400)
+
+        # Check if user already exists
+        if await run_async(data_access.find_user(data['username']), db):
+            return error_response('Username already exists', 409)
+
+        # Hash password and create user
+        hashed_password = await hash_password_async(data['password'])
+        user_id = await run_async(data_access.create_user(data['username'], hashed_password), db)
+
+        logger.info(f"New user created: {data['username']}")
+
+        return json_response({
+            'token': create_token(user_id),
+            'user': {
+                'id': user_id,
+                'username': data['username']
+            }
+        }, 201)
+
+    except PasswordHasherBusy:
+        return _busy_response()
+    except Exception as e:
+        logger.error(f"Signup error: {str(e)}")
+        return error_response('Signup failed', 500)
+
+
+async def login(request):
+    """Log in an existing user"""
+    try:
+        data = await get_json(request)
+
+        # Validate input
+        if not data.get('username') or not data.get('password'):
+            return error_response('Username and password are required', 400)
+
+        user = await run_async(data_access.find_user(data['username']), db)
+
+        if not user or not await verify_password_async(data['password'], user['password']):
+            return error_response('Invalid username or password', 401)
+
+        # Upgrade hashes made at a different cost; the write is handed back to the event loop
+        if password_needs_rehash(user['password']):
+            loop = asyncio.get_running_loop()
+            rehash_password_later(
+                data['password'],
+                lambda new_hash: asyncio.run_coroutine_threadsafe(
+                    run_async(data_access.store_rehash(user, new_hash), db), loop
+                )
+            )
+
+        logger.info(f"User logged in: {data['username']}")
+
+        return json_response({
+            'token': create_token(str(user['_id'])),
+            'user': {
+                'id': user['_id'],
+                'username': user['username']
+            }
+        })
+
+    except PasswordHasherBusy:
+        return _busy_response()
+    except Exception as e:
+        logger.error(f"Login error: {str(e)}")
+        return error_response('Login failed', 500)
+
+
+@token_required
+async def get_current_user(request):
+    """Get current authenticated user info"""
+    try:
+        user = await run_async(data_access.get_public_user(request.state.user_id), db)
+        if not user:
+            return error_response('User not found', 404)
+
+        return json_response({'user': user})
+
+    except Exception as e:
+        logger.error(f"Get current user error: {str(e)}")
+        return error_response('Failed to get user info', 500)
+
+
+# Cards
+
+@token_required
+async def get_cards(request):
+    """Get cards for the current user (same query parameters as the Flask route)"""
+    try:
+        user_id = request.state.user_id
+
+        try:
+            limit, projection, card_query = data_access.parse_card_list_args(request.query_params, user_id)
+        except PaginationError as e:
+            return error_response(str(e), 400)
+
+        # Unchanged collections are answered from the change counter alone
+        etag = await request_etag(request, user_id, versioning.CARDS)
+        if not_modified(request, etag):
+            return tag_response(Response(status_code=304), etag)
+
+        if wants_ndjson(request):
+            # Streamed pages have no trailing next_cursor
+            requested = set(projection) if projection else None
+            projection, extra_fields = data_access.card_list_projection(card_query, projection)
+            cursor = db.cards.find(card_query.filter, projection).sort(card_query.sort).hint(card_query.hint)
+            if limit:
+                cursor = cursor.limit(limit)
+            return tag_response(ndjson_response(
+                cursor, transform=lambda card: data_access.strip_list_fields(card, extra_fields),
+                prepare=lambda cards: run_async(catalog.attach_ops(cards, requested), db)
+            ), etag)
+
+        cards, next_cursor = await run_async(data_access.list_cards(user_id, card_query, projection, limit), db)
+
+        return tag_response(json_response({'cards': cards, 'next_cursor': next_cursor}), etag)
+
+    except Exception as e:
+        logger.error(f"Get cards error: {str(e)}")
+        return error_response('Failed to fetch cards', 500)
+
+
+@token_required
+async def get_card(request):
+    """Get a specific card by ID"""
+    try:
+        card = await run_async(data_access.get_card(request.state.user_id, request.path_params['card_id']), db)
+
+        if not card:
+            return error_response('Card not found', 404)
+
+        return json_response(card)
+
+    except Exception as e:
+        logger.error(f"Get card error: {str(e)}")
+        return error_response('Failed to fetch card', 500)
+
+
+@token_required
+async def create_card(request):
+    """Create a new card"""
+    try:
+        user_id = request.state.user_id
+        data = await get_json(request)
+
+        card_doc, error = data_access.build_card_doc(data, user_id)
+        if error:
+            return error_response(error, 400)
+
+        card_doc = await run_async(data_access.insert_card(user_id, card_doc), db)
+
+        logger.info(f"Card created: {data.get('name')} by user {user_id}")
+
+        return json_response(card_doc, 201)
+
+    except Exception as e:
+        logger.error(f"Create card error: {str(e)}")
+        return error_response('Failed to create card', 500)
+
+
+@token_required
+async def update_card(request):
+    """Update a card"""
+    try:
+        user_id = request.state.user_id
+        card_oid = request.path_params['card_id']
+        data = await get_json(request)
+
+        try:
+            updated_card = await run_async(data_access.update_card(user_id, card_oid, data), db)
+        except data_access.CardError as e:
+            return error_response(str(e), 400)
+        if not updated_card:
+            return error_response('Card not found or unauthorized', 404)
+
+        logger.info(f"Card updated: {card_oid} by user {user_id}")
+
+        return json_response(updated_card)
+
+    except Exception as e:
+        logger.error(f"Update card error: {str(e)}")
+        return error_response('Failed to update card', 500)
+
+
+@token_required
+async def delete_card(request):
+    """Delete a card"""
+    try:
+        user_id = request.state.user_id
+        card_oid = request.path_params['card_id']
+
+        if not await run_async(data_access.delete_card(user_id, card_oid), db):
+            return error_response('Card not found or unauthorized', 404)
+
+        logger.info(f"Card deleted: {card_oid} by user {user_id}")
+
+        return json_response({'message': 'Card deleted successfully'})
+
+    except Exception as e:
+        logger.error(f"Delete card error: {str(e)}")
+        return error_response('Failed to delete card', 500)
+
+
+# Binders
+
+def wants_sparse(request) -> bool:
+    """Check whether the client asked for binders as sparse cells (?format=sparse)"""
+    return request.query_params.get('format') == 'sparse'
+
+
+@token_required
+async def get_binders(request):
+    """Get all binders for the current user"""
+    try:
+        user_id = request.state.user_id
+        sparse = wants_sparse(request)
+
+        etag = await request_etag(request, user_id, versioning.BINDERS)
+        if not_modified(request, etag):
+            return tag_response(Response(status_code=304), etag)
+
+        if wants_ndjson(request):
+            cursor = db.binders.find({'user_id': user_id}).sort(data_access.BINDER_ORDER)
+            return tag_response(ndjson_response(cursor, transform=lambda binder: present(binder, sparse)), etag)
+
+        binders = await run_async(data_access.list_binders(user_id, sparse), db)
+
+        return tag_response(json_response({'binders': binders}), etag)
+
+    except Exception as e:
+        logger.error(f"Get binders error: {str(e)}")
+        return error_response('Failed to fetch binders', 500)
+
+
+@token_required
+async def get_binder(request):
+    """Get a specific binder by ID (expand=cards inlines card summaries into the slots)"""
+    try:
+        binder = await run_async(data_access.get_binder(
+            request.state.user_id, request.path_params['binder_id'],
+            expand=request.query_params.get('expand') == 'cards',
+            sparse=wants_sparse(request)
+        ), db)
+
+        if not binder:
+            return error_response('Binder not found', 404)
+
+        return json_response(binder)
+
+    except Exception as e:
+        logger.error(f"Get binder error: {str(e)}")
+        return error_response('Failed to fetch binder', 500)
+
+
+@token_required
+async def create_binder(request):
+    """Create a new binder"""
+    try:
+        user_id = request.state.user_id
+        data = await get_json(request)
+
+        binder_doc, error = data_access.build_binder_doc(data, user_id)
+        if error:
+            return error_response(error, 400)
+
+        binder_doc = await run_async(data_access.insert_binder(user_id, binder_doc, wants_sparse(request)), db)
+
+        logger.info(f"Binder created: {data.get('name')} by user {user_id}")
+
+        return json_response(binder_doc, 201)
+
+    except Exception as e:
+        logger.error(f"Create binder error: {str(e)}")
+        return error_response('Failed to create binder', 500)
+
+
+@token_required
+async def update_binder(request):
+    """Update a binder"""
+    try:
+        user_id = request.state.user_id
+        binder_oid = request.path_params['binder_id']
+        data = await get_json(request)
+
+        try:
+            updated_binder = await run_async(
+                data_access.update_binder(user_id, binder_oid, data, wants_sparse(request)), db
+            )
+        except data_access.BinderError as e:
+            return error_response(str(e), 400)
+        if not updated_binder:
+            return error_response('Binder not found or unauthorized', 404)
+
+        logger.info(f"Binder updated: {binder_oid} by user {user_id}")
+
+        return json_response(updated_binder)
+
+    except Exception as e:
+        logger.error(f"Update binder error: {str(e)}")
+        return error_response('Failed to update binder', 500)
+
+
+@token_required
+async def patch_binder_slots(request):
+    """Apply place/clear/move/swap operations to individual binder slots"""
+    try:
+        user_id = request.state.user_id
+        binder_oid = request.path_params['binder_id']
+        data = await get_json(request)
+
+        if not isinstance(data, dict) or not isinstance(data.get('version'), int):
+            return error_response('version is required', 400)
+
+        try:
+            patched = await run_async(
+                data_access.patch_binder_slots(user_id, binder_oid, data['version'], data.get('operations')), db
+            )
+        except SlotPatchError as e:
+            return error_response(str(e), 400)
+        except data_access.VersionConflict as e:
+            body = {'error': str(e)}
+            if e.version is not None:
+                body['version'] = e.version
+            return json_response(body, 409)
+        if not patched:
+            return error_response('Binder not found or unauthorized', 404)
+        version, cells = patched
+
+        logger.info(f"Binder slots patched: {binder_oid} by user {user_id}")
+
+        return json_response({
+            '_id': binder_oid,
+            'version': version,
+            'cells': cells
+        })
+
+    except Exception as e:
+        logger.error(f"Patch binder slots error: {str(e)}")
+        return error_response('Failed to update binder slots', 500)
+
+
+@token_required
+async def delete_binder(request):
+    """Delete a binder"""
+    try:
+        user_id = request.state.user_id
+        binder_oid = request.path_params['binder_id']
+
+        if not await run_async(data_access.delete_binder(user_id, binder_oid), db):
+            return error_response('Binder not found or unauthorized', 404)
+
+        logger.info(f"Binder deleted: {binder_oid} by user {user_id}")
+
+        return json_response({'message': 'Binder deleted successfully'})
+
+    except Exception as e:
+        logger.error(f"Delete binder error: {str(e)}")
+        return error_response('Failed to delete binder', 500)
+
+
+routes = [
+    Route('/api/auth/signup', instrumented('auth', signup), methods=['POST']),
+    Route('/api/auth/login', instrumented('auth', login), methods=['POST']),
+    Route('/api/auth/me', instrumented('auth', get_current_user), methods=['GET']),
+    Route('/api/cards', instrumented('cards', get_cards), methods=['GET']),
+    Route('/api/cards', instrumented('cards', create_card), methods=['POST']),
+    Route('/api/cards/{card_id:objectid}', instrumented('cards', get_card), methods=['GET']),
+    Route('/api/cards/{card_id:objectid}', instrumented('cards', update_card), methods=['PUT']),
+    Route('/api/cards/{card_id:objectid}', instrumented('cards', delete_card), methods=['DELETE']),
+    Route('/api/binders', instrumented('binders', get_binders), methods=['GET']),
+    Route('/api/binders', instrumented('binders', create_binder), methods=['POST']),
+    Route('/api/binders/{binder_id:objectid}', instrumented('binders', get_binder), methods=['GET']),
+    Route('/api/binders/{binder_id:objectid}', instrumented('binders', update_binder), methods=['PUT']),
+    Route('/api/binders/{binder_id:objectid}', instrumented('binders', delete_binder), methods=['DELETE']),
+    Route('/api/binders/{binder_id:objectid}/slots', instrumented('binders', patch_binder_slots), methods=['PATCH']),
+    # Everything else is served by the sync Flask app
+    Mount('/', app=WSGIMiddleware(flask_app)),
+]
+
+middleware = [Middleware(CORSMiddleware, allow_origins=config.CORS_ORIGINS, allow_methods=['*'], allow_headers=['*'])]
+if config.COMPRESSION_ENABLED:
+    # Responses from the Flask app arrive already encoded and are passed through
+    middleware.append(Middleware(GZipMiddleware, minimum_size=config.COMPRESSION_MIN_SIZE, compresslevel=config.COMPRESSION_LEVEL))
+
+app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
@@ -1,23 +1,164 @@
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
+import hashlib
 import jwt
+import logging
+import threading
+import time
+from cache import LRUCache
 from config import get_config
 from functools import wraps
 from flask import request, jsonify
 from bson.objectid import ObjectId
 
+logger = logging.getLogger(__name__)
 config = get_config()
 
+# Decoded JWT payloads keyed by token digest, so repeat requests skip jwt.decode
+token_cache = LRUCache(config.TOKEN_CACHE_SIZE, config.TOKEN_CACHE_TTL)
 
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt(rounds=12)
+# Public user records served by /api/auth/me
+user_cache = LRUCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+
+
+# bcrypt runs on its own small pool so a login burst cannot occupy every
+# request thread; bcrypt releases the GIL, so threads are enough. This only
+# frees anything under threaded (gthread) or ASGI workers: a sync worker
+# still blocks while its one request waits, and gets only the cap on
+# concurrent hashes and the wait timeout
+_bcrypt_executor = ThreadPoolExecutor(max_workers=config.BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+_bcrypt_slots = threading.BoundedSemaphore(config.BCRYPT_WORKERS + config.BCRYPT_QUEUE_LIMIT)
+
+# Seconds one hash at BCRYPT_ROUNDS takes on this machine, measured once per process
+_hash_seconds = None
+_calibration_lock = threading.Lock()
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the bcrypt queue is full and the request should be shed"""
+    pass
+
+
+def _submit_bcrypt(fn, *args):
+    """Queue bcrypt work on the dedicated executor, failing fast when it is saturated"""
+    if not _bcrypt_slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = _bcrypt_executor.submit(fn, *args)
+    except Exception:
+        _bcrypt_slots.release()
+        raise
+    future.add_done_callback(lambda _: _bcrypt_slots.release())
+    return future
+
+
+def _hashpw(password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 
+def _checkpw(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def calibrate_bcrypt() -> float:
+    """Time one hash at BCRYPT_ROUNDS, once per process, and return its duration in seconds"""
+    global _hash_seconds
+    with _calibration_lock:
+        if _hash_seconds is None:
+            start = time.perf_counter()
+            _hashpw('calibration', config.BCRYPT_ROUNDS)
+            _hash_seconds = time.perf_counter() - start
+            if config.BCRYPT_WAIT_TIMEOUT < 2 * _hash_seconds:
+                logger.warning(
+                    f"BCRYPT_WAIT_TIMEOUT={config.BCRYPT_WAIT_TIMEOUT}s is under two hashes at "
+                    f"BCRYPT_ROUNDS={config.BCRYPT_ROUNDS} ({_hash_seconds:.2f}s each here); "
+                    f"waiting {2 * _hash_seconds:.2f}s instead"
+                )
+    return _hash_seconds
+
+
+def wait_timeout() -> float:
+    """How long a request waits for its hash: BCRYPT_WAIT_TIMEOUT, but never under two hashes
+
+    A hash slower than the timeout would otherwise shed every login and
+    signup (and seed_demo_data) however idle the executor is.
+    """
+    return max(config.BCRYPT_WAIT_TIMEOUT, 2 * calibrate_bcrypt())
+
+
+def _wait(future):
+    """Return a bcrypt result, shedding the request if it is not ready within wait_timeout()
+
+    Under threaded or ASGI workers this bounds how long a request holds
+    its thread; a sync worker is blocked for the whole wait either way.
+    """
+    try:
+        return future.result(timeout=wait_timeout())
+    except FutureTimeoutError:
+        # Drops the job if it is still queued; a running hash finishes and frees its slot
+        future.cancel()
+        raise PasswordHasherBusy()
+
+
+async def _wait_async(future):
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), wait_timeout())
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusy()
+
+
+def hash_password(password: str) -> str:
+    """Hash password using bcrypt at the configured cost"""
+    return _wait(_submit_bcrypt(_hashpw, password, config.BCRYPT_ROUNDS))
+
+
 def verify_password(password: str, hashed_password: str) -> bool:
     """Verify password against hashed password"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return _wait(_submit_bcrypt(_checkpw, password, hashed_password))
+
+
+async def hash_password_async(password: str) -> str:
+    """Coroutine form of hash_password that leaves the event loop free while bcrypt runs"""
+    return await _wait_async(_submit_bcrypt(_hashpw, password, config.BCRYPT_ROUNDS))
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """Coroutine form of verify_password"""
+    return await _wait_async(_submit_bcrypt(_checkpw, password, hashed_password))
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash was made with a different cost than configured"""
+    try:
+        # Hashes look like $2b$12$<salt+digest>
+        return int(hashed_password.split('$')[2]) != config.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+def rehash_password_later(password: str, on_hashed) -> bool:
+    """Rehash password at the configured cost without blocking the request
+
+    on_hashed(new_hash) runs on the bcrypt executor once the hash is ready.
+    Returns False when the executor is busy; the rehash is then simply
+    retried on a later login.
+    """
+    try:
+        future = _submit_bcrypt(_hashpw, password, config.BCRYPT_ROUNDS)
+    except PasswordHasherBusy:
+        return False
+    
+    def store(done):
+        try:
+            on_hashed(done.result())
+        except Exception as e:
+            logger.error(f"Password rehash error: {str(e)}")
+    
+    future.add_done_callback(store)
+    return True
 
 
 def create_token(user_id: str) -> str:
@@ -32,38 +173,63 @@ def create_token(user_id: str) -> str:
 
 def verify_token(token: str) -> dict:
     """Verify JWT token and return payload"""
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+    
     try:
         payload = jwt.decode(token, config.JWT_SECRET_KEY, algorithms=['HS256'])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    # Never keep a payload past its own expiry
+    token_cache.set(key, payload, ttl=payload.get('exp', 0) - time.time())
+    return payload
+
+
+def cache_stats() -> dict:
+    """Return hit/miss counters for the token and user caches"""
+    return {'tokens': token_cache.stats(), 'users': user_cache.stats()}
+
+
+def authenticate(auth_header):
+    """Resolve an Authorization header to a user ID
+
+    Returns (user_id, None), or (None, error_message) when the request
+    must be rejected with a 401.
+    """
+    token = None
+    
+    # Get token from Authorization header
+    if auth_header is not None:
+        try:
+            token = auth_header.split(' ')[1]
+        except IndexError:
+            return None, 'Invalid token format'
+    
+    if not token:
+        return None, 'Token is missing'
+    
+    payload = verify_token(token)
+    if payload is None:
+        return None, 'Invalid or expired token'
+    
+    return payload['user_id'], None
 
 
 def token_required(f):
     """Decorator to protect routes that require authentication"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = None
-        
-        # Get token from Authorization header
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(' ')[1]
-            except IndexError:
-                return jsonify({'error': 'Invalid token format'}), 401
-        
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        payload = verify_token(token)
-        if payload is None:
-            return jsonify({'error': 'Invalid or expired token'}), 401
+        user_id, error = authenticate(request.headers.get('Authorization'))
+        if error:
+            return jsonify({'error': error}), 401
         
         # Store user_id in request context
-        request.user_id = payload['user_id']
+        request.user_id = user_id
         return f(*args, **kwargs)
     
     return decorated_function
@@ -0,0 +1,117 @@
+"""
+Micro-benchmark: encoding a large card listing as a JSON response.
+
+Compares the old path (str() on _id/user_id per document, then Flask's
+stdlib encoder) with MongoJSONProvider on its stdlib fallback and on orjson.
+By default the apps run as in ProductionConfig (DEBUG off, compact output);
+--debug measures the DevelopmentConfig default instead, where every path
+pretty-prints with a two-space indent.
+
+Usage: python benchmarks/bench_json.py [--cards 10000] [--repeat 20] [--debug]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from json_provider import MongoJSONProvider
+
+
+def make_cards(count):
+    """Build card documents shaped like what pymongo returns for GET /api/cards"""
+    user_id = str(ObjectId())
+    now = datetime.utcnow().isoformat()
+    return [
+        {
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'name': f'Card {i}',
+            'set': f'Set {i % 40}',
+            'card_number': f'{i % 102}/102',
+            'image_url': f'https://images.example.com/cards/{i}.png',
+            'is_graded': i % 3 == 0,
+            'grading': {'company': 'PSA', 'grade': 9, 'cert_number': f'PSA-{i:08d}'} if i % 3 == 0 else {},
+            'condition': 'Near Mint',
+            'purchase_price': 10 + i % 250,
+            'estimated_value': 15.5 + i % 400,
+            'quantity': 1 + i % 3,
+            'notes': 'Pulled from a booster pack, centered, light whitening on the back edges',
+            'tags': ['Investment', 'PC'] if i % 2 else ['For Trade'],
+            'created_at': now,
+            'updated_at': now,
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_response(app, cards):
+    """What handlers did before: convert ids in a loop, then jsonify with the stdlib"""
+    for card in cards:
+        card['_id'] = str(card['_id'])
+        card['user_id'] = str(card['user_id'])
+    return app.json.response({'cards': cards}).get_data()
+
+
+def provider_response(app, cards):
+    return app.json.response({'cards': cards}).get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--debug', action='store_true', help='measure with DEBUG on (indented output)')
+    args = parser.parse_args()
+    
+    legacy_app = Flask('legacy')
+    legacy_app.json = DefaultJSONProvider(legacy_app)
+    fast_app = Flask('fast')
+    fast_app.json = MongoJSONProvider(fast_app)
+    legacy_app.debug = fast_app.debug = args.debug
+    
+    orjson = json_provider.orjson
+    
+    def stdlib_fallback(cards):
+        json_provider.orjson = None
+        try:
+            return provider_response(fast_app, cards)
+        finally:
+            json_provider.orjson = orjson
+    
+    cases = [
+        ('legacy str() loop + stdlib', lambda cards: legacy_response(legacy_app, cards)),
+        ('MongoJSONProvider (stdlib)', stdlib_fallback),
+    ]
+    if orjson is not None:
+        cases.append(('MongoJSONProvider (orjson)', lambda cards: provider_response(fast_app, cards)))
+    else:
+        print('orjson is not installed; skipping the orjson case')
+    
+    mode = 'DEBUG on, indented' if args.debug else 'DEBUG off, compact'
+    print(f'{args.cards} cards, best of {args.repeat} runs ({mode})')
+    baseline = None
+    for label, encode in cases:
+        # Each run gets fresh documents since the legacy path mutates them
+        timings = []
+        size = 0
+        for _ in range(args.repeat):
+            cards = make_cards(args.cards)
+            start = timeit.default_timer()
+            size = len(encode(cards))
+            timings.append(timeit.default_timer() - start)
+        best = min(timings)
+        baseline = baseline or best
+        print(f'  {label:<30} {best * 1000:8.1f} ms  {size / 1024:8.0f} KiB  {baseline / best:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Load comparison: the sync (Flask/gunicorn) and async (ASGI/uvicorn) apps.
+
+Start both against the same MongoDB, with the same number of worker
+processes, then point this script at them:
+
+    gunicorn -w 4 -b 127.0.0.1:5000 app:app
+    uvicorn asgi:app --workers 4 --port 5001
+    python benchmarks/compare_modes.py --sync http://127.0.0.1:5000 --async http://127.0.0.1:5001
+
+Each target gets its own benchmark user, seeded with --cards cards through
+/api/cards/bulk and a few binders. --clients keep-alive connections then
+loop over a read-heavy mix (card pages, single cards, binders, /me and
+card updates) for --duration seconds. Throughput, error counts and latency
+percentiles are printed per mode, or as JSON with --json. Raising --clients
+past the sync worker count is where the two modes separate; a remote
+database (higher round-trip time) widens the gap further.
+
+Only the standard library is needed; the targets need nothing beyond
+requirements.txt and requirements-asgi.txt.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+# (operation, weight)
+MIX = [
+    ('list_cards', 40),
+    ('get_card', 25),
+    ('list_binders', 15),
+    ('me', 10),
+    ('update_card', 10),
+]
+
+
+class Client:
+    """One keep-alive HTTP connection to a target"""
+
+    def __init__(self, base_url, token=None, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.token = token
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """Send a request and return (status, parsed JSON body or None)"""
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # The server may close idle keep-alive connections; reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+def make_card(i):
+    return {
+        'name': f'Bench Card {i}',
+        'set': f'Set {i % 25}',
+        'card_number': i,
+        'condition': ['Raw', 'Near Mint', 'Lightly Played'][i % 3],
+        'purchase_price': 5 + i % 90,
+        'estimated_value': 7.5 + i % 140,
+        'quantity': 1 + i % 3,
+        'tags': ['bench'],
+    }
+
+
+def setup(base_url, cards, binders):
+    """Create and seed a benchmark user, returning (token, card_ids)"""
+    client = Client(base_url)
+    username = f'bench-{uuid.uuid4().hex[:12]}'
+    status, body = client.request('POST', '/api/auth/signup', {'username': username, 'password': 'bench-password'})
+    if status != 201:
+        raise RuntimeError(f'{base_url}: signup failed with {status}: {body}')
+    client.token = body['token']
+
+    for start in range(0, cards, 1000):
+        batch = [make_card(i) for i in range(start, min(start + 1000, cards))]
+        status, body = client.request('POST', '/api/cards/bulk', batch)
+        if status != 201:
+            raise RuntimeError(f'{base_url}: bulk import failed with {status}: {body}')
+
+    card_ids = []
+    cursor = None
+    while True:
+        path = '/api/cards?fields=name&limit=500' + (f'&after={cursor}' if cursor else '')
+        status, body = client.request('GET', path)
+        card_ids.extend(card['_id'] for card in body['cards'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    for i in range(binders):
+        client.request('POST', '/api/binders', {'name': f'Bench Binder {i}', 'rows': 3, 'columns': 3})
+
+    return client.token, card_ids
+
+
+def operation_path(operation, rng, card_ids):
+    """Return (method, path, body) for one operation of the mix"""
+    if operation == 'list_cards':
+        sort = rng.choice(['', '&sort=value&order=desc', '&sort=name'])
+        return 'GET', f'/api/cards?limit=50{sort}', None
+    if operation == 'get_card':
+        return 'GET', f'/api/cards/{rng.choice(card_ids)}', None
+    if operation == 'list_binders':
+        return 'GET', '/api/binders', None
+    if operation == 'me':
+        return 'GET', '/api/auth/me', None
+    return 'PUT', f'/api/cards/{rng.choice(card_ids)}', {'estimated_value': round(rng.uniform(1, 500), 2)}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+    }
+
+
+def load(base_url, token, card_ids, clients, duration, seed):
+    """Run the mix from `clients` threads for `duration` seconds"""
+    operations = [operation for operation, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    latencies = {operation: [] for operation in operations}
+    errors = {operation: 0 for operation in operations}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        client = Client(base_url, token)
+        local = {operation: [] for operation in operations}
+        failed = {operation: 0 for operation in operations}
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            method, path, body = operation_path(operation, rng, card_ids)
+            start = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+            except (http.client.HTTPException, OSError):
+                status = None
+            elapsed = time.perf_counter() - start
+            if status == 200:
+                local[operation].append(elapsed)
+            else:
+                failed[operation] += 1
+        with lock:
+            for operation in operations:
+                latencies[operation].extend(local[operation])
+                errors[operation] += failed[operation]
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    everything = [value for values in latencies.values() for value in values]
+    result = summarize(everything)
+    result['errors'] = sum(errors.values())
+    result['throughput_rps'] = round(len(everything) / elapsed, 1)
+    result['operations'] = {
+        operation: dict(summarize(latencies[operation]), errors=errors[operation]) for operation in operations
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync', dest='sync_url', help='base URL of the Flask app (gunicorn)')
+    parser.add_argument('--async', dest='async_url', help='base URL of the ASGI app (uvicorn)')
+    parser.add_argument('--clients', type=int, default=64, help='concurrent keep-alive connections')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load per mode')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of unrecorded load first')
+    parser.add_argument('--cards', type=int, default=2000, help='cards seeded for each benchmark user')
+    parser.add_argument('--binders', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    targets = [(mode, url) for mode, url in (('sync', args.sync_url), ('async', args.async_url)) if url]
+    if not targets:
+        parser.error('pass --sync and/or --async')
+
+    results = {}
+    for mode, url in targets:
+        token, card_ids = setup(url, args.cards, args.binders)
+        if args.warmup:
+            load(url, token, card_ids, args.clients, args.warmup, args.seed)
+        results[mode] = load(url, token, card_ids, args.clients, args.duration, args.seed)
+        results[mode]['url'] = url
+
+    if args.json:
+        json.dump({'clients': args.clients, 'duration': args.duration, 'results': results}, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f'{args.clients} clients, {args.duration:g}s per mode, {args.cards} cards per user')
+    print(f"  {'mode':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode, result in results.items():
+        print(
+            f"  {mode:<6} {result['throughput_rps']:>9.1f} {result['p50_ms'] or 0:>9.2f} "
+            f"{result['p95_ms'] or 0:>9.2f} {result['p99_ms'] or 0:>9.2f} {result['errors']:>7}"
+        )
+    if len(results) == 2 and results['sync']['throughput_rps']:
+        ratio = results['async']['throughput_rps'] / results['sync']['throughput_rps']
+        print(f'  async/sync throughput: {ratio:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,578 @@
+"""
+Load test: every API endpoint against synthetic tenants, with per-endpoint
+throughput and latency percentiles as JSON that can be diffed between runs.
+
+Tenants are written straight into the database (no HTTP round trips, one
+bcrypt hash for all of them): --users accounts, each with --cards-per-user
+cards and --binders-per-user binders whose grids range from 3x3 up to
+--max-binder-size squared and are about half filled with the tenant's cards.
+Then each endpoint is driven in turn by --clients threads for --requests
+requests (after --warmup unrecorded ones), picking a random tenant per
+request. Creates run before the matching deletes, so deletes consume what
+the run created; everything the run wrote (see cleanup) is removed at the
+end unless --keep is given.
+
+The requests go through the Flask test client in-process, or to a running
+server with --url (Flask or asgi.py). The database is whatever MONGODB_URI
+points at, or an in-memory mongomock with --mongomock. With --url, the
+server must use the same MONGODB_URI and JWT_SECRET_KEY as this script,
+since tokens are minted locally.
+
+    python benchmarks/load_test.py --mongomock --users 20 --cards-per-user 200
+    python benchmarks/load_test.py --users 1000 --cards-per-user 5000 --output run.json
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --clients 32 --output after.json --compare run.json
+
+Full-text search and stats are skipped on mongomock, which lacks $text and
+$convert.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId
+
+import database
+from auth import create_token, hash_password
+from binder_slots import cell_key
+from catalog import catalog_cache, link_ops
+from data_access import build_binder_doc, build_card_doc
+from compare_modes import Client, summarize
+from mongo_ops import run
+
+SETS = ['Base Set', 'Jungle', 'Fossil', 'Team Rocket', 'Gym Heroes', 'Neo Genesis',
+        'Neo Discovery', 'Expedition', 'Aquapolis', 'Skyridge', 'Ruby & Sapphire', 'Sandstorm']
+NAMES = ['Charizard', 'Blastoise', 'Venusaur', 'Pikachu', 'Mewtwo', 'Gengar', 'Alakazam',
+         'Machamp', 'Dragonite', 'Gyarados', 'Snorlax', 'Lugia', 'Ho-Oh', 'Typhlosion', 'Umbreon']
+CONDITIONS = ['Raw', 'Mint', 'Near Mint', 'Lightly Played', 'Moderately Played']
+TAGS = ['PC', 'For Trade', 'For Sale', 'Investment', 'Vintage', 'Holo']
+PASSWORD = 'load-test-password'
+
+INSERT_BATCH = 1000
+
+
+def make_card(rng, i):
+    """A card payload as a client would POST it"""
+    graded = rng.random() < 0.2
+    card = {
+        'name': f'{rng.choice(NAMES)} {i}',
+        'set': rng.choice(SETS),
+        'card_number': f'{rng.randint(1, 150)}/150',
+        'image_url': f'https://images.example.com/cards/{i}.png',
+        'is_graded': graded,
+        'condition': rng.choice(CONDITIONS),
+        'purchase_price': round(rng.uniform(0.5, 400), 2),
+        'estimated_value': round(rng.uniform(0.5, 900), 2),
+        'quantity': rng.randint(1, 4),
+        'notes': rng.choice(['', 'Pulled from a booster pack', 'Trade binder copy', 'Light whitening on the back']),
+        'tags': rng.sample(TAGS, rng.randint(0, 3)),
+    }
+    if graded:
+        card['grading'] = {'company': rng.choice(['PSA', 'BGS', 'CGC']), 'grade': rng.randint(6, 10)}
+    return card
+
+
+class Tenant:
+    """A seeded user with their card and binder IDs"""
+
+    def __init__(self, user_id, username):
+        self.user_id = user_id
+        self.username = username
+        self.token = create_token(user_id)
+        self.card_ids = []
+        self.binders = []
+
+
+def seed(db, run_id, users, cards_per_user, binders_per_user, max_binder_size, seed_value):
+    """Write the synthetic tenants and return them"""
+    rng = random.Random(seed_value)
+    password = hash_password(PASSWORD)
+    now = datetime.utcnow()
+
+    user_docs = [
+        {'_id': ObjectId(), 'username': f'loadtest-{run_id}-{i}', 'password': password,
+         'is_demo': False, 'created_at': now}
+        for i in range(users)
+    ]
+    db.users.insert_many(user_docs, ordered=False)
+    tenants = [Tenant(str(doc['_id']), doc['username']) for doc in user_docs]
+
+    pending = []
+
+    def flush(collection):
+        if pending:
+            if collection == 'cards':
+                run(link_ops(pending), db)
+            db[collection].insert_many(pending, ordered=False)
+            pending.clear()
+
+    for tenant in tenants:
+        for i in range(cards_per_user):
+            card_doc, _ = build_card_doc(make_card(rng, i), tenant.user_id)
+            card_doc['_id'] = ObjectId()
+            tenant.card_ids.append(str(card_doc['_id']))
+            pending.append(card_doc)
+            if len(pending) >= INSERT_BATCH:
+                flush('cards')
+    flush('cards')
+
+    for tenant in tenants:
+        for i in range(binders_per_user):
+            size = rng.randint(3, max(3, max_binder_size))
+            binder_doc, _ = build_binder_doc({'name': f'Binder {i}', 'rows': size, 'columns': size}, tenant.user_id)
+            binder_doc['_id'] = ObjectId()
+            if tenant.card_ids:
+                for row in range(size):
+                    for column in range(size):
+                        if rng.random() < 0.5:
+                            binder_doc['cells'][cell_key(row, column)] = rng.choice(tenant.card_ids)
+            tenant.binders.append({'id': str(binder_doc['_id']), 'size': size, 'version': 0})
+            pending.append(binder_doc)
+            if len(pending) >= INSERT_BATCH:
+                flush('binders')
+    flush('binders')
+    return tenants
+
+
+def cleanup(db, run_id, tenants, since):
+    """Remove everything the run created
+
+    That is the tenants' cards, binders, summaries, change counters and
+    deletion tombstones, the accounts made by seeding and signups, and the
+    catalog entries created since `since` that no card points at any more.
+    The run makes no uploads. Entries another client creates during the run
+    are removed as well if they are still unused, so run against a
+    database of your own.
+    """
+    user_ids = [tenant.user_id for tenant in tenants]
+    db.cards.delete_many({'user_id': {'$in': user_ids}})
+    db.binders.delete_many({'user_id': {'$in': user_ids}})
+    db.tombstones.delete_many({'user_id': {'$in': user_ids}})
+    db.card_stats.delete_many({'_id': {'$in': user_ids}})
+    db.collection_versions.delete_many({'_id': {'$in': user_ids}})
+    db.users.delete_many({'username': {'$regex': f'^loadtest-{run_id}-'}})
+
+    new_entries = [entry['_id'] for entry in db.catalog.find({'created_at': {'$gte': since}}, {'_id': 1})]
+    in_use = set(db.cards.distinct('catalog_id', {'catalog_id': {'$in': new_entries}}))
+    unused = [entry_id for entry_id in new_entries if entry_id not in in_use]
+    if unused:
+        db.catalog.delete_many({'_id': {'$in': unused}})
+        catalog_cache.clear()
+
+
+class FlaskClientTransport:
+    """Requests through the Flask test client, one per thread"""
+
+    def __init__(self, app, token=None):
+        self.client = app.test_client()
+        self.token = token
+
+    def request(self, method, path, body=None):
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code, response.get_json(silent=True)
+
+
+class Scenario:
+    """Shared state for one run: tenants plus what creates left for deletes"""
+
+    def __init__(self, run_id, tenants):
+        self.run_id = run_id
+        self.tenants = [tenant for tenant in tenants if tenant.card_ids]
+        self.created_cards = deque()
+        self.created_binders = deque()
+        # Binders are checked out by one thread at a time, so each PATCH knows the current version
+        self.binders = deque(
+            (tenant, binder) for tenant in self.tenants for binder in tenant.binders
+        )
+        self.signups = 0
+        self.lock = threading.Lock()
+
+    def next_signup(self):
+        with self.lock:
+            self.signups += 1
+            return f'loadtest-{self.run_id}-signup-{self.signups}'
+
+
+# Each endpoint: (name, share of --requests, build) where build(rng, scenario)
+# returns (tenant or None, method, path, body, on_success or None)
+
+def _tenant(rng, scenario):
+    return rng.choice(scenario.tenants)
+
+
+def _get(path):
+    def build(rng, scenario):
+        return _tenant(rng, scenario), 'GET', path, None, None
+    return build
+
+
+def _health(rng, scenario):
+    return None, 'GET', '/api/health', None, None
+
+
+def _signup(rng, scenario):
+    body = {'username': scenario.next_signup(), 'password': PASSWORD}
+    return None, 'POST', '/api/auth/signup', body, None
+
+
+def _login(rng, scenario):
+    tenant = _tenant(rng, scenario)
+    return None, 'POST', '/api/auth/login', {'username': tenant.username, 'password': PASSWORD}, None
+
+
+def _list_cards(rng, scenario):
+    sort = rng.choice(['', '&sort=value&order=desc', '&sort=name', '&sort=created_at&order=asc'])
+    return _tenant(rng, scenario), 'GET', f'/api/cards?limit=50{sort}', None, None
+
+
+def _filter_cards(rng, scenario):
+    filters = rng.choice([
+        f'set={rng.choice(SETS)}',
+        f'condition={rng.choice(CONDITIONS)}',
+        'is_graded=true&sort=value&order=desc',
+        f'tag={rng.choice(TAGS)}',
+        'min_value=100&max_value=500&sort=value',
+    ])
+    return _tenant(rng, scenario), 'GET', f'/api/cards?limit=50&{filters}', None, None
+
+
+def _search(rng, scenario):
+    return _tenant(rng, scenario), 'GET', f'/api/cards/search?q={rng.choice(NAMES)}', None, None
+
+
+def _autocomplete(rng, scenario):
+    name = rng.choice(NAMES)[:rng.randint(1, 4)]
+    return _tenant(rng, scenario), 'GET', f'/api/cards/search?mode=prefix&q={name}', None, None
+
+
+def _get_card(rng, scenario):
+    tenant = _tenant(rng, scenario)
+    return tenant, 'GET', f'/api/cards/{rng.choice(tenant.card_ids)}', None, None
+
+
+def _create_card(rng, scenario):
+    tenant = _tenant(rng, scenario)
+
+    def created(body):
+        scenario.created_cards.append((tenant, body['_id']))
+    return tenant, 'POST', '/api/cards', make_card(rng, rng.randint(0, 10 ** 6)), created
+
+
+def _update_card(rng, scenario):
+    tenant = _tenant(rng, scenario)
+    body = {'estimated_value': round(rng.uniform(0.5, 900), 2), 'condition': rng.choice(CONDITIONS)}
+    return tenant, 'PUT', f'/api/cards/{rng.choice(tenant.card_ids)}', body, None
+
+
+def _bulk_cards(rng, scenario):
+    cards = [make_card(rng, rng.randint(0, 10 ** 6)) for _ in range(100)]
+    return _tenant(rng, scenario), 'POST', '/api/cards/bulk', cards, None
+
+
+def _batch_cards(rng, scenario):
+    tenant = _tenant(rng, scenario)
+    operations = [
+        {'id': card_id, 'op': 'update', 'fields': {'estimated_value': round(rng.uniform(0.5, 900), 2)}}
+        for card_id in rng.sample(tenant.card_ids, min(50, len(tenant.card_ids)))
+    ]
+    return tenant, 'POST', '/api/cards/batch', {'operations': operations}, None
+
+
+def _delete_card(rng, scenario):
+    try:
+        tenant, card_id = scenario.created_cards.popleft()
+    except IndexError:
+        return None
+    return tenant, 'DELETE', f'/api/cards/{card_id}', None, None
+
+
+def _get_binder(rng, scenario, query=''):
+    tenant = _tenant(rng, scenario)
+    if not tenant.binders:
+        return None
+    return tenant, 'GET', f"/api/binders/{rng.choice(tenant.binders)['id']}{query}", None, None
+
+
+def _create_binder(rng, scenario):
+    tenant = _tenant(rng, scenario)
+
+    def created(body):
+        scenario.created_binders.append((tenant, body['_id']))
+    size = rng.randint(3, 6)
+    return tenant, 'POST', '/api/binders', {'name': 'Load test binder', 'rows': size, 'columns': size}, created
+
+
+def _update_binder(rng, scenario):
+    try:
+        tenant, binder = scenario.binders.popleft()
+    except IndexError:
+        return None
+
+    def updated(response):
+        binder['version'] = response['version']
+        scenario.binders.append((tenant, binder))
+    return tenant, 'PUT', f"/api/binders/{binder['id']}", {'name': f'Renamed {rng.randint(0, 999)}'}, updated
+
+
+def _patch_slots(rng, scenario):
+    try:
+        tenant, binder = scenario.binders.popleft()
+    except IndexError:
+        return None
+    size = binder['size']
+    body = {
+        'version': binder['version'],
+        'operations': [
+            {'op': 'place', 'row': rng.randrange(size), 'col': rng.randrange(size), 'card_id': rng.choice(tenant.card_ids)},
+            {'op': 'clear', 'row': rng.randrange(size), 'col': rng.randrange(size)},
+        ],
+    }
+
+    def patched(response):
+        binder['version'] = response['version']
+        scenario.binders.append((tenant, binder))
+    return tenant, 'PATCH', f"/api/binders/{binder['id']}/slots", body, patched
+
+
+def _delete_binder(rng, scenario):
+    try:
+        tenant, binder_id = scenario.created_binders.popleft()
+    except IndexError:
+        return None
+    return tenant, 'DELETE', f'/api/binders/{binder_id}', None, None
+
+
+ENDPOINTS = [
+    ('app.health_check', 1, _health),
+    ('auth.signup', 0.05, _signup),
+    ('auth.login', 0.05, _login),
+    ('auth.get_current_user', 1, _get('/api/auth/me')),
+    ('cards.get_cards', 1, _list_cards),
+    ('cards.get_cards filtered', 1, _filter_cards),
+    ('cards.get_cards stream', 0.2, _get('/api/cards?stream=1')),
+    ('cards.search_cards', 1, _search),
+    ('cards.search_cards prefix', 1, _autocomplete),
+    ('cards.get_card_stats', 1, _get('/api/cards/stats')),
+    ('cards.get_card_stats_history', 0.2, _get('/api/cards/stats/history?resolution=week')),
+    ('cards.get_card', 1, _get_card),
+    ('cards.create_card', 1, _create_card),
+    ('cards.update_card', 1, _update_card),
+    ('cards.batch_update_cards', 0.2, _batch_cards),
+    ('cards.bulk_create_cards', 0.1, _bulk_cards),
+    ('cards.delete_card', 1, _delete_card),
+    ('binders.get_binders', 1, _get('/api/binders')),
+    ('binders.get_binder', 1, _get_binder),
+    ('binders.get_binder expand', 0.5, lambda rng, scenario: _get_binder(rng, scenario, '?expand=cards')),
+    ('binders.create_binder', 1, _create_binder),
+    ('binders.update_binder', 1, _update_binder),
+    ('binders.patch_binder_slots', 1, _patch_slots),
+    ('binders.delete_binder', 1, _delete_binder),
+    ('sync.sync', 0.5, _get('/api/sync?limit=100')),
+]
+
+# mongomock implements neither $text search, the $convert used by the stats rebuild
+# nor the $dateTrunc used by the price history
+NEEDS_MONGOD = {'cards.search_cards', 'cards.get_card_stats', 'cards.get_card_stats_history'}
+
+
+def drive(make_transport, scenario, build, requests, clients, seed_value):
+    """Send `requests` requests from `clients` threads, returning the timing summary"""
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(worker_id):
+        rng = random.Random(seed_value * 1000 + worker_id)
+        transports = {}
+        local = []
+        failed = {}
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            planned = build(rng, scenario)
+            if planned is None:
+                break
+            tenant, method, path, body, on_success = planned
+            token = tenant.token if tenant else None
+            if token not in transports:
+                transports[token] = make_transport(token)
+            start = time.perf_counter()
+            try:
+                status, payload = transports[token].request(method, path, body)
+            except OSError as e:
+                status, payload = type(e).__name__, None
+            elapsed = time.perf_counter() - start
+            if isinstance(status, int) and status < 400:
+                local.append(elapsed)
+                if on_success:
+                    on_success(payload)
+            else:
+                failed[str(status)] = failed.get(str(status), 0) + 1
+        with lock:
+            latencies.extend(local)
+            for status, count in failed.items():
+                errors[status] = errors.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies)
+    result['errors'] = errors
+    result['throughput_rps'] = round(len(latencies) / elapsed, 1) if elapsed else None
+    result['mean_ms'] = round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, report_settings, results):
+    """Print throughput and p95 changes against an earlier run's JSON"""
+    before = baseline.get('endpoints', {})
+    for setting in ('target', 'database', 'scale', 'clients'):
+        if baseline.get(setting) != report_settings.get(setting):
+            print(f'  note: {setting} differs from the baseline run ({baseline.get(setting)})')
+    print(f"  {'endpoint':<30} {'req/s':>9} {'change':>8} {'p95 ms':>9} {'change':>8}")
+    for name, result in results.items():
+        old = before.get(name)
+        if not old or 'skipped' in result or 'skipped' in old:
+            continue
+
+        def change(new_value, old_value):
+            if not new_value or not old_value:
+                return '-'
+            return f'{(new_value - old_value) / old_value * 100:+.1f}%'
+        print(
+            f"  {name:<30} {result['throughput_rps'] or 0:>9.1f} {change(result['throughput_rps'], old['throughput_rps']):>8}"
+            f" {result['p95_ms'] or 0:>9.2f} {change(result['p95_ms'], old['p95_ms']):>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running server (default: Flask test client in-process)')
+    parser.add_argument('--mongomock', action='store_true', help='use an in-memory mongomock database')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--cards-per-user', type=int, default=200)
+    parser.add_argument('--binders-per-user', type=int, default=3)
+    parser.add_argument('--max-binder-size', type=int, default=30, help='largest binder grid side')
+    parser.add_argument('--requests', type=int, default=200, help='recorded requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=20, help='unrecorded requests per endpoint first')
+    parser.add_argument('--clients', type=int, default=1, help='concurrent threads per endpoint')
+    parser.add_argument('--only', help='comma-separated endpoint names to run')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help='leave the seeded tenants in the database')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='earlier --output file to compare against')
+    args = parser.parse_args()
+
+    if args.url and args.mongomock:
+        parser.error('--mongomock only works in-process; a server cannot see its data')
+
+    if args.mongomock:
+        import mongomock
+        database.client = mongomock.MongoClient()
+        database.db = database.client[database.config.DATABASE_NAME]
+        database.client_pid = os.getpid()
+    db = database.get_db()
+
+    if args.url:
+        def make_transport(token):
+            return Client(args.url, token)
+    else:
+        from app import app
+        database.create_indexes()
+
+        def make_transport(token):
+            return FlaskClientTransport(app, token)
+
+    endpoints = ENDPOINTS
+    if args.only:
+        wanted = {name.strip() for name in args.only.split(',')}
+        endpoints = [endpoint for endpoint in ENDPOINTS if endpoint[0] in wanted]
+
+    run_id = uuid.uuid4().hex[:8]
+    since = datetime.utcnow()
+    started = time.perf_counter()
+    tenants = seed(db, run_id, args.users, args.cards_per_user, args.binders_per_user,
+                   args.max_binder_size, args.seed)
+    seed_seconds = time.perf_counter() - started
+    print(f'Seeded {args.users} users x {args.cards_per_user} cards, {args.binders_per_user} binders '
+          f'in {seed_seconds:.1f}s', file=sys.stderr)
+
+    results = {}
+    try:
+        scenario = Scenario(run_id, tenants)
+        for name, share, build in endpoints:
+            if args.mongomock and name in NEEDS_MONGOD:
+                results[name] = {'skipped': 'needs a MongoDB server'}
+                continue
+            requests = max(1, int(args.requests * share))
+            warmup = int(args.warmup * share)
+            if warmup:
+                drive(make_transport, scenario, build, warmup, args.clients, args.seed)
+            results[name] = drive(make_transport, scenario, build, requests, args.clients, args.seed)
+            print(f"  {name:<30} {results[name]['throughput_rps'] or 0:>9.1f} req/s  "
+                  f"p95 {results[name]['p95_ms'] or 0:.2f} ms", file=sys.stderr)
+    finally:
+        if not args.keep:
+            cleanup(db, run_id, tenants, since)
+
+    report = {
+        'started_at': datetime.utcnow().isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'target': args.url or 'flask-test-client',
+        'database': 'mongomock' if args.mongomock else database.config.MONGODB_URI.rsplit('@', 1)[-1],
+        'scale': {
+            'users': args.users,
+            'cards_per_user': args.cards_per_user,
+            'binders_per_user': args.binders_per_user,
+            'max_binder_size': args.max_binder_size,
+        },
+        'requests': args.requests,
+        'clients': args.clients,
+        'seed': args.seed,
+        'seed_seconds': round(seed_seconds, 2),
+        'endpoints': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Sparse binder slot storage.
+
+Binders store only occupied positions in a `cells` map keyed by "row_col",
+plus a `version` counter that guards single-slot patches. Older binders
+hold a dense `slots` grid of card IDs and nulls; they are read through
+transparently and converted by migrate_dense_binders() or on their first
+patch.
+
+Usage: python binder_slots.py   (migrates every dense binder in the database)
+"""
+
+from pymongo import UpdateOne
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SlotPatchError(ValueError):
+    """Raised when a slot operation is malformed or does not fit the binder"""
+    pass
+
+
+def cell_key(row: int, column: int) -> str:
+    """Key of a position in the cells map"""
+    return f'{row}_{column}'
+
+
+def to_cells(slots) -> dict:
+    """Convert a dense slot grid into a sparse cells map"""
+    cells = {}
+    for row_index, row in enumerate(slots or []):
+        for column_index, card_id in enumerate(row or []):
+            if card_id:
+                cells[cell_key(row_index, column_index)] = card_id
+    return cells
+
+
+def to_slots(cells, rows: int, columns: int) -> list:
+    """Materialize a dense rows x columns grid from a cells map"""
+    slots = [[None for _ in range(columns)] for _ in range(rows)]
+    for key, card_id in (cells or {}).items():
+        row, column = (int(part) for part in key.split('_'))
+        if row < rows and column < columns:
+            slots[row][column] = card_id
+    return slots
+
+
+def get_cells(binder) -> dict:
+    """Return a binder's occupied positions whichever layout it is stored in"""
+    if 'cells' in binder:
+        return dict(binder['cells'] or {})
+    return to_cells(binder.get('slots'))
+
+
+def dense_view(binder) -> dict:
+    """Give a stored binder the dense `slots` grid the API has always returned"""
+    if 'cells' in binder:
+        binder['slots'] = to_slots(binder.pop('cells'), binder.get('rows', 0), binder.get('columns', 0))
+    binder.setdefault('version', 0)
+    return binder
+
+
+def present(binder, sparse: bool = False) -> dict:
+    """Shape a stored binder for a response: the dense slot grid, or its cells map when sparse"""
+    if sparse:
+        binder['cells'] = get_cells(binder)
+        binder.pop('slots', None)
+        binder.setdefault('version', 0)
+        return binder
+    return dense_view(binder)
+
+
+def _position(value, binder, name):
+    if not isinstance(value, dict):
+        raise SlotPatchError(f'{name} must be an object with row and col')
+    try:
+        row, column = int(value['row']), int(value['col'])
+    except (KeyError, TypeError, ValueError):
+        raise SlotPatchError(f'{name} must have integer row and col')
+    if not (0 <= row < binder.get('rows', 0) and 0 <= column < binder.get('columns', 0)):
+        raise SlotPatchError(f'{name} is outside the binder')
+    return cell_key(row, column)
+
+
+def apply_operations(cells: dict, operations, binder) -> set:
+    """Apply slot operations to a cells map in place, returning the touched keys
+
+    Supported operations:
+        {"op": "place", "row", "col", "card_id"}
+        {"op": "clear", "row", "col"}
+        {"op": "move", "from": {"row", "col"}, "to": {"row", "col"}}
+        {"op": "swap", "a": {"row", "col"}, "b": {"row", "col"}}
+    """
+    if not isinstance(operations, list) or not operations:
+        raise SlotPatchError('operations must be a non-empty list')
+    
+    touched = set()
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise SlotPatchError('Each operation must be an object')
+        op = operation.get('op')
+        
+        if op == 'place':
+            key = _position(operation, binder, 'place')
+            card_id = operation.get('card_id')
+            if not card_id or not isinstance(card_id, str):
+                raise SlotPatchError('place requires a card_id')
+            cells[key] = card_id
+            touched.add(key)
+        elif op == 'clear':
+            key = _position(operation, binder, 'clear')
+            cells.pop(key, None)
+            touched.add(key)
+        elif op == 'move':
+            source = _position(operation.get('from'), binder, 'from')
+            target = _position(operation.get('to'), binder, 'to')
+            if source not in cells:
+                raise SlotPatchError('Cannot move from an empty slot')
+            if target in cells and target != source:
+                raise SlotPatchError('Target slot is occupied; use swap')
+            cells[target] = cells.pop(source)
+            touched.update((source, target))
+        elif op == 'swap':
+            first = _position(operation.get('a'), binder, 'a')
+            second = _position(operation.get('b'), binder, 'b')
+            first_card, second_card = cells.pop(first, None), cells.pop(second, None)
+            if first_card:
+                cells[second] = first_card
+            if second_card:
+                cells[first] = second_card
+            touched.update((first, second))
+        else:
+            raise SlotPatchError("op must be one of place, clear, move, swap")
+    return touched
+
+
+def migrate_dense_binders(db, batch_size: int = 500) -> int:
+    """Convert every binder still holding a dense slots grid to sparse cells"""
+    migrated = 0
+    requests = []
+    for binder in db.binders.find({'slots': {'$exists': True}}, {'slots': 1, 'version': 1}):
+        update = {'$set': {'cells': to_cells(binder['slots'])}, '$unset': {'slots': ''}}
+        if 'version' not in binder:
+            update['$set']['version'] = 0
+        requests.append(UpdateOne({'_id': binder['_id'], 'slots': {'$exists': True}}, update))
+        if len(requests) >= batch_size:
+            migrated += db.binders.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        migrated += db.binders.bulk_write(requests, ordered=False).modified_count
+    logger.info(f"Migrated {migrated} binders to sparse slot storage")
+    return migrated
+
+
+if __name__ == '__main__':
+    from database import get_db
+    logging.basicConfig(level=logging.INFO)
+    migrate_dense_binders(get_db())
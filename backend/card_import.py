@@ -0,0 +1,67 @@
+"""
+Row parsing for bulk card imports.
+
+CSV uploads are read incrementally from the request stream and each row is
+turned into the same dict shape that POST /api/cards accepts as JSON.
+"""
+
+import csv
+import io
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+
+class RowError(ValueError):
+    """Raised when a CSV row cannot be converted into a card payload"""
+    pass
+
+
+def _number(value, cast, field):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{field} must be a number")
+
+
+def card_from_csv_row(row: dict) -> dict:
+    """Convert a CSV row (header -> string) into a card payload"""
+    row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+    data = {key: row[key] for key in ('name', 'set', 'card_number', 'image_url', 'condition', 'notes')
+            if row.get(key)}
+    
+    if row.get('is_graded'):
+        data['is_graded'] = row['is_graded'].lower() in TRUE_VALUES
+    for field in ('purchase_price', 'estimated_value'):
+        if row.get(field):
+            data[field] = _number(row[field], float, field)
+    if row.get('quantity'):
+        data['quantity'] = _number(row['quantity'], int, 'quantity')
+    if row.get('tags'):
+        data['tags'] = [tag.strip() for tag in row['tags'].split(';') if tag.strip()]
+    
+    # Grading is flattened into grading_company / grading_grade / grading_cert_number columns
+    grading = {}
+    if row.get('grading_company'):
+        grading['company'] = row['grading_company']
+    if row.get('grading_grade'):
+        grading['grade'] = _number(row['grading_grade'], float, 'grading_grade')
+    if row.get('grading_cert_number'):
+        grading['cert_number'] = row['grading_cert_number']
+    if grading:
+        data['grading'] = grading
+    
+    return data
+
+
+def iter_csv_rows(stream, encoding='utf-8'):
+    """Yield (row_number, payload or RowError) for each data row of a CSV stream
+
+    Row numbers count data rows from 1; the header line is not counted.
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    reader = csv.DictReader(text)
+    for index, row in enumerate(reader, 1):
+        try:
+            yield index, card_from_csv_row(row)
+        except RowError as e:
+            yield index, e
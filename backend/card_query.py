@@ -0,0 +1,175 @@
+"""
+Filtering and sorting for GET /api/cards.
+
+Every supported filter/sort combination is hinted onto one of the compound
+indexes in LIST_INDEXES, so no listing is served by a collection scan or
+sorted in memory:
+
+- with the default _id order, the first equality filter picks a
+  (user_id, <field>, _id) index and any other filters are applied while
+  fetching;
+- with an explicit sort and no equality filter, the (user_id, <sort field>,
+  _id) index provides the order, a range on the sort field becomes index
+  bounds, and other filters are applied while fetching;
+- with an explicit sort and an equality filter, the (user_id, <filter
+  field>, <sort field>, _id) index follows the equality-sort-range rule: the
+  first equality filter narrows the index to one value, the sort field
+  orders within it, and a range on the sort field bounds it.
+
+tests/test_query_plans.py runs explain() over every combination to keep it so.
+"""
+
+from bson.int64 import Int64
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from collections import namedtuple
+from datetime import datetime
+from pagination import PaginationError, decode_cursor
+
+# sort parameter -> stored field
+SORT_FIELDS = {
+    'created_at': 'created_at',
+    'value': 'estimated_value',
+    'name': 'name_lc',
+}
+
+# equality parameter -> stored field, in the order they are preferred for index selection
+EQUALITY_FILTERS = {
+    'set': 'set',
+    'tag': 'tags',
+    'condition': 'condition',
+    'is_graded': 'is_graded',
+}
+
+# range parameters -> (stored field, operator)
+RANGE_FILTERS = {
+    'min_value': ('estimated_value', '$gte'),
+    'max_value': ('estimated_value', '$lte'),
+    'min_price': ('purchase_price', '$gte'),
+    'max_price': ('purchase_price', '$lte'),
+}
+
+
+def _index(*fields):
+    return [('user_id', 1)] + [(field, 1) for field in fields] + [('_id', 1)]
+
+
+DEFAULT_INDEX = [('user_id', 1), ('_id', 1)]
+
+# Every index a card listing can be hinted onto
+LIST_INDEXES = [DEFAULT_INDEX] + [
+    _index(field) for field in list(EQUALITY_FILTERS.values()) + list(SORT_FIELDS.values())
+] + [
+    _index(equality, sort) for equality in EQUALITY_FILTERS.values() for sort in SORT_FIELDS.values()
+]
+
+CardQuery = namedtuple('CardQuery', ['filter', 'sort', 'hint', 'sort_field'])
+
+# $type aliases in MongoDB's sort order, after null/missing which sort first. Cards
+# written before validation or native dates may hold another type than the rest
+SORT_TYPE_ORDER = ['number', 'string', 'object', 'array', 'binData', 'objectId', 'bool', 'date']
+
+
+def _parse_bool(value):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise PaginationError('is_graded must be true or false')
+
+
+def _parse_number(name, value):
+    try:
+        return float(value)
+    except ValueError:
+        raise PaginationError(f'{name} must be a number')
+
+
+def _sort_type(value):
+    """Return the SORT_TYPE_ORDER alias of a cursor value"""
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float, Decimal128, Int64)):
+        return 'number'
+    for alias, types in (('string', str), ('object', dict), ('array', list), ('binData', bytes),
+                         ('objectId', ObjectId), ('date', datetime)):
+        if isinstance(value, types):
+            return alias
+    raise PaginationError('Invalid cursor')
+
+
+def _after_clauses(field, last_value, last_id, direction):
+    """Clauses selecting the documents after (last_value, last_id) in (field, _id) order
+
+    A comparison only matches values of its own type, and {field: null}
+    matches both null and missing, so the values that sort after the last
+    one are spelled out per type: nulls/missing come first in ascending
+    order and last in descending order. The clause before the $or, where
+    there is one, gives index bounds; the $or picks the exact documents.
+    """
+    greater = '$gt' if direction == 1 else '$lt'
+    after = [{field: last_value, '_id': {greater: last_id}}]
+    if last_value is None:
+        if direction == 1:
+            return [{'$or': after + [{field: {'$ne': None}}]}]
+        return [{field: None}, {'$or': after}]
+    
+    rank = SORT_TYPE_ORDER.index(_sort_type(last_value))
+    later_types = SORT_TYPE_ORDER[rank + 1:] if direction == 1 else SORT_TYPE_ORDER[:rank]
+    after.append({field: {greater: last_value}})
+    after.extend({field: {'$type': alias}} for alias in later_types)
+    if direction == -1:
+        after.append({field: None})
+    # $not keeps other types and nulls within the bounds; the $or drops those that come before
+    behind = '$lt' if direction == 1 else '$gt'
+    return [{field: {'$not': {behind: last_value}}}, {'$or': after}]
+
+
+def build_card_query(args, user_id) -> CardQuery:
+    """Turn request arguments into a filter, sort and index hint for a card listing
+
+    Raises PaginationError for unknown sorts or malformed values.
+    """
+    query = {'user_id': user_id}
+    clauses = []
+    
+    equality_fields = []
+    for param, field in EQUALITY_FILTERS.items():
+        if args.get(param):
+            value = _parse_bool(args[param]) if param == 'is_graded' else args[param]
+            query[field] = value
+            equality_fields.append(field)
+    
+    for param, (field, operator) in RANGE_FILTERS.items():
+        if args.get(param):
+            query.setdefault(field, {})[operator] = _parse_number(param, args[param])
+    
+    sort_param = args.get('sort')
+    order = args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise PaginationError('order must be asc or desc')
+    direction = -1 if order == 'desc' else 1
+    
+    if sort_param:
+        if sort_param not in SORT_FIELDS:
+            raise PaginationError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+        sort_field = SORT_FIELDS[sort_param]
+        hint = _index(equality_fields[0], sort_field) if equality_fields else _index(sort_field)
+    else:
+        sort_field = '_id'
+        hint = _index(equality_fields[0]) if equality_fields else DEFAULT_INDEX
+    
+    after = args.get('after')
+    if after:
+        if sort_field == '_id':
+            greater = '$gt' if direction == 1 else '$lt'
+            clauses.append({'_id': {greater: decode_cursor(after)[0]}})
+        else:
+            last_value, last_id = decode_cursor(after, size=2)
+            clauses.extend(_after_clauses(sort_field, last_value, last_id, direction))
+    
+    if clauses:
+        query = {'$and': [query] + clauses}
+    
+    sort = [('_id', direction)] if sort_field == '_id' else [(sort_field, direction), ('_id', direction)]
+    return CardQuery(query, sort, hint, sort_field)
@@ -0,0 +1,77 @@
+"""
+Normalized search fields for cards.
+
+Cards carry `name_lc` and `set_lc` copies of their name and set, lower-cased
+with accents and repeated whitespace removed. Prefix autocomplete runs as an
+anchored regex on these fields, which MongoDB answers with a bounded scan of
+the (user_id, name_lc) / (user_id, set_lc) indexes. Full-text search uses
+the `cards_text` index over name_lc, set, notes and tags.
+
+Usage: python card_search.py   (backfills search fields on existing cards)
+"""
+
+from pymongo import UpdateOne
+import logging
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Searchable source field -> normalized copy
+SEARCH_FIELDS = {'name': 'name_lc', 'set': 'set_lc'}
+
+# Projection that keeps the normalized copies out of API responses
+HIDDEN_FIELDS = {normalized: 0 for normalized in SEARCH_FIELDS.values()}
+
+
+def normalize(value) -> str:
+    """Lower-case, strip accents and collapse whitespace for prefix matching"""
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
+
+
+def search_fields(fields: dict) -> dict:
+    """Return the normalized fields to store alongside a card write"""
+    return {
+        normalized: normalize(fields[source])
+        for source, normalized in SEARCH_FIELDS.items()
+        if source in fields
+    }
+
+
+def strip_search_fields(card: dict) -> dict:
+    """Drop the normalized copies from a card before returning it"""
+    for normalized in SEARCH_FIELDS.values():
+        card.pop(normalized, None)
+    return card
+
+
+def prefix_query(prefix: str) -> dict:
+    """Anchored, case-sensitive regex on a normalized field so it stays index-bounded"""
+    return {'$regex': '^' + re.escape(normalize(prefix))}
+
+
+def backfill_search_fields(db, batch_size: int = 1000) -> int:
+    """Populate name_lc/set_lc on cards written before they existed"""
+    updated = 0
+    requests = []
+    missing = {'$or': [{normalized: {'$exists': False}} for normalized in SEARCH_FIELDS.values()]}
+    for card in db.cards.find(missing, {source: 1 for source in SEARCH_FIELDS}):
+        fields = {source: card.get(source) for source in SEARCH_FIELDS}
+        requests.append(UpdateOne({'_id': card['_id']}, {'$set': search_fields(fields)}))
+        if len(requests) >= batch_size:
+            updated += db.cards.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        updated += db.cards.bulk_write(requests, ordered=False).modified_count
+    logger.info(f"Backfilled search fields on {updated} cards")
+    return updated
+
+
+if __name__ == '__main__':
+    from database import get_db
+    logging.basicConfig(level=logging.INFO)
+    backfill_search_fields(get_db())
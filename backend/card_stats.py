@@ -0,0 +1,214 @@
+"""
+Per-user portfolio summary maintained incrementally from card writes.
+
+Each user has one document in `card_stats` holding collection totals and
+breakdowns by set, condition and graded status. Card handlers apply `$inc`
+deltas as they write, so reading the dashboard totals is a single lookup.
+When the summary is missing (or a caller asks to verify it) it is rebuilt
+from an aggregation over the user's cards.
+
+Value totals are weighted by quantity, matching what the dashboard shows.
+"""
+
+from mongo_ops import call, run
+from urllib.parse import quote, unquote
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Card fields that feed the summary; writes touching none of them skip the $inc
+STAT_FIELDS = ['set', 'condition', 'is_graded', 'quantity', 'purchase_price', 'estimated_value']
+
+BREAKDOWNS = ('by_set', 'by_condition', 'by_graded')
+TOTALS = ('card_count', 'total_quantity', 'total_purchase_price', 'total_estimated_value')
+
+# Relative tolerance when checking the incremental summary against a rebuild
+_TOLERANCE = 1e-6
+
+
+def _number(value, default=0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _key(value) -> str:
+    """Escape a breakdown label so it is safe as a Mongo field name"""
+    label = str(value) if value not in (None, '') else 'Unknown'
+    # quote() leaves '.' alone, but it would split the field path
+    return quote(label, safe=' ').replace('.', '%2E')
+
+
+def _group_keys(card) -> dict:
+    return {
+        'by_set': _key(card.get('set')),
+        'by_condition': _key(card.get('condition')),
+        'by_graded': 'graded' if card.get('is_graded') else 'raw',
+    }
+
+
+def contribution(card) -> dict:
+    """Return the summary fields a single card adds, as field path -> amount"""
+    quantity = _number(card.get('quantity', 1), 1)
+    purchase = _number(card.get('purchase_price')) * quantity
+    value = _number(card.get('estimated_value')) * quantity
+    
+    amounts = {
+        'card_count': 1,
+        'total_quantity': quantity,
+        'total_purchase_price': purchase,
+        'total_estimated_value': value,
+    }
+    for breakdown, key in _group_keys(card).items():
+        amounts[f'{breakdown}.{key}.cards'] = 1
+        amounts[f'{breakdown}.{key}.quantity'] = quantity
+        amounts[f'{breakdown}.{key}.estimated_value'] = value
+    return amounts
+
+
+def delta(before=None, after=None) -> dict:
+    """Return the $inc document that turns a summary including before into one including after"""
+    inc = {}
+    if after:
+        for path, amount in contribution(after).items():
+            inc[path] = inc.get(path, 0) + amount
+    if before:
+        for path, amount in contribution(before).items():
+            inc[path] = inc.get(path, 0) - amount
+    return {path: amount for path, amount in inc.items() if amount}
+
+
+def apply_delta_ops(user_id, inc: dict):
+    """Apply an $inc delta to the user's summary if one has been built"""
+    if not inc:
+        return
+    # No upsert: a missing summary is rebuilt from the cards on the next read
+    yield call('card_stats', 'update_one', {'_id': user_id}, {'$inc': inc})
+
+
+def apply_delta(db, user_id, inc: dict):
+    run(apply_delta_ops(user_id, inc), db)
+
+
+def record_change_ops(user_id, before=None, after=None):
+    """Fold one card insert, update or delete into the user's summary"""
+    yield from apply_delta_ops(user_id, delta(before, after))
+
+
+def record_change(db, user_id, before=None, after=None):
+    run(record_change_ops(user_id, before, after), db)
+
+
+def _double(expression, default):
+    """Aggregation expression coercing a value to double like _number() does"""
+    return {'$convert': {'input': expression, 'to': 'double', 'onError': default, 'onNull': default}}
+
+
+def _aggregate(db, user_id) -> dict:
+    """Compute the summary from scratch with an aggregation pipeline"""
+    quantity = _double({'$ifNull': ['$quantity', 1]}, 1)
+    
+    def weighted(field):
+        return {'$multiply': [_double(f'${field}', 0), quantity]}
+    
+    def group_by(key):
+        return [{'$group': {
+            '_id': key,
+            'cards': {'$sum': 1},
+            'quantity': {'$sum': quantity},
+            'estimated_value': {'$sum': weighted('estimated_value')},
+        }}]
+    
+    pipeline = [
+        {'$match': {'user_id': user_id}},
+        {'$facet': {
+            'totals': [{'$group': {
+                '_id': None,
+                'card_count': {'$sum': 1},
+                'total_quantity': {'$sum': quantity},
+                'total_purchase_price': {'$sum': weighted('purchase_price')},
+                'total_estimated_value': {'$sum': weighted('estimated_value')},
+            }}],
+            'by_set': group_by('$set'),
+            'by_condition': group_by('$condition'),
+            'by_graded': group_by({'$cond': [{'$ifNull': ['$is_graded', False]}, 'graded', 'raw']}),
+        }},
+    ]
+    result = next(db.cards.aggregate(pipeline), {})
+    
+    totals = (result.get('totals') or [{}])[0]
+    summary = {'_id': user_id}
+    for field in TOTALS:
+        summary[field] = totals.get(field, 0)
+    for breakdown in BREAKDOWNS:
+        summary[breakdown] = {}
+        for group in result.get(breakdown, []):
+            key = group['_id'] if breakdown == 'by_graded' else _key(group['_id'])
+            entry = summary[breakdown].setdefault(key, {'cards': 0, 'quantity': 0, 'estimated_value': 0})
+            for field in ('cards', 'quantity', 'estimated_value'):
+                entry[field] += group[field]
+    return summary
+
+
+def rebuild(db, user_id) -> dict:
+    """Recompute the user's summary from their cards and store it"""
+    summary = _aggregate(db, user_id)
+    db.card_stats.replace_one({'_id': user_id}, summary, upsert=True)
+    return summary
+
+
+def _close(a, b) -> bool:
+    return abs(a - b) <= _TOLERANCE * max(1.0, abs(a), abs(b))
+
+
+def _matches(stored, rebuilt) -> bool:
+    """Compare two summaries, ignoring empty breakdown entries and float noise"""
+    for field in TOTALS:
+        if not _close(_number(stored.get(field)), _number(rebuilt.get(field))):
+            return False
+    for breakdown in BREAKDOWNS:
+        stored_groups = {k: v for k, v in (stored.get(breakdown) or {}).items() if v.get('cards')}
+        rebuilt_groups = rebuilt.get(breakdown) or {}
+        if stored_groups.keys() != rebuilt_groups.keys():
+            return False
+        for key, entry in rebuilt_groups.items():
+            for field, amount in entry.items():
+                if not _close(_number(stored_groups[key].get(field)), amount):
+                    return False
+    return True
+
+
+def to_response(summary) -> dict:
+    """Shape a stored summary for the API, unescaping labels and dropping empty groups"""
+    response = {field: summary.get(field, 0) for field in TOTALS}
+    for breakdown in BREAKDOWNS:
+        response[breakdown] = {
+            unquote(key): entry
+            for key, entry in (summary.get(breakdown) or {}).items()
+            if entry.get('cards')
+        }
+    return response
+
+
+def get_summary(db, user_id, verify: bool = False):
+    """Return (summary, verified) for a user, building it on first use
+
+    With verify=True the stored summary is checked against a fresh
+    aggregation and replaced if it drifted; verified is then True only when
+    the stored copy was already correct.
+    """
+    summary = db.card_stats.find_one({'_id': user_id})
+    if summary is None:
+        return rebuild(db, user_id), True
+    
+    if not verify:
+        return summary, None
+    
+    rebuilt = _aggregate(db, user_id)
+    if _matches(summary, rebuilt):
+        return summary, True
+    
+    logger.warning(f"Card stats drift for user {user_id}; rebuilding")
+    db.card_stats.replace_one({'_id': user_id}, rebuilt, upsert=True)
+    return rebuilt, False
@@ -0,0 +1,288 @@
+"""
+Shared card catalog: one document per printed card, keyed by (set, card_number).
+
+A card's name, card_number and image_url describe the printing, not the
+copy a user owns, so they live once in `catalog` instead of on every user's
+`cards` document. A user card points at its entry with `catalog_id` and
+otherwise holds ownership fields (condition, grading, prices, quantity,
+notes, tags). It also keeps `set` and the normalized `name_lc`/`set_lc`, so
+per-user filters, sorts, search and stats stay on the cards indexes. Where
+a user's name or image_url differs from the catalog entry, that value is
+kept on the card and wins over the entry.
+
+Entries are created by the first card written for a (set, card_number) and
+never modified afterwards, so the in-process catalog_cache cannot go stale;
+card listings resolve their entries from it, with one $in query for
+whatever is missing.
+
+Card numbers are keyed as stripped text (normalize_number), so a card
+created with 4 and one created with "4" share an entry.
+
+Cards written before the catalog existed carry the full fields and are
+returned as they are; run this module once to fold them into the catalog.
+It also merges entries created before card numbers were normalized, which
+is the one time entries change, so restart the API processes afterwards.
+"""
+
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from cache import LRUCache
+from card_search import backfill_search_fields, search_fields
+from config import get_config
+from mongo_ops import call, run
+import logging
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+# Fields that describe the printing and are stored on catalog entries
+CATALOG_FIELDS = ['name', 'set', 'card_number', 'image_url']
+
+# Catalog fields a user card keeps only when its value differs from the entry
+OVERRIDE_FIELDS = ['name', 'image_url']
+
+catalog_cache = LRUCache(config.CATALOG_CACHE_SIZE, config.CATALOG_CACHE_TTL)
+
+
+def normalize_number(card_number):
+    """Card numbers are keyed as stripped text, so 4, "4" and " 4" are one printing"""
+    return None if card_number is None else str(card_number).strip()
+
+
+def entry_key(card) -> tuple:
+    return card.get('set'), normalize_number(card.get('card_number'))
+
+
+def _remember(entry):
+    catalog_cache.set(('id', entry['_id']), entry)
+    catalog_cache.set(('key',) + entry_key(entry), entry)
+
+
+def _key_filter(keys) -> dict:
+    return {'$or': [{'set': set_name, 'card_number': card_number} for set_name, card_number in keys]}
+
+
+def resolve_ops(cards):
+    """Return {(set, card_number): entry} for full card documents, creating missing entries"""
+    entries = {}
+    wanted = {}
+    for card in cards:
+        key = entry_key(card)
+        if key in entries or key in wanted:
+            continue
+        entry = catalog_cache.get(('key',) + key)
+        if entry is None:
+            wanted[key] = card
+        else:
+            entries[key] = entry
+
+    if wanted:
+        found = yield call('catalog', 'find', _key_filter(wanted))
+        for entry in found:
+            entries[entry_key(entry)] = entry
+            wanted.pop(entry_key(entry), None)
+
+    if wanted:
+        # The first card seen for a printing defines its entry; entries never change afterwards
+        now = datetime.utcnow()
+        requests = [
+            UpdateOne(
+                {'set': set_name, 'card_number': card_number},
+                {'$setOnInsert': dict({field: card.get(field, '') for field in OVERRIDE_FIELDS}, created_at=now)},
+                upsert=True
+            )
+            for (set_name, card_number), card in wanted.items()
+        ]
+        try:
+            yield call('catalog', 'bulk_write', requests, ordered=False)
+        except BulkWriteError:
+            # A concurrent write created some of the same entries first; the re-read finds them
+            pass
+        found = yield call('catalog', 'find', _key_filter(wanted))
+        for entry in found:
+            entries[entry_key(entry)] = entry
+
+    for entry in entries.values():
+        _remember(entry)
+    return entries
+
+
+def link_ops(cards):
+    """Point full card documents at their catalog entries, in place
+
+    Each card gets catalog_id and loses the fields its entry already holds;
+    it keeps set (denormalized for its indexes) and any overrides. Returns
+    {catalog_id: entry} for putting the documents back together with merge().
+    """
+    entries = yield from resolve_ops(cards)
+    linked = {}
+    for card in cards:
+        entry = entries[entry_key(card)]
+        card['catalog_id'] = entry['_id']
+        card.pop('card_number', None)
+        for field in OVERRIDE_FIELDS:
+            if field in card and card[field] == entry.get(field):
+                del card[field]
+        linked[entry['_id']] = entry
+    return linked
+
+
+def merge(card, entry, fields=None) -> dict:
+    """Fill a card's catalog fields from its entry, in place; the card's own values win"""
+    if entry:
+        for field in CATALOG_FIELDS:
+            if field not in card and (fields is None or field in fields):
+                card[field] = entry.get(field)
+    return card
+
+
+def attach_ops(cards, fields=None):
+    """Fill catalog fields on cards read from the database, in place
+
+    fields limits which catalog fields are added (None for all). Cards not
+    linked to the catalog yet already hold their own fields and are left
+    as they are.
+    """
+    entries = {}
+    missing = set()
+    for card in cards:
+        catalog_id = card.get('catalog_id')
+        if catalog_id is None or catalog_id in entries:
+            continue
+        entry = catalog_cache.get(('id', catalog_id))
+        if entry is None:
+            missing.add(catalog_id)
+        else:
+            entries[catalog_id] = entry
+
+    if missing:
+        found = yield call('catalog', 'find', {'_id': {'$in': list(missing)}})
+        for entry in found:
+            _remember(entry)
+            entries[entry['_id']] = entry
+
+    for card in cards:
+        merge(card, entries.get(card.get('catalog_id')), fields)
+    return cards
+
+
+def rebase_ops(card, fields):
+    """Return the ($set, $unset) that apply catalog field changes to a stored card
+
+    card is the stored document and fields the new values. The card is
+    re-pointed at the entry of its new (set, card_number), created if
+    needed, and its overrides and search fields are recomputed.
+    """
+    (changes,) = yield from rebase_many_ops([(card, fields)])
+    return changes
+
+
+def rebase_many_ops(changes):
+    """rebase_ops for a list of (card, fields) pairs, returning their ($set, $unset) in order
+
+    The current and new entries of every card are resolved together, so a
+    batch costs the same few catalog queries as a single card.
+    """
+    currents = []
+    for card, fields in changes:
+        current = {field: card[field] for field in CATALOG_FIELDS if field in card}
+        if card.get('catalog_id') is not None:
+            current['catalog_id'] = card['catalog_id']
+        currents.append(current)
+    yield from attach_ops([current for current in currents if 'catalog_id' in current])
+
+    set_docs = []
+    for current, (card, fields) in zip(currents, changes):
+        current.pop('catalog_id', None)
+        current.update({field: fields[field] for field in CATALOG_FIELDS if field in fields})
+        set_docs.append(dict(search_fields(current), set=current.get('set')))
+
+    yield from link_ops(currents)
+    results = []
+    for current, set_doc in zip(currents, set_docs):
+        set_doc['catalog_id'] = current['catalog_id']
+        unset_doc = {'card_number': ''}
+        for field in OVERRIDE_FIELDS:
+            if field in current:
+                set_doc[field] = current[field]
+            else:
+                unset_doc[field] = ''
+        results.append((set_doc, unset_doc))
+    return results
+
+
+# Migration
+
+def _migrate_batch(db, cards) -> int:
+    originals = {card['_id']: dict(card) for card in cards}
+    run(link_ops(cards), db)
+    requests = []
+    for card in cards:
+        original = originals[card['_id']]
+        # Only cards still as read: a concurrent edit keeps its values and is picked up next run
+        query = {'_id': card['_id'], 'catalog_id': {'$exists': False}}
+        query.update({field: original.get(field) for field in CATALOG_FIELDS})
+        unset = {field: '' for field in ['card_number'] + OVERRIDE_FIELDS if field not in card}
+        requests.append(UpdateOne(query, {'$set': {'catalog_id': card['catalog_id']}, '$unset': unset}))
+    return db.cards.bulk_write(requests, ordered=False).modified_count
+
+
+def normalize_entries(db) -> int:
+    """Rewrite catalog entries keyed by a non-normalized card number, returning how many changed
+
+    An entry whose normalized key is already taken is folded into the
+    entry holding it: its cards and price points are re-pointed, and cards
+    keep the entry's name and image_url as overrides where they differ.
+    """
+    query = {'$or': [{'card_number': {'$not': {'$type': 'string'}}}, {'card_number': {'$regex': r'^\s|\s$'}}]}
+    changed = 0
+    for entry in list(db.catalog.find(query)):
+        set_name, card_number = entry_key(entry)
+        target = db.catalog.find_one({'set': set_name, 'card_number': card_number})
+        if target is None:
+            db.catalog.update_one({'_id': entry['_id']}, {'$set': {'card_number': card_number}})
+        else:
+            for field in OVERRIDE_FIELDS:
+                if entry.get(field) != target.get(field):
+                    db.cards.update_many(
+                        {'catalog_id': entry['_id'], field: {'$exists': False}},
+                        {'$set': {field: entry.get(field)}}
+                    )
+            db.cards.update_many({'catalog_id': entry['_id']}, {'$set': {'catalog_id': target['_id']}})
+            db.price_history.update_many({'catalog_id': entry['_id']}, {'$set': {'catalog_id': target['_id']}})
+            db.catalog.delete_one({'_id': entry['_id']})
+        changed += 1
+    if changed:
+        catalog_cache.clear()
+    return changed
+
+
+def migrate_cards(db, batch_size: int = 1000) -> int:
+    """Fold cards written before the catalog into it, returning how many were linked"""
+    # name_lc must be in place before name can leave the card
+    backfill_search_fields(db, batch_size)
+    normalized = normalize_entries(db)
+    if normalized:
+        logger.info(f"Normalized the card numbers of {normalized} catalog entries")
+
+    migrated = 0
+    query = {'catalog_id': {'$exists': False}, 'set': {'$exists': True}, 'card_number': {'$exists': True}}
+    projection = {field: 1 for field in CATALOG_FIELDS}
+    last_id = None
+    while True:
+        page = dict(query, _id={'$gt': last_id}) if last_id else query
+        cards = list(db.cards.find(page, projection).sort('_id', 1).limit(batch_size))
+        if not cards:
+            break
+        last_id = cards[-1]['_id']
+        migrated += _migrate_batch(db, cards)
+    logger.info(f"Linked {migrated} cards to {db.catalog.estimated_document_count()} catalog entries")
+    return migrated
+
+
+if __name__ == '__main__':
+    from database import create_indexes, get_db
+    logging.basicConfig(level=logging.INFO)
+    create_indexes(get_db())
+    migrate_cards(get_db())
@@ -0,0 +1,190 @@
+"""
+Read-through cache for card and binder reads.
+
+data_access looks single cards and binders and whole listings up here
+before querying Mongo. Every entry is tied to the user's change counter
+for that collection in `collection_versions` (the one behind the list
+ETags), which every write bumps: listings carry the counter in their key,
+so all pages, filters and projections of a user's cards are orphaned by
+one write, and single documents are stored with the counter they were
+read at and only returned while it is still current. A worker therefore
+never serves a document or listing older than the counter it just read,
+whichever process made the write, and a body never lags behind the ETag
+sent with it. Writes also drop the documents they changed, so stale
+copies do not sit in the cache until they expire.
+
+The default backend is an in-process LRUCache per worker. Set
+COLLECTION_CACHE_BACKEND=redis to share one cache between workers and raise
+the hit ratio; RedisCache accepts any redis-py compatible client, so a
+local redis-server or fakeredis can stand in during development. Its calls
+block, so the ASGI app keeps to the in-process backend (use_memory_backend).
+
+Cached values are shared between requests and must not be mutated.
+"""
+
+from bson import json_util
+from cache import LRUCache
+from config import get_config
+import logging
+import pickle
+import threading
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - exercised only without redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+
+class RedisCache:
+    """Cache backend shared between processes through Redis
+
+    Offers the LRUCache interface (get/set/delete/clear/stats). Values are
+    pickled and expire with the entry TTL; eviction is left to the Redis
+    server's maxmemory policy.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = 'cardvault:cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key) -> str:
+        return self.prefix + repr(key)
+
+    def get(self, key, default=None):
+        raw = self.client.get(self._key(key))
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self.client.set(self._key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), px=int(ttl * 1000))
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*', count=1000))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self) -> dict:
+        # Server-wide counters: other users of the same Redis are included
+        server = self.client.info('stats')
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'redis',
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': server.get('evicted_keys', 0),
+                'expirations': server.get('expired_keys', 0),
+            }
+
+
+class CollectionCache:
+    """Per-user read-through cache over a backend, with hit counters per lookup kind"""
+
+    # Lookup kinds, each with its own hit/miss counters
+    CARD = 'card'
+    CARDS = 'cards'
+    BINDER = 'binder'
+    BINDERS = 'binders'
+    KINDS = (CARD, CARDS, BINDER, BINDERS)
+
+    def __init__(self, backend, max_items: int):
+        self.backend = backend
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._hits = dict.fromkeys(self.KINDS, 0)
+        self._misses = dict.fromkeys(self.KINDS, 0)
+        self.invalidations = 0
+
+    def _count(self, kind: str, hit: bool):
+        with self._lock:
+            if hit:
+                self._hits[kind] += 1
+            else:
+                self._misses[kind] += 1
+
+    # Single documents
+
+    def get_document(self, kind: str, user_id, oid, version: int, variant=None):
+        """Return a cached document if it was read at the user's current change counter"""
+        entry = self.backend.get((kind, user_id, oid, variant))
+        value = entry[1] if entry is not None and entry[0] == version else None
+        self._count(kind, value is not None)
+        return value
+
+    def set_document(self, kind: str, user_id, oid, version: int, value, variant=None):
+        if value is not None:
+            self.backend.set((kind, user_id, oid, variant), (version, value))
+
+    def invalidate_documents(self, kind: str, user_id, oids, variants=(None,)):
+        for oid in oids:
+            for variant in variants:
+                self.backend.delete((kind, user_id, oid, variant))
+        with self._lock:
+            self.invalidations += 1
+
+    # Listings
+
+    def listing_key(self, kind: str, user_id, version: int, *args):
+        """Key for one listing variant (filters, sort, page, projection, ...) at the user's change counter"""
+        return (kind, user_id, version, json_util.dumps(args))
+
+    def get_listing(self, kind: str, key):
+        value = self.backend.get(key)
+        self._count(kind, value is not None)
+        return value
+
+    def set_listing(self, key, value, items: int):
+        # Very large listings would crowd everything else out of the cache
+        if items <= self.max_items:
+            self.backend.set(key, value)
+
+    def stats(self) -> dict:
+        """Return per-kind hit counters and the backend's size and eviction counters"""
+        with self._lock:
+            lookups = {}
+            for kind in self.KINDS:
+                total = self._hits[kind] + self._misses[kind]
+                lookups[kind] = {
+                    'hits': self._hits[kind],
+                    'misses': self._misses[kind],
+                    'hit_ratio': round(self._hits[kind] / total, 4) if total else 0.0,
+                }
+            invalidations = self.invalidations
+        return {'lookups': lookups, 'invalidations': invalidations, 'backend': self.backend.stats()}
+
+
+def _make_backend():
+    if config.COLLECTION_CACHE_BACKEND == 'redis':
+        if redis is None:
+            logger.warning("COLLECTION_CACHE_BACKEND=redis but the redis package is not installed; using memory")
+        else:
+            return RedisCache(redis.Redis.from_url(config.COLLECTION_CACHE_REDIS_URL), config.COLLECTION_CACHE_TTL)
+    return LRUCache(config.COLLECTION_CACHE_SIZE, config.COLLECTION_CACHE_TTL)
+
+
+collection_cache = CollectionCache(_make_backend(), config.COLLECTION_CACHE_MAX_ITEMS)
+
+
+def use_memory_backend():
+    """Keep the cache in process, for event loops that must not block on Redis"""
+    if not isinstance(collection_cache.backend, LRUCache):
+        logger.info("Collection cache: using the in-process backend instead of redis")
+        collection_cache.backend = LRUCache(config.COLLECTION_CACHE_SIZE, config.COLLECTION_CACHE_TTL)
@@ -0,0 +1,100 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+Buffered responses at or above COMPRESSION_MIN_SIZE are compressed in one
+go; smaller bodies such as /api/health are sent as-is so they do not pay
+the CPU cost. Streamed responses (NDJSON listings) are compressed chunk by
+chunk with a sync flush, so each line still reaches the client promptly.
+Brotli is offered when the `brotli` package is installed, gzip otherwise.
+"""
+
+from flask import request
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised only without brotli
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/html', 'text/csv'}
+
+
+def _choose_encoding():
+    """Pick the best encoding the client accepts, or None"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = request.accept_encodings.best_match(offered)
+    return best if best in offered else None
+
+
+class _StreamCompressor:
+    """Incremental compressor exposing compress()/flush() for either encoding"""
+    
+    def __init__(self, encoding, config):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=config.BROTLI_QUALITY)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(config.COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+    
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it so the client can decode it right away"""
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def _compress_body(data: bytes, encoding, config) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=config.COMPRESSION_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, encoding, config):
+    compressor = _StreamCompressor(encoding, config)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+def init_compression(app, config):
+    """Register an after_request hook that compresses eligible responses"""
+    if not config.COMPRESSION_ENABLED:
+        return
+    
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding()
+        if encoding is None:
+            return response
+        
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, config)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config.COMPRESSION_MIN_SIZE:
+                return response
+            response.set_data(_compress_body(data, encoding, config))
+        
+        response.headers['Content-Encoding'] = encoding
+        return response
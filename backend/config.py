@@ -8,10 +8,98 @@ class Config:
     MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/card_vault')
     DATABASE_NAME = 'card_vault'
     
+    # MongoDB connection pool, per worker process. Timeouts are in ms; a
+    # socket timeout of 0 means none. MONGO_COMPRESSORS is a comma-separated
+    # preference list (zlib needs no extra package; snappy/zstd do).
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 0))
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', 'zlib')
+    MONGO_ZLIB_LEVEL = int(os.getenv('MONGO_ZLIB_LEVEL', 1))
+    # For development environments; set to false in production
+    MONGO_TLS_ALLOW_INVALID_CERTIFICATES = os.getenv('MONGO_TLS_ALLOW_INVALID_CERTIFICATES', 'true').lower() == 'true'
+    
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = 30 * 24 * 60 * 60  # 30 days
     
+    # Password hashing: bcrypt cost, dedicated worker threads, how many hashes
+    # may wait and how long (seconds) a request waits for its hash before
+    # new logins/signups get a 503 (raised to two measured hashes if shorter)
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 2))
+    BCRYPT_QUEUE_LIMIT = int(os.getenv('BCRYPT_QUEUE_LIMIT', 16))
+    BCRYPT_WAIT_TIMEOUT = float(os.getenv('BCRYPT_WAIT_TIMEOUT', 2))
+    
+    # Auth caches (entries, seconds)
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 15 * 60))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 5 * 60))
+    
+    # Pagination
+    CARDS_MAX_PAGE_SIZE = int(os.getenv('CARDS_MAX_PAGE_SIZE', 500))
+    SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', 20))
+    SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', 100))
+    
+    # Documents fetched per round trip when streaming NDJSON listings
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+    
+    # Response compression: bodies below COMPRESSION_MIN_SIZE bytes are sent as-is
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', 6))  # gzip, 1-9
+    BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))  # brotli, 0-11
+    
+    # Bulk card import
+    BULK_INSERT_BATCH_SIZE = int(os.getenv('BULK_INSERT_BATCH_SIZE', 1000))
+    BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', 50000))
+    BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', 1000))
+    
+    # Read-through cache for card and binder reads (COLLECTION_CACHE_BACKEND=memory per worker, or
+    # redis shared between workers; the ASGI app always uses memory); entries are tied to the
+    # user's change counter, so either backend is safe with several workers. Listings longer
+    # than COLLECTION_CACHE_MAX_ITEMS are not cached
+    COLLECTION_CACHE_BACKEND = os.getenv('COLLECTION_CACHE_BACKEND', 'memory')
+    COLLECTION_CACHE_REDIS_URL = os.getenv('COLLECTION_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    COLLECTION_CACHE_SIZE = int(os.getenv('COLLECTION_CACHE_SIZE', 10000))
+    COLLECTION_CACHE_TTL = int(os.getenv('COLLECTION_CACHE_TTL', 60))
+    COLLECTION_CACHE_MAX_ITEMS = int(os.getenv('COLLECTION_CACHE_MAX_ITEMS', 1000))
+    
+    # Shared card catalog entries cached per process (entries, seconds); entries never change once created
+    CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', 50000))
+    CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 3600))
+    
+    # Price feeds: rows per catalog lookup and cards per bulk_write during revaluation;
+    # portfolio history defaults to the last PRICE_HISTORY_DEFAULT_DAYS and at most
+    # PRICE_HISTORY_MAX_POINTS buckets
+    PRICE_FEED_CHUNK_SIZE = int(os.getenv('PRICE_FEED_CHUNK_SIZE', 1000))
+    PRICE_HISTORY_DEFAULT_DAYS = int(os.getenv('PRICE_HISTORY_DEFAULT_DAYS', 90))
+    PRICE_HISTORY_MAX_POINTS = int(os.getenv('PRICE_HISTORY_MAX_POINTS', 1000))
+    
+    # Delta sync: changes per stream per response, how long deletes are remembered,
+    # and how far back (seconds) a caught-up client resumes to cover clock skew
+    SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+    SYNC_TOMBSTONE_TTL = int(os.getenv('SYNC_TOMBSTONE_TTL', 30 * 24 * 60 * 60))
+    SYNC_SAFETY_WINDOW = int(os.getenv('SYNC_SAFETY_WINDOW', 5))
+    
+    # Card image uploads: storage directory, largest accepted body (bytes), thumbnail
+    # widths rendered as WebP, and the process pool that renders them
+    UPLOAD_DIR = os.getenv('UPLOAD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+    UPLOAD_THUMBNAIL_SIZES = os.getenv('UPLOAD_THUMBNAIL_SIZES', '160,320,640')
+    UPLOAD_THUMBNAIL_QUALITY = int(os.getenv('UPLOAD_THUMBNAIL_QUALITY', 80))
+    UPLOAD_THUMBNAIL_WORKERS = int(os.getenv('UPLOAD_THUMBNAIL_WORKERS', 2))
+    
+    # Prometheus metrics: requests are always timed when enabled, but /api/metrics is only
+    # served when METRICS_TOKEN is set, and scrapers must send it as a bearer token
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    
     # CORS
     CORS_ORIGINS = os.getenv(
         'CORS_ORIGINS',
@@ -0,0 +1,601 @@
+"""
+User, card and binder data access shared by the Flask and ASGI apps.
+
+Every function here that reads or writes Mongo is a mongo_ops generator:
+the Flask routes drive it with mongo_ops.run on pymongo and asgi.py with
+mongo_ops.run_async on the async driver. Each app keeps its own request
+parsing and response plumbing; the queries, validation, summary deltas and
+change counters between the two live here, so the serving modes cannot
+drift apart.
+"""
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from datetime import datetime
+from auth import user_cache
+from binder_slots import apply_operations, dense_view, get_cells, present, to_cells
+from card_query import build_card_query
+from card_search import HIDDEN_FIELDS, search_fields, strip_search_fields
+from collection_cache import collection_cache
+from config import get_config
+from mongo_ops import call
+from pagination import encode_cursor, parse_fields, parse_limit
+import card_stats
+import catalog
+import delta_sync
+import math
+import versioning
+
+config = get_config()
+
+# Fields a client may set on a card
+CARD_FIELDS = ['name', 'set', 'card_number', 'image_url', 'is_graded',
+               'grading', 'condition', 'purchase_price', 'estimated_value',
+               'quantity', 'notes', 'tags']
+
+# Fields a client may ask for with ?fields=
+PROJECTABLE_FIELDS = CARD_FIELDS + ['catalog_id', 'valued_at', 'user_id', 'created_at', 'updated_at']
+
+# Binder fields a client may change with PUT
+BINDER_FIELDS = ['name', 'rows', 'columns']
+
+# Card fields inlined into slots by ?expand=cards
+CARD_SUMMARY_FIELDS = ['name', 'set', 'card_number', 'image_url', 'condition', 'is_graded', 'estimated_value']
+
+# Binder listings are newest first
+BINDER_ORDER = [('created_at', -1)]
+
+
+class VersionConflict(Exception):
+    """Raised when a binder changed since the version a slot patch was based on"""
+
+    def __init__(self, version=None):
+        super().__init__('Binder was modified')
+        self.version = version
+
+
+class CardError(ValueError):
+    """Raised when a card update has a field of the wrong type"""
+    pass
+
+
+class BinderError(ValueError):
+    """Raised when a binder update has invalid dimensions or a slot grid that does not fit them"""
+    pass
+
+
+# Users
+
+def find_user(username: str):
+    """Return the stored user, password hash included, for a username"""
+    return (yield call('users', 'find_one', {'username': username}))
+
+
+def create_user(username: str, hashed_password: str):
+    """Insert a new account and return its ID as a string"""
+    user_doc = {
+        'username': username,
+        'password': hashed_password,
+        'is_demo': False,
+        'created_at': ObjectId().generation_time,  # Use ObjectId generation time for consistency
+    }
+    result = yield call('users', 'insert_one', user_doc)
+    return str(result.inserted_id)
+
+
+def store_rehash(user, new_hash: str):
+    """Replace a user's password hash unless it changed since the login that produced new_hash"""
+    yield call('users', 'update_one', {'_id': user['_id'], 'password': user['password']}, {'$set': {'password': new_hash}})
+
+
+def get_public_user(user_id: str):
+    """Return the public user record served by /api/auth/me, or None for an unknown user"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user_doc = yield call('users', 'find_one', {'_id': ObjectId(user_id)}, {'username': 1})
+        if not user_doc:
+            return None
+
+        user = {
+            'id': user_doc['_id'],
+            'username': user_doc['username']
+        }
+        user_cache.set(user_id, user)
+    return user
+
+
+# Cards
+
+def parse_card_list_args(args, user_id):
+    """Parse GET /api/cards query parameters into (limit, projection, card_query)
+
+    Raises PaginationError for malformed values.
+    """
+    limit = parse_limit(args.get('limit'), config.CARDS_MAX_PAGE_SIZE)
+    projection = parse_fields(args.get('fields'), PROJECTABLE_FIELDS)
+    return limit, projection, build_card_query(args, user_id)
+
+
+def card_list_projection(card_query, projection):
+    """Return the projection for a card listing and the fields added only for paging or the catalog
+
+    The sort field is needed to build the next cursor, and catalog_id to
+    fill in catalog fields, even if not requested; fields that had to be
+    added are returned so they can be dropped again.
+    """
+    sort_field = card_query.sort_field
+    extra_fields = []
+    if projection:
+        if sort_field not in projection:
+            projection[sort_field] = 1
+            extra_fields.append(sort_field)
+        if 'catalog_id' not in projection and any(field in projection for field in catalog.CATALOG_FIELDS):
+            projection['catalog_id'] = 1
+            extra_fields.append('catalog_id')
+    else:
+        projection = {field: 0 for field in HIDDEN_FIELDS if field != sort_field}
+    return projection or None, extra_fields
+
+
+def strip_list_fields(card, extra_fields):
+    """Drop the fields a listing added to its projection, and the search copies, from a card"""
+    for field in extra_fields:
+        card.pop(field, None)
+    return strip_search_fields(card)
+
+
+def list_cards(user_id, card_query, projection, limit):
+    """Return one page of cards as (cards, next_cursor)"""
+    version = yield from versioning.current_ops(user_id, versioning.CARDS)
+    cache_key = collection_cache.listing_key(
+        collection_cache.CARDS, user_id, version, card_query.filter, card_query.sort, projection, limit
+    )
+    page = collection_cache.get_listing(collection_cache.CARDS, cache_key)
+    if page is not None:
+        return page
+
+    requested = set(projection) if projection else None
+    projection, extra_fields = card_list_projection(card_query, projection)
+
+    # Walk the planned index in sort order so pages resume by range, fetching
+    # one extra document to know whether another page exists
+    cards = yield call(
+        'cards', 'find', card_query.filter, projection,
+        sort=card_query.sort, hint=card_query.hint, limit=limit + 1 if limit else 0
+    )
+
+    next_cursor = None
+    if limit and len(cards) > limit:
+        cards = cards[:limit]
+        last = cards[-1]
+        if card_query.sort_field == '_id':
+            next_cursor = encode_cursor(last['_id'])
+        else:
+            next_cursor = encode_cursor(last.get(card_query.sort_field), last['_id'])
+
+    yield from catalog.attach_ops(cards, requested)
+    for card in cards:
+        strip_list_fields(card, extra_fields)
+    collection_cache.set_listing(cache_key, (cards, next_cursor), len(cards))
+    return cards, next_cursor
+
+
+def get_card(user_id, card_oid):
+    """Return one of the user's cards, or None"""
+    version = yield from versioning.current_ops(user_id, versioning.CARDS)
+    card = collection_cache.get_document(collection_cache.CARD, user_id, card_oid, version)
+    if card is None:
+        # A copy, since some drivers (mongomock) add _id to the projection they are given
+        card = yield call('cards', 'find_one', {'_id': card_oid, 'user_id': user_id}, dict(HIDDEN_FIELDS))
+        if card:
+            yield from catalog.attach_ops([card])
+        collection_cache.set_document(collection_cache.CARD, user_id, card_oid, version, card)
+    return card
+
+
+def invalidate_cards(user_id, card_oids=()):
+    """Drop cached copies of the given cards; listings are orphaned by the change counter bump"""
+    collection_cache.invalidate_documents(collection_cache.CARD, user_id, card_oids)
+
+
+def invalidate_binders(user_id, binder_oids=()):
+    """Drop cached copies of the given binders; listings are orphaned by the change counter bump"""
+    collection_cache.invalidate_documents(collection_cache.BINDER, user_id, binder_oids, variants=(False, True))
+
+
+def _text(value, required=False):
+    return isinstance(value, str) and (bool(value.strip()) or not required)
+
+
+def _amount(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+
+
+# Card field -> (check, message when a provided value fails it)
+CARD_FIELD_CHECKS = {
+    'name': (lambda value: _text(value, required=True), 'name must be a non-empty string'),
+    'set': (lambda value: _text(value, required=True), 'set must be a non-empty string'),
+    'card_number': (
+        lambda value: _text(value, required=True) or (isinstance(value, int) and not isinstance(value, bool)),
+        'card_number must be a string or integer'
+    ),
+    'image_url': (lambda value: value is None or _text(value), 'image_url must be a string'),
+    'is_graded': (lambda value: isinstance(value, bool), 'is_graded must be true or false'),
+    'grading': (lambda value: value is None or isinstance(value, dict), 'grading must be an object'),
+    'condition': (lambda value: value is None or _text(value), 'condition must be a string'),
+    'purchase_price': (_amount, 'purchase_price must be a non-negative number'),
+    'estimated_value': (_amount, 'estimated_value must be a non-negative number'),
+    'quantity': (
+        lambda value: isinstance(value, int) and not isinstance(value, bool) and value >= 0,
+        'quantity must be a non-negative integer'
+    ),
+    'notes': (lambda value: value is None or _text(value), 'notes must be a string'),
+    'tags': (
+        lambda value: isinstance(value, list) and all(isinstance(tag, str) for tag in value),
+        'tags must be a list of strings'
+    ),
+}
+
+
+def card_field_error(data):
+    """Return the error for the first provided card field of the wrong type, or None
+
+    Prices and quantities feed the summary's $inc deltas and the listing
+    sorts, so every write path checks them the same way.
+    """
+    for field, (check, message) in CARD_FIELD_CHECKS.items():
+        if field in data and not check(data[field]):
+            return message
+    return None
+
+
+def build_card_doc(data, user_id):
+    """Validate a card payload and build the document to insert
+
+    Returns (card_doc, None) on success or (None, error_message) when the
+    payload is rejected.
+    """
+    if not isinstance(data, dict):
+        return None, 'Card must be a JSON object'
+
+    # Validate required fields
+    if not data.get('name') or not data.get('set') or data.get('card_number') is None:
+        return None, 'Name, set, and card_number are required'
+    error = card_field_error(data)
+    if error:
+        return None, error
+
+    card_doc = {
+        'user_id': user_id,
+        'name': data.get('name'),
+        'set': data.get('set'),
+        'card_number': data.get('card_number'),
+        'image_url': data.get('image_url', ''),
+        'is_graded': data.get('is_graded', False),
+        'grading': data.get('grading', {}),
+        'condition': data.get('condition', 'Raw'),
+        'purchase_price': data.get('purchase_price', 0),
+        'estimated_value': data.get('estimated_value', 0),
+        'quantity': data.get('quantity', 1),
+        'notes': data.get('notes', ''),
+        'tags': data.get('tags', []),
+        'created_at': datetime.utcnow(),
+        'updated_at': datetime.utcnow(),
+    }
+    card_doc.update(search_fields(card_doc))
+    return card_doc, None
+
+
+def insert_card(user_id, card_doc):
+    """Link a card built by build_card_doc to the catalog, insert it and return it as the API shows it"""
+    entries = yield from catalog.link_ops([card_doc])
+    yield call('cards', 'insert_one', card_doc)
+    invalidate_cards(user_id)
+    yield from card_stats.record_change_ops(user_id, after=card_doc)
+    yield from versioning.bump_ops(user_id, versioning.CARDS)
+    return strip_search_fields(catalog.merge(card_doc, entries[card_doc['catalog_id']]))
+
+
+def update_card(user_id, card_oid, data):
+    """Apply the provided card fields, returning the updated card or None if not found
+
+    Raises CardError when a provided field has the wrong type.
+    """
+    if not isinstance(data, dict):
+        raise CardError('Request body must be a JSON object')
+    error = card_field_error(data)
+    if error:
+        raise CardError(error)
+    update_doc = {
+        'updated_at': datetime.utcnow(),
+    }
+
+    # Only update provided fields
+    for field in CARD_FIELDS:
+        if field in data:
+            update_doc[field] = data[field]
+    update_doc.update(search_fields(update_doc))
+    update = {'$set': update_doc}
+
+    # Changing what the card is re-points it at another catalog entry
+    if any(field in data for field in catalog.CATALOG_FIELDS):
+        current = yield call(
+            'cards', 'find_one',
+            {'_id': card_oid, 'user_id': user_id},
+            {field: 1 for field in catalog.CATALOG_FIELDS + ['catalog_id']}
+        )
+        if not current:
+            return None
+        catalog_set, update['$unset'] = yield from catalog.rebase_ops(current, data)
+        for field in catalog.CATALOG_FIELDS:
+            update_doc.pop(field, None)
+        update_doc.update(catalog_set)
+
+    # Ownership check and write in one round trip; the pre-image feeds the stats delta
+    card = yield call(
+        'cards', 'find_one_and_update',
+        {'_id': card_oid, 'user_id': user_id},
+        update,
+        return_document=ReturnDocument.BEFORE
+    )
+    if not card:
+        return None
+    invalidate_cards(user_id, [card_oid])
+
+    updated_card = dict(card, **update_doc)
+    for field in update.get('$unset', ()):
+        updated_card.pop(field, None)
+    yield from card_stats.record_change_ops(user_id, before=card, after=updated_card)
+    yield from versioning.bump_ops(user_id, versioning.CARDS)
+    yield from catalog.attach_ops([updated_card])
+    return strip_search_fields(updated_card)
+
+
+def delete_card(user_id, card_oid):
+    """Delete one of the user's cards, returning False if there was no such card"""
+    # Ownership check and delete in one round trip
+    card = yield call(
+        'cards', 'find_one_and_delete',
+        {'_id': card_oid, 'user_id': user_id},
+        projection={field: 1 for field in card_stats.STAT_FIELDS}
+    )
+    if not card:
+        return False
+    invalidate_cards(user_id, [card_oid])
+
+    yield from card_stats.record_change_ops(user_id, before=card)
+    yield from delta_sync.record_deletions_ops(user_id, delta_sync.CARDS, [card_oid])
+    yield from versioning.bump_ops(user_id, versioning.CARDS)
+    return True
+
+
+# Binders
+
+def expand_slots(user_id, slots):
+    """Replace card IDs in a slot grid with card summaries using one $in query"""
+    card_oids = set()
+    for row in slots:
+        for card_id in row:
+            if card_id and ObjectId.is_valid(card_id):
+                card_oids.add(ObjectId(card_id))
+
+    cards = {}
+    if card_oids:
+        projection = {field: 1 for field in CARD_SUMMARY_FIELDS + ['catalog_id']}
+        found = yield call('cards', 'find', {'_id': {'$in': list(card_oids)}, 'user_id': user_id}, projection)
+        yield from catalog.attach_ops(found, CARD_SUMMARY_FIELDS)
+        for card in found:
+            cards[str(card['_id'])] = card
+
+    # Slots pointing at deleted or foreign cards are flagged rather than dropped
+    return [
+        [cards.get(card_id, {'_id': card_id, 'missing': True}) if card_id else None for card_id in row]
+        for row in slots
+    ]
+
+
+def list_binders(user_id, sparse: bool = False):
+    """Return all of the user's binders, newest first"""
+    version = yield from versioning.current_ops(user_id, versioning.BINDERS)
+    cache_key = collection_cache.listing_key(collection_cache.BINDERS, user_id, version, sparse)
+    binders = collection_cache.get_listing(collection_cache.BINDERS, cache_key)
+    if binders is None:
+        binders = yield call('binders', 'find', {'user_id': user_id}, sort=BINDER_ORDER)
+        binders = [present(binder, sparse) for binder in binders]
+        collection_cache.set_listing(cache_key, binders, len(binders))
+    return binders
+
+
+def get_binder(user_id, binder_oid, expand: bool = False, sparse: bool = False):
+    """Return one of the user's binders, or None
+
+    With expand, the dense slot grid holds card summaries instead of IDs;
+    expanded views depend on the cards too, so they are not collection_cache.
+    """
+    if not expand:
+        version = yield from versioning.current_ops(user_id, versioning.BINDERS)
+        binder = collection_cache.get_document(collection_cache.BINDER, user_id, binder_oid, version, sparse)
+        if binder is not None:
+            return binder
+
+    binder = yield call('binders', 'find_one', {'_id': binder_oid, 'user_id': user_id})
+    if not binder:
+        return None
+
+    if expand:
+        dense_view(binder)
+        binder['slots'] = yield from expand_slots(user_id, binder.get('slots') or [])
+        return binder
+    binder = present(binder, sparse)
+    collection_cache.set_document(collection_cache.BINDER, user_id, binder_oid, version, binder, sparse)
+    return binder
+
+
+def _dimension(value):
+    """Return a binder dimension as a positive int, or None if it is not one"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        return None
+    return value
+
+
+def _check_grid(slots, rows: int, columns: int):
+    if not isinstance(slots, list) or len(slots) > rows:
+        raise BinderError(f'slots must be a list of at most {rows} rows')
+    for row in slots:
+        if row is not None and (not isinstance(row, list) or len(row) > columns):
+            raise BinderError(f'Each slot row must be a list of at most {columns} card IDs')
+
+
+def build_binder_doc(data, user_id):
+    """Validate a binder payload and build the document to insert
+
+    Returns (binder_doc, None) on success or (None, error_message) when the
+    payload is rejected.
+    """
+    # Validate required fields
+    if not isinstance(data, dict) or not data.get('name') or not data.get('rows') or not data.get('columns'):
+        return None, 'Name, rows, and columns are required'
+    rows, columns = _dimension(data['rows']), _dimension(data['columns'])
+    if rows is None or columns is None:
+        return None, 'rows and columns must be positive integers'
+
+    # Empty binders store no slots at all; only occupied positions are kept
+    binder_doc = {
+        'user_id': user_id,
+        'name': data.get('name'),
+        'rows': rows,
+        'columns': columns,
+        'cells': {},
+        'version': 0,
+        'created_at': datetime.utcnow(),
+        'updated_at': datetime.utcnow(),
+    }
+    return binder_doc, None
+
+
+def insert_binder(user_id, binder_doc, sparse: bool = False):
+    """Insert a binder built by build_binder_doc and return it as the API shows it"""
+    yield call('binders', 'insert_one', binder_doc)
+    invalidate_binders(user_id)
+    yield from versioning.bump_ops(user_id, versioning.BINDERS)
+    return present(binder_doc, sparse)
+
+
+def update_binder(user_id, binder_oid, data, sparse: bool = False):
+    """Apply the provided binder fields, returning the updated binder or None if not found
+
+    Raises BinderError when rows or columns are not positive integers or
+    a provided slot grid does not fit the binder.
+    """
+    if not isinstance(data, dict):
+        raise BinderError('Request body must be a JSON object')
+    update_doc = {
+        'updated_at': datetime.utcnow(),
+    }
+
+    # Only update provided fields
+    for field in BINDER_FIELDS:
+        if field in data:
+            update_doc[field] = data[field]
+    for field in ('rows', 'columns'):
+        if field in data:
+            update_doc[field] = _dimension(data[field])
+            if update_doc[field] is None:
+                raise BinderError(f'{field} must be a positive integer')
+
+    update = {'$set': update_doc, '$inc': {'version': 1}}
+
+    # A full grid is stored sparsely, replacing any legacy dense layout
+    if 'slots' in data:
+        size = {field: update_doc[field] for field in ('rows', 'columns') if field in update_doc}
+        if len(size) < 2:
+            stored = yield call(
+                'binders', 'find_one', {'_id': binder_oid, 'user_id': user_id}, {'rows': 1, 'columns': 1}
+            )
+            if not stored:
+                return None
+            size = dict(stored, **size)
+        _check_grid(data['slots'], size.get('rows', 0), size.get('columns', 0))
+        update_doc['cells'] = to_cells(data['slots'])
+        update['$unset'] = {'slots': ''}
+
+    # Ownership check, write and re-read in one round trip
+    binder = yield call(
+        'binders', 'find_one_and_update',
+        {'_id': binder_oid, 'user_id': user_id},
+        update,
+        return_document=ReturnDocument.AFTER
+    )
+    if not binder:
+        return None
+    invalidate_binders(user_id, [binder_oid])
+
+    yield from versioning.bump_ops(user_id, versioning.BINDERS)
+    return present(binder, sparse)
+
+
+def patch_binder_slots(user_id, binder_oid, expected_version: int, operations):
+    """Apply slot operations to a binder at expected_version
+
+    Returns (new_version, touched_cells), or None if the user has no such
+    binder. Raises VersionConflict when the binder is at another version
+    and SlotPatchError when an operation does not fit it.
+    """
+    binder = yield call(
+        'binders', 'find_one',
+        {'_id': binder_oid, 'user_id': user_id},
+        {'rows': 1, 'columns': 1, 'cells': 1, 'slots': 1, 'version': 1}
+    )
+    if not binder:
+        return None
+
+    version = binder.get('version', 0)
+    if expected_version != version:
+        raise VersionConflict(version)
+
+    cells = get_cells(binder)
+    touched = apply_operations(cells, operations, binder)
+
+    update = {
+        '$set': {'updated_at': datetime.utcnow()},
+        '$inc': {'version': 1},
+    }
+    if 'cells' in binder:
+        for key in touched:
+            if key in cells:
+                update['$set'][f'cells.{key}'] = cells[key]
+            else:
+                update.setdefault('$unset', {})[f'cells.{key}'] = ''
+    else:
+        # First patch of a legacy dense binder migrates it to sparse storage
+        update['$set']['cells'] = cells
+        update['$unset'] = {'slots': ''}
+
+    # Binders saved before versioning have no version field; None matches those
+    version_filter = version if version else {'$in': [0, None]}
+    result = yield call(
+        'binders', 'update_one',
+        {'_id': binder_oid, 'user_id': user_id, 'version': version_filter},
+        update
+    )
+    if result.matched_count == 0:
+        raise VersionConflict()
+    invalidate_binders(user_id, [binder_oid])
+
+    yield from versioning.bump_ops(user_id, versioning.BINDERS)
+    return version + 1, {key: cells.get(key) for key in sorted(touched)}
+
+
+def delete_binder(user_id, binder_oid):
+    """Delete one of the user's binders, returning False if there was no such binder"""
+    # Ownership check and delete in one round trip
+    binder = yield call('binders', 'find_one_and_delete', {'_id': binder_oid, 'user_id': user_id}, projection={'_id': 1})
+    if not binder:
+        return False
+    invalidate_binders(user_id, [binder_oid])
+
+    yield from delta_sync.record_deletions_ops(user_id, delta_sync.BINDERS, [binder_oid])
+    yield from versioning.bump_ops(user_id, versioning.BINDERS)
+    return True
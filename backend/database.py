@@ -1,30 +1,59 @@
 from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError
+from card_query import LIST_INDEXES
 from config import get_config
+from metrics import command_metrics
+from pool_monitor import pool_monitor
 import logging
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
 config = get_config()
 client = None
 db = None
+# Process that created `client`; a forked worker must not reuse its parent's pool
+client_pid = None
+_connect_lock = threading.Lock()
+
+
+def client_options() -> dict:
+    """MongoClient keyword arguments from config (also used by the async client in asgi.py)"""
+    options = {
+        'maxPoolSize': config.MONGO_MAX_POOL_SIZE,
+        'minPoolSize': config.MONGO_MIN_POOL_SIZE,
+        'maxIdleTimeMS': config.MONGO_MAX_IDLE_TIME_MS or None,
+        'waitQueueTimeoutMS': config.MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+        'serverSelectionTimeoutMS': config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'connectTimeoutMS': config.MONGO_CONNECT_TIMEOUT_MS,
+        'socketTimeoutMS': config.MONGO_SOCKET_TIMEOUT_MS or None,
+        'event_listeners': [pool_monitor, command_metrics],
+    }
+    
+    compressors = [name.strip() for name in config.MONGO_COMPRESSORS.split(',') if name.strip()]
+    if compressors:
+        options['compressors'] = compressors
+        if 'zlib' in compressors:
+            options['zlibCompressionLevel'] = config.MONGO_ZLIB_LEVEL
+    
+    # For development environments, disable SSL cert verification
+    # In production, this should be turned off for security
+    if config.MONGO_TLS_ALLOW_INVALID_CERTIFICATES:
+        options['tlsAllowInvalidCertificates'] = True
+    return options
 
 
 def connect_db():
-    """Connect to MongoDB"""
-    global client, db
+    """Connect to MongoDB, creating this process's client and pool"""
+    global client, db, client_pid
     try:
-        # For development environments, disable SSL cert verification
-        # In production, this should be removed for security
-        client = MongoClient(
-            config.MONGODB_URI, 
-            serverSelectionTimeoutMS=30000,
-            tlsAllowInvalidCertificates=True
-        )
+        client = MongoClient(config.MONGODB_URI, **client_options())
         db = client[config.DATABASE_NAME]
+        client_pid = os.getpid()
         # Verify connection
         client.admin.command('ping')
-        logger.info(f"Connected to MongoDB: {config.DATABASE_NAME}")
+        logger.info(f"Connected to MongoDB: {config.DATABASE_NAME} (pid {client_pid})")
         return db
     except ServerSelectionTimeoutError:
         logger.error("Failed to connect to MongoDB. Make sure MongoDB is running.")
@@ -32,12 +61,37 @@ def connect_db():
 
 
 def get_db():
-    """Get database instance"""
-    if db is None:
-        connect_db()
+    """Get database instance, connecting on first use in each process"""
+    if db is None or client_pid != os.getpid():
+        with _connect_lock:
+            if db is None or client_pid != os.getpid():
+                connect_db()
     return db
 
 
+def _after_fork_in_child():
+    """Drop the parent's client in a forked worker (e.g. gunicorn --preload)
+
+    The child connects on its first get_db() call. The inherited client is
+    not closed, as that would tear down sockets the parent still uses.
+    """
+    global client, db, client_pid, _connect_lock
+    client = None
+    db = None
+    client_pid = None
+    _connect_lock = threading.Lock()
+    pool_monitor.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def pool_stats() -> dict:
+    """Return this process's connection pool counters"""
+    return pool_monitor.stats(config.MONGO_MAX_POOL_SIZE)
+
+
 def close_db():
     """Close MongoDB connection"""
     global client
@@ -46,19 +100,54 @@ def close_db():
         logger.info("MongoDB connection closed")
 
 
-def create_indexes():
+def create_indexes(db_instance=None):
     """Create database indexes for better query performance"""
-    db_instance = get_db()
+    if db_instance is None:
+        db_instance = get_db()
     
     # Users collection indexes
     db_instance.users.create_index('username', unique=True)
     
     # Cards collection indexes - store user_id to support multi-tenant
     db_instance.cards.create_index('user_id')
-    db_instance.cards.create_index([('user_id', 1), ('set', 1)])
+    # One (user_id, <field>, _id) index per supported filter/sort of card
+    # listings, (user_id, <filter>, <sort>, _id) for each filter under each
+    # sort, plus (user_id, _id) for keyset pagination in insertion order
+    for keys in LIST_INDEXES:
+        db_instance.cards.create_index(keys)
+    
+    # Search: full-text over name/set/notes/tags scoped by user, plus
+    # normalized name/set for index-bounded prefix autocomplete. Names live
+    # in the catalog, so the text index covers the name_lc kept on each card;
+    # an older index over name is replaced.
+    text_index = db_instance.cards.index_information().get('cards_text')
+    if text_index and 'name' in text_index.get('weights', {}):
+        db_instance.cards.drop_index('cards_text')
+    db_instance.cards.create_index(
+        [('user_id', 1), ('name_lc', 'text'), ('set', 'text'), ('notes', 'text'), ('tags', 'text')],
+        name='cards_text',
+        weights={'name_lc': 10, 'set': 5, 'tags': 3, 'notes': 1}
+    )
+    # (user_id, name_lc, _id) is one of LIST_INDEXES
+    db_instance.cards.create_index([('user_id', 1), ('set_lc', 1), ('_id', 1)])
+    
+    # Shared catalog: one entry per printing, and the cards of each printing for revaluation.
+    # card_number is always written as catalog.normalize_number() text, so the unique
+    # index sees 4, "4" and " 4" as one printing
+    db_instance.catalog.create_index([('set', 1), ('card_number', 1)], unique=True)
+    db_instance.cards.create_index('catalog_id')
+    
+    # price_history (a time-series collection) is created by the revaluation job
     
     # Binders collection indexes
     db_instance.binders.create_index('user_id')
     db_instance.binders.create_index([('user_id', 1), ('created_at', -1)])
     
+    # Delta sync: changes in (updated_at, _id) order per user, and deletions
+    # kept in tombstones until the TTL monitor expires them
+    db_instance.cards.create_index([('user_id', 1), ('updated_at', 1), ('_id', 1)])
+    db_instance.binders.create_index([('user_id', 1), ('updated_at', 1), ('_id', 1)])
+    db_instance.tombstones.create_index([('user_id', 1), ('deleted_at', 1), ('_id', 1)])
+    db_instance.tombstones.create_index('deleted_at', expireAfterSeconds=config.SYNC_TOMBSTONE_TTL)
+    
     logger.info("Database indexes created")
@@ -0,0 +1,210 @@
+"""
+Delta sync for offline-capable clients: GET /api/sync?since=<token>.
+
+Cards and binders carry a native `updated_at` datetime, indexed as
+(user_id, updated_at, _id), and deleting either leaves a document in
+`tombstones` that a TTL index expires after SYNC_TOMBSTONE_TTL. A sync
+token records, for each of the three streams, the (timestamp, _id) of the
+last document the client has seen, so the next sync is an indexed range
+read of what changed after it.
+
+Timestamps come from the app servers' clocks, and a write can commit
+slightly after the time it stamped. A stream the client has caught up on
+therefore resumes SYNC_SAFETY_WINDOW seconds in the past: a few recent
+documents may be sent twice, none are skipped. Clients apply changes as
+upserts by _id, so repeats are harmless.
+
+Documents written before timestamps were native still hold ISO strings,
+which range queries on dates never match; run this module once to convert
+them.
+"""
+
+from bson import json_util
+from bson.objectid import ObjectId
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from binder_slots import present
+from card_search import HIDDEN_FIELDS, strip_search_fields
+from config import get_config
+from mongo_ops import call, run
+from pagination import PaginationError
+import base64
+import catalog
+import logging
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+CARDS = 'cards'
+BINDERS = 'binders'
+
+# stream name -> (collection, timestamp field)
+STREAMS = {
+    CARDS: ('cards', 'updated_at'),
+    BINDERS: ('binders', 'updated_at'),
+    'deleted': ('tombstones', 'deleted_at'),
+}
+
+
+class SyncTokenExpired(Exception):
+    """Raised when a token predates the tombstones still kept, so deletes may have been missed"""
+    pass
+
+
+# Tombstones
+
+def tombstone(user_id, kind: str, item_id) -> dict:
+    return {'user_id': user_id, 'kind': kind, 'item_id': str(item_id), 'deleted_at': datetime.utcnow()}
+
+
+def record_deletions_ops(user_id, kind: str, item_ids):
+    """Leave a tombstone for each deleted card or binder"""
+    docs = [tombstone(user_id, kind, item_id) for item_id in item_ids]
+    if docs:
+        yield call('tombstones', 'insert_many', docs, ordered=False)
+
+
+def record_deletions(db, user_id, kind: str, item_ids):
+    run(record_deletions_ops(user_id, kind, item_ids), db)
+
+
+# Tokens
+
+def encode_token(positions: dict) -> str:
+    """Encode {stream: (timestamp, _id) or None} as an opaque token"""
+    raw = json_util.dumps({stream: list(position) if position else None for stream, position in positions.items()})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token: str) -> dict:
+    """Decode a token from encode_token; raises PaginationError when it is malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise PaginationError('Invalid sync token')
+    if not isinstance(values, dict) or set(values) != set(STREAMS):
+        raise PaginationError('Invalid sync token')
+
+    positions = {}
+    for stream, position in values.items():
+        if position is None:
+            positions[stream] = None
+            continue
+        if (not isinstance(position, list) or len(position) != 2 or not isinstance(position[0], datetime)
+                or not (position[1] is None or isinstance(position[1], ObjectId))):
+            raise PaginationError('Invalid sync token')
+        positions[stream] = (position[0], position[1])
+    return positions
+
+
+def _after(field: str, position) -> dict:
+    """Filter for documents after a (timestamp, _id) position in (field, _id) order"""
+    if position is None:
+        return {}
+    timestamp, last_id = position
+    if last_id is None:
+        return {field: {'$gte': timestamp}}
+    # The first clause gives index bounds, the $or resolves ties on _id
+    return {'$and': [
+        {field: {'$gte': timestamp}},
+        {'$or': [{field: {'$gt': timestamp}}, {field: timestamp, '_id': {'$gt': last_id}}]},
+    ]}
+
+
+def _read_stream(user_id, stream: str, position, limit: int, projection=None):
+    """Return (documents, truncated) for one stream after position"""
+    collection, field = STREAMS[stream]
+    query = {'user_id': user_id}
+    query.update(_after(field, position))
+    docs = yield call(
+        collection, 'find', query, projection,
+        sort=[(field, 1), ('_id', 1)], hint=[('user_id', 1), (field, 1), ('_id', 1)], limit=limit + 1
+    )
+    return docs[:limit], len(docs) > limit
+
+
+def changes(user_id, token=None, limit=None, sparse: bool = False):
+    """Return the cards, binders and deletions after a sync token
+
+    Without a token every card and binder is returned (a full sync) and
+    deletions start from now. Raises PaginationError for a malformed token
+    and SyncTokenExpired when its tombstones may already have expired.
+    """
+    limit = limit or config.SYNC_PAGE_SIZE
+    now = datetime.utcnow()
+    resume_at = now - timedelta(seconds=config.SYNC_SAFETY_WINDOW)
+
+    if token:
+        positions = decode_token(token)
+        oldest = positions['deleted']
+        if oldest is None or oldest[0] < now - timedelta(seconds=config.SYNC_TOMBSTONE_TTL):
+            raise SyncTokenExpired()
+    else:
+        positions = {CARDS: None, BINDERS: None, 'deleted': (resume_at, None)}
+
+    response = {'deleted': {CARDS: [], BINDERS: []}}
+    next_positions = {}
+    has_more = False
+    for stream in STREAMS:
+        projection = dict(HIDDEN_FIELDS) if stream == CARDS else None
+        docs, truncated = yield from _read_stream(user_id, stream, positions[stream], limit, projection)
+        field = STREAMS[stream][1]
+
+        position = positions[stream]
+        if truncated:
+            has_more = True
+            position = (docs[-1][field], docs[-1]['_id'])
+        elif position is None or position[0] < resume_at:
+            position = (resume_at, None)
+        next_positions[stream] = position
+
+        if stream == CARDS:
+            yield from catalog.attach_ops(docs)
+            response[CARDS] = [strip_search_fields(card) for card in docs]
+        elif stream == BINDERS:
+            response[BINDERS] = [present(binder, sparse) for binder in docs]
+        else:
+            for doc in docs:
+                response['deleted'].setdefault(doc['kind'], []).append(doc['item_id'])
+
+    response['next_token'] = encode_token(next_positions)
+    response['has_more'] = has_more
+    return response
+
+
+# Migration
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            return None
+    return value
+
+
+def migrate_timestamps(db, batch_size: int = 1000) -> int:
+    """Convert ISO string created_at/updated_at on cards and binders to native datetimes"""
+    migrated = 0
+    legacy = {'$or': [{'created_at': {'$type': 'string'}}, {'updated_at': {'$type': 'string'}},
+                      {'updated_at': {'$exists': False}}]}
+    for collection in ('cards', 'binders'):
+        requests = []
+        for doc in db[collection].find(legacy, {'created_at': 1, 'updated_at': 1}):
+            created_at = _as_datetime(doc.get('created_at')) or doc['_id'].generation_time.replace(tzinfo=None)
+            updated_at = _as_datetime(doc.get('updated_at')) or created_at
+            requests.append(UpdateOne({'_id': doc['_id']}, {'$set': {'created_at': created_at, 'updated_at': updated_at}}))
+            if len(requests) >= batch_size:
+                migrated += db[collection].bulk_write(requests, ordered=False).modified_count
+                requests = []
+        if requests:
+            migrated += db[collection].bulk_write(requests, ordered=False).modified_count
+    logger.info(f"Converted timestamps on {migrated} cards and binders")
+    return migrated
+
+
+if __name__ == '__main__':
+    from database import get_db
+    logging.basicConfig(level=logging.INFO)
+    migrate_timestamps(get_db())
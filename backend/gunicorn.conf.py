@@ -0,0 +1,25 @@
+"""
+gunicorn settings, read automatically when gunicorn is started from this directory.
+
+With PROMETHEUS_MULTIPROC_DIR set, every worker writes its metrics to files
+there and /api/metrics sums them; the directory is emptied when the server
+starts, and the files of exited workers stop counting towards live gauges.
+"""
+
+import glob
+import os
+
+
+def on_starting(server):
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        # Files from an earlier run would be summed into this one
+        for name in glob.glob(os.path.join(path, '*.db')):
+            os.unlink(name)
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
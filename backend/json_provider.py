@@ -0,0 +1,83 @@
+"""
+Flask JSON provider that encodes MongoDB documents directly.
+
+ObjectId values are written as their hex string and datetimes in ISO 8601,
+so handlers can return documents straight from pymongo without converting
+fields one by one. orjson is used when installed; otherwise the standard
+library encoder is used with the same type handling.
+"""
+
+from bson.objectid import ObjectId
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+def default(obj):
+    """Encode the non-JSON types found in our documents"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode(obj) -> bytes:
+    """Encode a value to compact JSON bytes outside of a Flask app (used by asgi.py)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(obj, default=default, separators=(',', ':')).encode('utf-8')
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """JSON provider with native ObjectId/datetime support and an orjson fast path"""
+    
+    # Key order carries no meaning for API clients and sorting costs time on large listings
+    sort_keys = False
+    
+    @staticmethod
+    def default(obj):
+        return default(obj)
+    
+    def _orjson_dumps(self, obj, indent=False):
+        """Encode with orjson, or return None when it cannot handle the value"""
+        if orjson is None:
+            return None
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # e.g. integers wider than 64 bits; the stdlib encoder copes
+            return None
+    
+    def dumps(self, obj, **kwargs) -> str:
+        if not kwargs:
+            encoded = self._orjson_dumps(obj)
+            if encoded is not None:
+                return encoded.decode('utf-8')
+        return super().dumps(obj, **kwargs)
+    
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        # Debug output is pretty-printed like Flask's, but still through orjson
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        obj = self._prepare_response_obj(args, kwargs)
+        encoded = self._orjson_dumps(obj, indent)
+        if encoded is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(encoded + b'\n', mimetype=self.mimetype)
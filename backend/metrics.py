@@ -0,0 +1,266 @@
+"""
+Prometheus metrics for the API, served at GET /api/metrics.
+
+Request metrics are labelled by blueprint, endpoint (the Flask view, e.g.
+cards.update_card) and method. A pymongo CommandListener times every
+command by name and collection, and attributes it to the endpoint that
+issued it, so cardvault_mongo_commands_per_request shows how many round
+trips each route makes. Cache and connection pool counters, which are
+kept per process elsewhere, are exported alongside by a collector that
+reads them at scrape time.
+
+Metrics are recorded with prometheus_client. With several gunicorn or
+uvicorn workers, point PROMETHEUS_MULTIPROC_DIR at an empty directory
+before starting the server: request and command metrics are then summed
+over every worker (gunicorn.conf.py clears the directory on start and
+drops exited workers), while cache and pool figures stay those of the
+worker answering the scrape. Without it each scrape sees one worker.
+
+The endpoint is only served when METRICS_TOKEN is set, and scrapes must
+send it as a bearer token.
+"""
+
+from contextvars import ContextVar
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from pymongo import monitoring
+from auth import cache_stats
+from catalog import catalog_cache
+from collection_cache import collection_cache
+from config import get_config
+from pool_monitor import WAIT_BUCKETS, pool_monitor
+import hmac
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COMMANDS_PER_REQUEST_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21)
+
+
+# HTTP
+REQUESTS = Counter(
+    'cardvault_http_requests_total', 'HTTP requests by route and status',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+REQUEST_DURATION = Histogram(
+    'cardvault_http_request_duration_seconds', 'Time to produce a response',
+    ['blueprint', 'endpoint', 'method'], buckets=HTTP_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    'cardvault_http_requests_in_flight', 'Requests currently being handled', ['blueprint'],
+    multiprocess_mode='livesum'
+)
+
+# MongoDB
+MONGO_COMMANDS = Counter(
+    'cardvault_mongo_commands_total', 'MongoDB commands by name, collection and outcome',
+    ['command', 'collection', 'status']
+)
+MONGO_COMMAND_DURATION = Histogram(
+    'cardvault_mongo_command_duration_seconds', 'MongoDB command round-trip time',
+    ['command', 'collection'], buckets=MONGO_BUCKETS
+)
+MONGO_ENDPOINT_COMMANDS = Counter(
+    'cardvault_mongo_endpoint_commands_total', 'MongoDB commands issued while handling each endpoint',
+    ['endpoint', 'command', 'collection']
+)
+MONGO_COMMANDS_PER_REQUEST = Histogram(
+    'cardvault_mongo_commands_per_request', 'MongoDB round trips made by one request',
+    ['endpoint'], buckets=COMMANDS_PER_REQUEST_BUCKETS
+)
+
+
+class StatsCollector:
+    """Exports the cache and connection pool counters this process keeps, read at scrape time"""
+
+    def collect(self):
+        lookups = CounterMetricFamily('cardvault_cache_lookups', 'Cache lookups by result', labels=['cache', 'result'])
+        removals = CounterMetricFamily(
+            'cardvault_cache_removals', 'Cache entries dropped for size or age', labels=['cache', 'reason']
+        )
+        entries = GaugeMetricFamily('cardvault_cache_entries', 'Entries currently cached', labels=['cache'])
+
+        for name, stats in dict(cache_stats(), catalog=catalog_cache.stats()).items():
+            lookups.add_metric([name, 'hit'], stats['hits'])
+            lookups.add_metric([name, 'miss'], stats['misses'])
+            removals.add_metric([name, 'evicted'], stats['evictions'])
+            removals.add_metric([name, 'expired'], stats['expirations'])
+            entries.add_metric([name], stats['size'])
+
+        stats = collection_cache.stats()
+        for kind, counts in stats['lookups'].items():
+            lookups.add_metric([f'collection_{kind}', 'hit'], counts['hits'])
+            lookups.add_metric([f'collection_{kind}', 'miss'], counts['misses'])
+        backend = stats['backend']
+        removals.add_metric(['collection', 'evicted'], backend['evictions'])
+        removals.add_metric(['collection', 'expired'], backend['expirations'])
+        if 'size' in backend:
+            entries.add_metric(['collection'], backend['size'])
+        yield lookups
+        yield removals
+        yield entries
+        yield CounterMetricFamily(
+            'cardvault_collection_cache_invalidations', 'Writes that invalidated cached cards or binders',
+            value=stats['invalidations']
+        )
+
+        pool = pool_monitor.stats()
+        connections = GaugeMetricFamily(
+            'cardvault_mongo_pool_connections', 'Pooled connections by state (waiting counts checkouts in line)',
+            labels=['state']
+        )
+        for state in ('open', 'in_use', 'waiting'):
+            connections.add_metric([state], pool[state])
+        yield connections
+        yield GaugeMetricFamily(
+            'cardvault_mongo_pool_max_size', 'Configured maxPoolSize', value=config.MONGO_MAX_POOL_SIZE
+        )
+        yield CounterMetricFamily(
+            'cardvault_mongo_pool_checkouts', 'Connections checked out of the pool', value=pool['checkouts']
+        )
+        failures = CounterMetricFamily(
+            'cardvault_mongo_pool_checkout_failures', 'Checkouts that gave up', labels=['reason']
+        )
+        for reason, count in pool['checkout_failures'].items():
+            failures.add_metric([str(reason)], count)
+        yield failures
+
+        counts, total = pool_monitor.wait_histogram()
+        buckets = []
+        cumulative = 0
+        for bound, count in zip(WAIT_BUCKETS + (float('inf'),), counts):
+            cumulative += count
+            buckets.append(('+Inf' if bound == float('inf') else str(bound), cumulative))
+        yield HistogramMetricFamily(
+            'cardvault_mongo_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection',
+            buckets=buckets, sum_value=total
+        )
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def render() -> bytes:
+    """Render every metric in the Prometheus text exposition format"""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return generate_latest(REGISTRY)
+    # Sum the metric files every worker writes, plus this worker's cache and pool counters
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(stats_collector)
+    return generate_latest(registry)
+
+
+# The request a MongoDB command belongs to: {'endpoint': ..., 'commands': n}
+_current_request = ContextVar('cardvault_current_request', default=None)
+
+
+def start_request(endpoint: str):
+    """Attribute MongoDB commands on this context to endpoint until finish_request"""
+    return _current_request.set({'endpoint': endpoint, 'commands': 0})
+
+
+def finish_request(token):
+    """Stop attributing commands and record how many the request made"""
+    state = _current_request.get()
+    _current_request.reset(token)
+    if state is not None:
+        MONGO_COMMANDS_PER_REQUEST.labels(endpoint=state['endpoint']).observe(state['commands'])
+
+
+def _collection_name(event) -> str:
+    """Collection a command targets, or '' for database/admin commands"""
+    value = event.command.get(event.command_name)
+    if isinstance(value, str):
+        return value
+    # getMore names the cursor id first and the collection separately
+    collection = event.command.get('collection')
+    return collection if isinstance(collection, str) else ''
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Command listener feeding the cardvault_mongo_* metrics"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        state = _current_request.get()
+        if state is not None:
+            state['commands'] += 1
+        entry = (_collection_name(event), state['endpoint'] if state else None)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = entry
+
+    def succeeded(self, event):
+        self._finish(event, 'ok')
+
+    def failed(self, event):
+        self._finish(event, 'failed')
+
+    def _finish(self, event, status):
+        with self._lock:
+            collection, endpoint = self._pending.pop((event.connection_id, event.request_id), ('', None))
+        command = event.command_name
+        MONGO_COMMANDS.labels(command=command, collection=collection, status=status).inc()
+        MONGO_COMMAND_DURATION.labels(command=command, collection=collection).observe(event.duration_micros / 1e6)
+        if endpoint:
+            MONGO_ENDPOINT_COMMANDS.labels(endpoint=endpoint, command=command, collection=collection).inc()
+
+
+command_metrics = CommandMetrics()
+
+
+def init_metrics(app, config):
+    """Time every request and serve /api/metrics
+
+    The endpoint is only added when METRICS_TOKEN is set; scrapes must send
+    it as a bearer token.
+    """
+    if not config.METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_blueprint = request.blueprint or 'app'
+        g.metrics_endpoint = request.endpoint or 'unmatched'
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = start_request(g.metrics_endpoint)
+        IN_FLIGHT.labels(blueprint=g.metrics_blueprint).inc()
+
+    @app.after_request
+    def _record(response):
+        if 'metrics_start' in g:
+            labels = {'blueprint': g.metrics_blueprint, 'endpoint': g.metrics_endpoint, 'method': request.method}
+            REQUEST_DURATION.labels(**labels).observe(time.perf_counter() - g.metrics_start)
+            REQUESTS.labels(status=response.status_code, **labels).inc()
+        return response
+
+    @app.teardown_request
+    def _finish(exception):
+        if 'metrics_token' in g:
+            finish_request(g.pop('metrics_token'))
+            IN_FLIGHT.labels(blueprint=g.metrics_blueprint).dec()
+
+    if not config.METRICS_TOKEN:
+        logger.warning("METRICS_TOKEN is not set; /api/metrics is disabled")
+        return
+    expected = f'Bearer {config.METRICS_TOKEN}'.encode('utf-8')
+
+    def metrics_view():
+        """Prometheus scrape endpoint"""
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'), expected):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(render(), content_type=CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/api/metrics', 'metrics', metrics_view, methods=['GET'])
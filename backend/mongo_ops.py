@@ -0,0 +1,89 @@
+"""
+Driver-neutral MongoDB calls.
+
+Data access that has to behave the same in the sync (Flask) and async
+(ASGI) apps is written once as a generator. It yields a `Call` for every
+collection method it needs and receives the result back, so the logic
+never touches a driver itself:
+
+    def get_card(user_id, card_oid):
+        return (yield call('cards', 'find_one', {'_id': card_oid, 'user_id': user_id}))
+
+    card = run(get_card(user_id, card_oid), db)                # pymongo
+    card = await run_async(get_card(user_id, card_oid), db)    # Motor / AsyncMongoClient
+
+Driver errors are raised inside the generator at the yield, exactly as if
+it had made the call itself. `find` calls return a list; `sort`, `hint`,
+`skip` and `limit` keyword arguments are applied to the cursor before it
+is read.
+"""
+
+from collections import namedtuple
+
+Call = namedtuple('Call', ['collection', 'method', 'args', 'kwargs'])
+
+# Cursor modifiers accepted as keyword arguments by find calls, in the order they are applied
+_CURSOR_OPTIONS = ('sort', 'hint', 'skip', 'limit')
+
+
+def call(collection: str, method: str, *args, **kwargs) -> Call:
+    """Describe one collection method call"""
+    return Call(collection, method, args, kwargs)
+
+
+def _cursor(collection, op: Call):
+    """Open a find cursor with its modifiers applied"""
+    kwargs = dict(op.kwargs)
+    options = {name: kwargs.pop(name) for name in _CURSOR_OPTIONS if name in kwargs}
+    cursor = collection.find(*op.args, **kwargs)
+    for name in _CURSOR_OPTIONS:
+        if options.get(name):
+            cursor = getattr(cursor, name)(options[name])
+    return cursor
+
+
+def execute(db, op: Call):
+    """Run a single call against a pymongo database"""
+    collection = db[op.collection]
+    if op.method == 'find':
+        return list(_cursor(collection, op))
+    return getattr(collection, op.method)(*op.args, **op.kwargs)
+
+
+async def execute_async(db, op: Call):
+    """Run a single call against an async driver database"""
+    collection = db[op.collection]
+    if op.method == 'find':
+        return await _cursor(collection, op).to_list(None)
+    return await getattr(collection, op.method)(*op.args, **op.kwargs)
+
+
+def run(ops, db):
+    """Drive a data-access generator to completion on a pymongo database"""
+    try:
+        op = next(ops)
+        while True:
+            try:
+                result = execute(db, op)
+            except Exception as e:
+                # Driver errors surface inside the generator so it can handle them
+                op = ops.throw(e)
+            else:
+                op = ops.send(result)
+    except StopIteration as done:
+        return done.value
+
+
+async def run_async(ops, db):
+    """Drive a data-access generator to completion on an async driver database"""
+    try:
+        op = next(ops)
+        while True:
+            try:
+                result = await execute_async(db, op)
+            except Exception as e:
+                op = ops.throw(e)
+            else:
+                op = ops.send(result)
+    except StopIteration as done:
+        return done.value
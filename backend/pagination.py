@@ -0,0 +1,64 @@
+"""
+Keyset pagination and field projection helpers for list endpoints.
+
+Cursors are opaque to clients: they wrap the sort key of the last document
+on a page so the next page can resume with an indexed range query instead
+of an ever-growing skip().
+"""
+
+import base64
+from bson import json_util
+from bson.objectid import ObjectId
+
+
+class PaginationError(ValueError):
+    """Raised when a client sends an unusable limit, cursor or field list"""
+    pass
+
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last returned document as an opaque cursor
+
+    The last value is always the document _id, which breaks ties between
+    documents sharing the same sort value.
+    """
+    raw = json_util.dumps(list(values)).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int = 1) -> list:
+    """Decode a cursor produced by encode_cursor back into its sort key values"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size or not isinstance(values[-1], ObjectId):
+        raise PaginationError('Invalid cursor')
+    return values
+
+
+def parse_limit(value, max_limit: int):
+    """Parse the limit query parameter; None means no limit was requested"""
+    if value is None or value == '':
+        return None
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, max_limit)
+
+
+def parse_fields(value, allowed_fields) -> dict:
+    """Turn a comma-separated fields parameter into a Mongo projection"""
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed_fields]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    projection = {field: 1 for field in fields}
+    projection['_id'] = 1
+    return projection
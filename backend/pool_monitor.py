@@ -0,0 +1,131 @@
+"""
+MongoDB connection pool monitoring.
+
+PoolMonitor is registered on every MongoClient we create. It counts
+checkouts, how long each one waited for a free connection, failures and
+how many connections are open and in use, so MONGO_MAX_POOL_SIZE and
+MONGO_MIN_POOL_SIZE can be sized from what the workers actually see.
+Counters are per process; a forked worker starts from zero.
+"""
+
+from pymongo import monitoring
+import bisect
+import os
+import threading
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool listener keeping checkout wait and usage counters"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Zero every counter
+
+        Called in a freshly forked child, so it replaces the lock rather than
+        acquiring it: another thread may have held it at fork time.
+        """
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_failures = {}
+        self.waiting = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.open = 0
+        self.created = 0
+        self.closed = 0
+        self.pool_clears = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # Counts per WAIT_BUCKETS bound, plus one for waits above the last
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        wait = event.duration
+        with self._lock:
+            self.waiting -= 1
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, wait)] += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+            self.closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def wait_histogram(self):
+        """Return (per-bucket checkout counts, total wait seconds) for WAIT_BUCKETS"""
+        with self._lock:
+            return list(self.wait_buckets), self.wait_total
+
+    def stats(self, max_pool_size: int = None) -> dict:
+        """Return a snapshot of the counters for this process"""
+        with self._lock:
+            histogram = {}
+            cumulative = 0
+            for bound, count in zip(WAIT_BUCKETS + ('+Inf',), self.wait_buckets):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            stats = {
+                'pid': os.getpid(),
+                'checkouts': self.checkouts,
+                'checkout_failures': dict(self.checkout_failures),
+                'waiting': self.waiting,
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'open': self.open,
+                'created': self.created,
+                'closed': self.closed,
+                'pool_clears': self.pool_clears,
+                'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'wait_histogram': histogram,
+            }
+        if max_pool_size:
+            stats['max_pool_size'] = max_pool_size
+            stats['peak_utilization'] = round(stats['max_in_use'] / max_pool_size, 3)
+        return stats
+
+
+pool_monitor = PoolMonitor()
@@ -0,0 +1,329 @@
+"""
+Price history per catalog entry and batch revaluation of cards from a price feed.
+
+`price_history` is a MongoDB time-series collection of price points
+({ts, catalog_id, price}) with catalog_id as its meta field, so points for
+one printing are stored together and range scans over time stay cheap.
+
+A revaluation run reads a local price feed (CSV or NDJSON rows with set,
+card_number and price), all priced as of one moment. Each chunk of
+PRICE_FEED_CHUNK_SIZE rows is resolved against the catalog with one query,
+appended to the history with one insert_many, and applied to every card of
+those printings with unordered bulk_write batches. Per-user stats deltas and
+change counters are written in bulk as well, and cards get a fresh
+updated_at so delta sync picks the new values up. Cards already valued from
+a newer feed are left alone, so feeds may be backfilled in any order.
+
+A card edited while its chunk is being applied can leave that user's
+summary slightly off; GET /api/cards/stats?verify=1 repairs it.
+
+Usage: python price_history.py <feed.csv|feed.ndjson> [--as-of 2024-05-01T00:00:00]
+"""
+
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+from catalog import entry_key
+from config import get_config
+import card_stats
+import csv
+import data_access
+import json
+import logging
+import versioning
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+# Resolution parameter -> $dateTrunc unit and the bucket width used to cap the number of points
+RESOLUTIONS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': timedelta(days=30),
+}
+
+
+class FeedError(ValueError):
+    """Raised when a price feed row cannot be read"""
+    pass
+
+
+def ensure_collection(db):
+    """Create the price_history time-series collection if it does not exist yet
+
+    Called by the revaluation job rather than at API startup, so servers
+    without time-series support (before MongoDB 5.0) only matter once price
+    history is used. There the points go into a regular collection with
+    the same index.
+    """
+    if 'price_history' not in db.list_collection_names():
+        try:
+            db.create_collection(
+                'price_history',
+                timeseries={'timeField': 'ts', 'metaField': 'catalog_id', 'granularity': 'hours'}
+            )
+        except CollectionInvalid:
+            # Created concurrently by another process
+            pass
+        except OperationFailure as e:
+            logger.warning(f"Time-series collections unavailable ({e}); storing price history in a regular collection")
+    db.price_history.create_index([('catalog_id', 1), ('ts', 1)])
+
+
+# Price feed
+
+def _feed_row(row: dict) -> dict:
+    if not row.get('set') or row.get('card_number') in (None, ''):
+        raise FeedError('set and card_number are required')
+    try:
+        price = float(row.get('price'))
+    except (TypeError, ValueError):
+        raise FeedError('price must be a number')
+    if price < 0:
+        raise FeedError('price must not be negative')
+    return {'set': row['set'], 'card_number': row['card_number'], 'price': price}
+
+
+def read_feed(path: str):
+    """Yield (line_number, row or FeedError) for each row of a CSV or NDJSON price feed"""
+    with open(path, newline='', encoding='utf-8') as feed:
+        if path.endswith(('.ndjson', '.jsonl')):
+            for line_number, line in enumerate(feed, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise FeedError('Row must be a JSON object')
+                    yield line_number, _feed_row(row)
+                except (ValueError, FeedError) as e:
+                    yield line_number, FeedError(str(e))
+        else:
+            reader = csv.DictReader(feed)
+            for line_number, row in enumerate(reader, 2):
+                row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+                try:
+                    yield line_number, _feed_row(row)
+                except FeedError as e:
+                    yield line_number, e
+
+
+# Revaluation
+
+def _catalog_prices(db, rows):
+    """Return ({catalog_id: price}, rows whose printing is not in the catalog) for feed rows"""
+    prices = {entry_key(row): row['price'] for row in rows}
+    query = {'$or': [{'set': set_name, 'card_number': card_number} for set_name, card_number in prices]}
+    entries = {entry_key(entry): entry['_id'] for entry in db.catalog.find(query, {'set': 1, 'card_number': 1})}
+    unknown = sum(1 for row in rows if entry_key(row) not in entries)
+    return {catalog_id: prices[key] for key, catalog_id in entries.items()}, unknown
+
+
+def _flush(db, requests, deltas, touched, counts):
+    """Write one batch of card updates with their users' stats deltas and change counters"""
+    if not requests:
+        return
+    db.cards.bulk_write(requests, ordered=False)
+    counts['cards'] += len(requests)
+
+    stats_requests = [UpdateOne({'_id': user_id}, {'$inc': inc}) for user_id, inc in deltas.items() if inc]
+    if stats_requests:
+        # No upsert, as in card_stats.apply_delta: a missing summary is rebuilt on its next read
+        db.card_stats.bulk_write(stats_requests, ordered=False)
+    db.collection_versions.bulk_write([
+        UpdateOne({'_id': user_id}, {'$inc': {versioning.CARDS: 1}}, upsert=True) for user_id in touched
+    ], ordered=False)
+    for user_id, card_oids in touched.items():
+        data_access.invalidate_cards(user_id, card_oids)
+    counts['users'] |= set(touched)
+
+    requests.clear()
+    deltas.clear()
+    touched.clear()
+
+
+def _apply_chunk(db, rows, as_of: datetime, counts: dict):
+    prices, unknown = _catalog_prices(db, rows)
+    counts['unknown'] += unknown
+    if not prices:
+        return
+
+    db.price_history.insert_many([
+        {'ts': as_of, 'catalog_id': catalog_id, 'price': price} for catalog_id, price in prices.items()
+    ], ordered=False)
+    counts['points'] += len(prices)
+
+    now = datetime.utcnow()
+    requests = []
+    deltas = {}
+    touched = {}
+    projection = dict({field: 1 for field in card_stats.STAT_FIELDS}, user_id=1, catalog_id=1)
+    # Cards valued from a newer feed keep that value
+    query = {
+        'catalog_id': {'$in': list(prices)},
+        '$or': [{'valued_at': {'$lt': as_of}}, {'valued_at': None}],
+    }
+    for card in db.cards.find(query, projection).batch_size(config.PRICE_FEED_CHUNK_SIZE):
+        price = prices[card['catalog_id']]
+        requests.append(UpdateOne(
+            {'_id': card['_id']},
+            {'$set': {'estimated_value': price, 'valued_at': as_of, 'updated_at': now}}
+        ))
+        user_delta = deltas.setdefault(card['user_id'], {})
+        for path, amount in card_stats.delta(card, dict(card, estimated_value=price)).items():
+            user_delta[path] = user_delta.get(path, 0) + amount
+        touched.setdefault(card['user_id'], []).append(card['_id'])
+        if len(requests) >= config.PRICE_FEED_CHUNK_SIZE:
+            _flush(db, requests, deltas, touched, counts)
+    _flush(db, requests, deltas, touched, counts)
+
+
+def revalue(db, path: str, as_of: datetime = None) -> dict:
+    """Record a price feed in the history and revalue the cards it prices
+
+    Returns counts of rows read, rows rejected, rows for printings not in
+    the catalog, price points written, cards revalued and users affected.
+    """
+    as_of = as_of or datetime.utcnow()
+    ensure_collection(db)
+    counts = {'rows': 0, 'invalid': 0, 'unknown': 0, 'points': 0, 'cards': 0, 'users': set()}
+
+    chunk = []
+    for line_number, row in read_feed(path):
+        counts['rows'] += 1
+        if isinstance(row, FeedError):
+            counts['invalid'] += 1
+            logger.warning(f"Price feed line {line_number}: {str(row)}")
+            continue
+        chunk.append(row)
+        if len(chunk) >= config.PRICE_FEED_CHUNK_SIZE:
+            _apply_chunk(db, chunk, as_of, counts)
+            chunk = []
+    if chunk:
+        _apply_chunk(db, chunk, as_of, counts)
+
+    counts['users'] = len(counts['users'])
+    logger.info(
+        f"Revalued {counts['cards']} cards of {counts['users']} users from {counts['points']} prices "
+        f"({counts['invalid']} invalid and {counts['unknown']} unknown rows of {counts['rows']})"
+    )
+    return counts
+
+
+# Portfolio history
+
+def _bucket(unit: str) -> dict:
+    """Aggregation expression truncating a point's timestamp to its bucket"""
+    return {'$dateTrunc': {'date': '$ts', 'unit': unit}}
+
+
+def truncate(ts: datetime, unit: str) -> datetime:
+    """Start of the bucket holding ts, as $dateTrunc computes it (UTC, weeks start on Sunday)"""
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    if unit == 'hour':
+        return ts
+    ts = ts.replace(hour=0)
+    if unit == 'week':
+        return ts - timedelta(days=(ts.weekday() + 1) % 7)
+    if unit == 'month':
+        return ts.replace(day=1)
+    return ts
+
+
+def _holdings(db, user_id):
+    """Return ({catalog_id: quantity}, {catalog_id: fallback value}, value of cards outside the catalog)"""
+    quantities = {}
+    fallback = {}
+    unlinked = 0.0
+    projection = {'catalog_id': 1, 'quantity': 1, 'estimated_value': 1}
+    for card in db.cards.find({'user_id': user_id}, projection):
+        amounts = card_stats.contribution(card)
+        catalog_id = card.get('catalog_id')
+        if catalog_id is None:
+            unlinked += amounts['total_estimated_value']
+            continue
+        quantities[catalog_id] = quantities.get(catalog_id, 0) + amounts['total_quantity']
+        fallback[catalog_id] = fallback.get(catalog_id, 0) + amounts['total_estimated_value']
+    return quantities, fallback, unlinked
+
+
+def portfolio_history(db, user_id, start: datetime, end: datetime, resolution: str) -> list:
+    """Return [{'ts', 'value'}] of the user's portfolio value, one point per bucket with price changes
+
+    The series values the user's current holdings at historical prices:
+    today's cards and quantities throughout, not what the user owned at the
+    time. Each card is valued at its printing's latest price in the history
+    up to that bucket. Cards whose printing has no price yet count at their
+    own estimated_value throughout, so the series ends close to the
+    dashboard total. Points are stamped with the start of their bucket; the
+    first one, for the bucket holding start, also carries the prices from
+    before the window.
+    """
+    quantities, fallback, unlinked = _holdings(db, user_id)
+    if not quantities and not unlinked:
+        return []
+    catalog_ids = list(quantities)
+
+    # Latest price of each printing before the window opens
+    prices = {
+        group['_id']: group['price'] for group in db.price_history.aggregate([
+            {'$match': {'catalog_id': {'$in': catalog_ids}, 'ts': {'$lt': start}}},
+            {'$sort': {'ts': 1}},
+            {'$group': {'_id': '$catalog_id', 'price': {'$last': '$price'}}},
+        ])
+    }
+    # Closing price of each printing per bucket, so at most one row per printing per bucket leaves the server
+    buckets = db.price_history.aggregate([
+        {'$match': {'catalog_id': {'$in': catalog_ids}, 'ts': {'$gte': start, '$lt': end}}},
+        {'$sort': {'ts': 1}},
+        {'$group': {
+            '_id': {'bucket': _bucket(resolution), 'catalog_id': '$catalog_id'},
+            'price': {'$last': '$price'},
+        }},
+        {'$sort': {'_id.bucket': 1}},
+    ])
+
+    def total():
+        value = unlinked
+        for catalog_id, quantity in quantities.items():
+            value += prices[catalog_id] * quantity if catalog_id in prices else fallback[catalog_id]
+        return round(value, 2)
+
+    points = []
+
+    def add(ts):
+        point = {'ts': ts, 'value': total()}
+        # The opening point and the first bucket share a timestamp when prices changed in it
+        if points and points[-1]['ts'] == ts:
+            points[-1] = point
+        else:
+            points.append(point)
+
+    if prices:
+        add(truncate(start, resolution))
+    current = None
+    for group in buckets:
+        bucket = group['_id']['bucket']
+        if current is not None and bucket != current:
+            add(current)
+        current = bucket
+        prices[group['_id']['catalog_id']] = group['price']
+    if current is not None:
+        add(current)
+    return points
+
+
+if __name__ == '__main__':
+    import argparse
+    from database import create_indexes, get_db
+
+    parser = argparse.ArgumentParser(description='Record a price feed and revalue the cards it prices')
+    parser.add_argument('feed', help='CSV (set,card_number,price) or NDJSON price feed')
+    parser.add_argument('--as-of', type=datetime.fromisoformat, default=None,
+                        help='time the prices were taken (UTC, ISO 8601; default now)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    create_indexes(get_db())
+    revalue(get_db(), args.feed, args.as_of)
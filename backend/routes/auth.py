@@ -1,13 +1,24 @@
 from flask import Blueprint, request, jsonify
-from bson.objectid import ObjectId
 from database import get_db
-from auth import hash_password, verify_password, create_token
+from auth import (
+    PasswordHasherBusy, hash_password, verify_password, password_needs_rehash,
+    rehash_password_later, create_token, token_required
+)
+from mongo_ops import run
+import data_access
 import logging
 
 logger = logging.getLogger(__name__)
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 
+def _busy_response():
+    """Shed a signup/login while the bcrypt queue is full"""
+    response = jsonify({'error': 'Server is busy, please try again'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
     """Create a new user account"""
@@ -24,21 +35,12 @@ def signup():
         db = get_db()
         
         # Check if user already exists
-        if db.users.find_one({'username': data['username']}):
+        if run(data_access.find_user(data['username']), db):
             return jsonify({'error': 'Username already exists'}), 409
         
         # Hash password and create user
         hashed_password = hash_password(data['password'])
-        
-        user_doc = {
-            'username': data['username'],
-            'password': hashed_password,
-            'is_demo': False,
-            'created_at': ObjectId().generation_time,  # Use ObjectId generation time for consistency
-        }
-        
-        result = db.users.insert_one(user_doc)
-        user_id = str(result.inserted_id)
+        user_id = run(data_access.create_user(data['username'], hashed_password), db)
         
         # Create token
         token = create_token(user_id)
@@ -53,6 +55,8 @@ def signup():
             }
         }), 201
     
+    except PasswordHasherBusy:
+        return _busy_response()
     except Exception as e:
         logger.error(f"Signup error: {str(e)}")
         return jsonify({'error': 'Signup failed'}), 500
@@ -69,11 +73,18 @@ def login():
             return jsonify({'error': 'Username and password are required'}), 400
         
         db = get_db()
-        user = db.users.find_one({'username': data['username']})
+        user = run(data_access.find_user(data['username']), db)
         
         if not user or not verify_password(data['password'], user['password']):
             return jsonify({'error': 'Invalid username or password'}), 401
         
+        # Upgrade hashes made at a different cost now that we know the password
+        if password_needs_rehash(user['password']):
+            rehash_password_later(
+                data['password'],
+                lambda new_hash: run(data_access.store_rehash(user, new_hash), db)
+            )
+        
         # Create token
         token = create_token(str(user['_id']))
         
@@ -82,50 +93,28 @@ def login():
         return jsonify({
             'token': token,
             'user': {
-                'id': str(user['_id']),
+                'id': user['_id'],
                 'username': user['username']
             }
         }), 200
     
+    except PasswordHasherBusy:
+        return _busy_response()
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
 
 
 @auth_bp.route('/me', methods=['GET'])
+@token_required
 def get_current_user():
     """Get current authenticated user info"""
     try:
-        # Get token from header
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(' ')[1]
-            except IndexError:
-                return jsonify({'error': 'Invalid token format'}), 401
-        
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        from auth import verify_token
-        payload = verify_token(token)
-        if payload is None:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        user_id = payload['user_id']
-        db = get_db()
-        user = db.users.find_one({'_id': ObjectId(user_id)})
-        
+        user = run(data_access.get_public_user(request.user_id), get_db())
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({
-            'user': {
-                'id': str(user['_id']),
-                'username': user['username']
-            }
-        }), 200
+        return jsonify({'user': user}), 200
     
     except Exception as e:
         logger.error(f"Get current user error: {str(e)}")
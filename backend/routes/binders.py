@@ -1,12 +1,28 @@
 from flask import Blueprint, request, jsonify
 from bson.objectid import ObjectId
-from datetime import datetime
 from database import get_db
 from auth import token_required
+from binder_slots import SlotPatchError, present
+from config import get_config
+from mongo_ops import run
+from streaming import ndjson_response, wants_ndjson
+import data_access
+import versioning
 import logging
 
 logger = logging.getLogger(__name__)
 binders_bp = Blueprint('binders', __name__, url_prefix='/api/binders')
+config = get_config()
+
+
+def wants_sparse() -> bool:
+    """Check whether the client asked for binders as sparse cells (?format=sparse)"""
+    return request.args.get('format') == 'sparse'
+
+
+def present_binder(binder):
+    """Shape a stored binder for a response: dense slots, or sparse cells with ?format=sparse"""
+    return present(binder, wants_sparse())
 
 
 @binders_bp.route('', methods=['GET'])
@@ -17,15 +33,19 @@ def get_binders():
         db = get_db()
         user_id = request.user_id
         
-        # Query all binders for this user
-        binders = list(db.binders.find({'user_id': user_id}).sort('created_at', -1))
+        # Unchanged collections are answered from the change counter alone
+        etag = versioning.request_etag(db, user_id, versioning.BINDERS)
+        if versioning.not_modified(etag):
+            return versioning.not_modified_response(etag)
+        
+        if wants_ndjson():
+            cursor = db.binders.find({'user_id': user_id}).sort(data_access.BINDER_ORDER)
+            response = ndjson_response(cursor, config.STREAM_BATCH_SIZE, transform=present_binder)
+            return versioning.tag_response(response, etag)
         
-        # Convert ObjectId to string for JSON serialization
-        for binder in binders:
-            binder['_id'] = str(binder['_id'])
-            binder['user_id'] = str(binder['user_id'])
+        binders = run(data_access.list_binders(user_id, wants_sparse()), db)
         
-        return jsonify({'binders': binders}), 200
+        return versioning.tag_response(jsonify({'binders': binders}), etag), 200
     
     except Exception as e:
         logger.error(f"Get binders error: {str(e)}")
@@ -35,7 +55,7 @@ def get_binders():
 @binders_bp.route('/<binder_id>', methods=['GET'])
 @token_required
 def get_binder(binder_id):
-    """Get a specific binder by ID"""
+    """Get a specific binder by ID (expand=cards inlines card summaries into the slots)"""
     try:
         db = get_db()
         user_id = request.user_id
@@ -45,14 +65,15 @@ def get_binder(binder_id):
         except:
             return jsonify({'error': 'Invalid binder ID'}), 400
         
-        binder = db.binders.find_one({'_id': binder_oid, 'user_id': user_id})
+        binder = run(data_access.get_binder(
+            user_id, binder_oid,
+            expand=request.args.get('expand') == 'cards',
+            sparse=wants_sparse()
+        ), db)
         
         if not binder:
             return jsonify({'error': 'Binder not found'}), 404
         
-        binder['_id'] = str(binder['_id'])
-        binder['user_id'] = str(binder['user_id'])
-        
         return jsonify(binder), 200
     
     except Exception as e:
@@ -69,29 +90,11 @@ def create_binder():
         user_id = request.user_id
         data = request.get_json()
         
-        # Validate required fields
-        if not data.get('name') or not data.get('rows') or not data.get('columns'):
-            return jsonify({'error': 'Name, rows, and columns are required'}), 400
-        
-        # Initialize empty slots
-        rows = int(data['rows'])
-        columns = int(data['columns'])
-        slots = [[None for _ in range(columns)] for _ in range(rows)]
-        
-        binder_doc = {
-            'user_id': user_id,
-            'name': data.get('name'),
-            'rows': rows,
-            'columns': columns,
-            'slots': slots,
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
-        }
+        binder_doc, error = data_access.build_binder_doc(data, user_id)
+        if error:
+            return jsonify({'error': error}), 400
         
-        result = db.binders.insert_one(binder_doc)
-        
-        binder_doc['_id'] = str(result.inserted_id)
-        binder_doc['user_id'] = str(binder_doc['user_id'])
+        binder_doc = run(data_access.insert_binder(user_id, binder_doc, wants_sparse()), db)
         
         logger.info(f"Binder created: {data.get('name')} by user {user_id}")
         
@@ -116,37 +119,69 @@ def update_binder(binder_id):
         except:
             return jsonify({'error': 'Invalid binder ID'}), 400
         
-        # Verify ownership
-        binder = db.binders.find_one({'_id': binder_oid, 'user_id': user_id})
-        if not binder:
+        try:
+            updated_binder = run(data_access.update_binder(user_id, binder_oid, data, wants_sparse()), db)
+        except data_access.BinderError as e:
+            return jsonify({'error': str(e)}), 400
+        if not updated_binder:
             return jsonify({'error': 'Binder not found or unauthorized'}), 404
         
-        # Build update document
-        update_doc = {
-            'updated_at': datetime.utcnow().isoformat(),
-        }
+        logger.info(f"Binder updated: {binder_id} by user {user_id}")
         
-        # Only update provided fields
-        allowed_fields = ['name', 'rows', 'columns', 'slots']
+        return jsonify(updated_binder), 200
+    
+    except Exception as e:
+        logger.error(f"Update binder error: {str(e)}")
+        return jsonify({'error': 'Failed to update binder'}), 500
+
+
+@binders_bp.route('/<binder_id>/slots', methods=['PATCH'])
+@token_required
+def patch_binder_slots(binder_id):
+    """Apply place/clear/move/swap operations to individual binder slots
+
+    Body: {"version": n, "operations": [...]}. The write only lands if the
+    binder is still at version n; otherwise 409 is returned with the current
+    version so the client can refetch. Only the touched positions are sent
+    to Mongo, as $set/$unset on cells.<row>_<col>.
+    """
+    try:
+        db = get_db()
+        user_id = request.user_id
+        data = request.get_json()
         
-        for field in allowed_fields:
-            if field in data:
-                update_doc[field] = data[field]
+        try:
+            binder_oid = ObjectId(binder_id)
+        except:
+            return jsonify({'error': 'Invalid binder ID'}), 400
         
-        db.binders.update_one({'_id': binder_oid}, {'$set': update_doc})
+        if not isinstance(data, dict) or not isinstance(data.get('version'), int):
+            return jsonify({'error': 'version is required'}), 400
         
-        # Return updated binder
-        updated_binder = db.binders.find_one({'_id': binder_oid})
-        updated_binder['_id'] = str(updated_binder['_id'])
-        updated_binder['user_id'] = str(updated_binder['user_id'])
+        try:
+            patched = run(data_access.patch_binder_slots(user_id, binder_oid, data['version'], data.get('operations')), db)
+        except SlotPatchError as e:
+            return jsonify({'error': str(e)}), 400
+        except data_access.VersionConflict as e:
+            body = {'error': str(e)}
+            if e.version is not None:
+                body['version'] = e.version
+            return jsonify(body), 409
+        if not patched:
+            return jsonify({'error': 'Binder not found or unauthorized'}), 404
+        version, cells = patched
         
-        logger.info(f"Binder updated: {binder_id} by user {user_id}")
+        logger.info(f"Binder slots patched: {binder_id} by user {user_id}")
         
-        return jsonify(updated_binder), 200
+        return jsonify({
+            '_id': binder_id,
+            'version': version,
+            'cells': cells
+        }), 200
     
     except Exception as e:
-        logger.error(f"Update binder error: {str(e)}")
-        return jsonify({'error': 'Failed to update binder'}), 500
+        logger.error(f"Patch binder slots error: {str(e)}")
+        return jsonify({'error': 'Failed to update binder slots'}), 500
 
 
 @binders_bp.route('/<binder_id>', methods=['DELETE'])
@@ -162,13 +197,9 @@ def delete_binder(binder_id):
         except:
             return jsonify({'error': 'Invalid binder ID'}), 400
         
-        # Verify ownership
-        binder = db.binders.find_one({'_id': binder_oid, 'user_id': user_id})
-        if not binder:
+        if not run(data_access.delete_binder(user_id, binder_oid), db):
             return jsonify({'error': 'Binder not found or unauthorized'}), 404
         
-        db.binders.delete_one({'_id': binder_oid})
-        
         logger.info(f"Binder deleted: {binder_id} by user {user_id}")
         
         return jsonify({'message': 'Binder deleted successfully'}), 200
@@ -1,37 +1,263 @@
 from flask import Blueprint, request, jsonify
 from bson.objectid import ObjectId
-from datetime import datetime
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta, timezone
 from database import get_db
 from auth import token_required
+from card_import import RowError, iter_csv_rows
+from card_search import prefix_query, search_fields, strip_search_fields
+import card_stats
+import catalog
+from config import get_config
+from data_access import CARD_FIELDS, build_card_doc
+from mongo_ops import run
+from pagination import PaginationError, decode_cursor, encode_cursor, parse_limit
+from streaming import ndjson_response, wants_ndjson
+import data_access
+import delta_sync
+import price_history
+import versioning
+import csv
 import logging
 
 logger = logging.getLogger(__name__)
 cards_bp = Blueprint('cards', __name__, url_prefix='/api/cards')
+config = get_config()
+
+# Fields returned for each search hit
+SEARCH_RESULT_FIELDS = ['name', 'set', 'card_number', 'image_url', 'condition', 'is_graded', 'tags']
 
 
 @cards_bp.route('', methods=['GET'])
 @token_required
 def get_cards():
-    """Get all cards for the current user"""
+    """Get cards for the current user, optionally filtered, sorted, paginated and projected
+
+    Query parameters:
+        limit  - page size (capped at CARDS_MAX_PAGE_SIZE); omit for all cards
+        after  - opaque cursor returned as next_cursor by the previous page
+        fields - comma-separated list of fields to return (e.g. name,set,image_url)
+        stream - 1 to stream NDJSON (same as Accept: application/x-ndjson)
+        set, condition, is_graded, tag - equality filters
+        min_value, max_value, min_price, max_price - estimated_value / purchase_price ranges
+        sort   - created_at, value or name (default: insertion order)
+        order  - asc (default) or desc
+    """
     try:
         db = get_db()
         user_id = request.user_id
         
-        # Query all cards for this user
-        cards = list(db.cards.find({'user_id': user_id}))
+        try:
+            limit, projection, card_query = data_access.parse_card_list_args(request.args, user_id)
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Unchanged collections are answered from the change counter alone
+        etag = versioning.request_etag(db, user_id, versioning.CARDS)
+        if versioning.not_modified(etag):
+            return versioning.not_modified_response(etag)
         
-        # Convert ObjectId to string for JSON serialization
-        for card in cards:
-            card['_id'] = str(card['_id'])
-            card['user_id'] = str(card['user_id'])
+        if wants_ndjson():
+            # Streamed pages have no trailing next_cursor
+            requested = set(projection) if projection else None
+            projection, extra_fields = data_access.card_list_projection(card_query, projection)
+            cursor = db.cards.find(card_query.filter, projection).sort(card_query.sort).hint(card_query.hint)
+            if limit:
+                cursor = cursor.limit(limit)
+            response = ndjson_response(
+                cursor, config.STREAM_BATCH_SIZE,
+                transform=lambda card: data_access.strip_list_fields(card, extra_fields),
+                prepare=lambda cards: run(catalog.attach_ops(cards, requested), db)
+            )
+            return versioning.tag_response(response, etag)
         
-        return jsonify({'cards': cards}), 200
+        cards, next_cursor = run(data_access.list_cards(user_id, card_query, projection, limit), db)
+        
+        return versioning.tag_response(jsonify({'cards': cards, 'next_cursor': next_cursor}), etag), 200
     
     except Exception as e:
         logger.error(f"Get cards error: {str(e)}")
         return jsonify({'error': 'Failed to fetch cards'}), 500
 
 
+@cards_bp.route('/search', methods=['GET'])
+@token_required
+def search_cards():
+    """Search the current user's cards
+
+    Query parameters:
+        q      - search text (required)
+        mode   - "text" (default) for relevance-ranked full-text search over
+                 name, set, notes and tags, or "prefix" for autocomplete
+        field  - name (default) or set, for prefix mode
+        limit  - page size (capped at SEARCH_MAX_LIMIT)
+        offset - text mode: number of ranked results to skip
+        after  - prefix mode: cursor returned as next_cursor by the previous page
+    """
+    try:
+        db = get_db()
+        user_id = request.user_id
+        
+        q = (request.args.get('q') or '').strip()
+        mode = request.args.get('mode', 'text')
+        if not q:
+            return jsonify({'error': 'q is required'}), 400
+        
+        try:
+            limit = parse_limit(request.args.get('limit'), config.SEARCH_MAX_LIMIT) or config.SEARCH_DEFAULT_LIMIT
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        projection = {field: 1 for field in SEARCH_RESULT_FIELDS + ['catalog_id']}
+        
+        if mode == 'text':
+            try:
+                offset = max(int(request.args.get('offset', 0)), 0)
+            except ValueError:
+                return jsonify({'error': 'offset must be an integer'}), 400
+            
+            # user_id equality is required by the (user_id, text) compound index
+            projection['score'] = {'$meta': 'textScore'}
+            cursor = db.cards.find({'user_id': user_id, '$text': {'$search': q}}, projection)
+            cursor = cursor.sort([('score', {'$meta': 'textScore'}), ('_id', 1)]).skip(offset).limit(limit + 1)
+            cards = list(cursor)
+            
+            has_more = len(cards) > limit
+            cards = run(catalog.attach_ops(cards[:limit], SEARCH_RESULT_FIELDS), db)
+            
+            return jsonify({
+                'cards': cards,
+                'next_offset': offset + limit if has_more else None
+            }), 200
+        
+        if mode == 'prefix':
+            field = request.args.get('field', 'name')
+            if field not in ('name', 'set'):
+                return jsonify({'error': 'field must be name or set'}), 400
+            normalized = f'{field}_lc'
+            
+            query = {'user_id': user_id, normalized: prefix_query(q)}
+            try:
+                if request.args.get('after'):
+                    last_value, last_id = decode_cursor(request.args['after'], size=2)
+                    query['$or'] = [
+                        {normalized: {'$gt': last_value}},
+                        {normalized: last_value, '_id': {'$gt': last_id}},
+                    ]
+            except PaginationError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            projection[normalized] = 1
+            cursor = db.cards.find(query, projection).sort([(normalized, 1), ('_id', 1)]).limit(limit + 1)
+            cards = list(cursor)
+            
+            next_cursor = None
+            if len(cards) > limit:
+                cards = cards[:limit]
+                next_cursor = encode_cursor(cards[-1][normalized], cards[-1]['_id'])
+            run(catalog.attach_ops(cards, SEARCH_RESULT_FIELDS), db)
+            for card in cards:
+                strip_search_fields(card)
+            
+            return jsonify({'cards': cards, 'next_cursor': next_cursor}), 200
+        
+        return jsonify({'error': 'mode must be text or prefix'}), 400
+    
+    except Exception as e:
+        logger.error(f"Search cards error: {str(e)}")
+        return jsonify({'error': 'Failed to search cards'}), 500
+
+
+@cards_bp.route('/stats', methods=['GET'])
+@token_required
+def get_card_stats():
+    """Get portfolio totals and breakdowns for the current user
+
+    Pass verify=1 to check the incrementally maintained summary against a
+    full aggregation (and repair it if it drifted).
+    """
+    try:
+        db = get_db()
+        user_id = request.user_id
+        
+        verify = request.args.get('verify') in ('1', 'true')
+        if not verify:
+            etag = versioning.request_etag(db, user_id, versioning.CARDS)
+            if versioning.not_modified(etag):
+                return versioning.not_modified_response(etag)
+        
+        summary, verified = card_stats.get_summary(db, user_id, verify=verify)
+        
+        response = card_stats.to_response(summary)
+        if verify:
+            response['verified'] = verified
+            return jsonify(response), 200
+        
+        return versioning.tag_response(jsonify(response), etag), 200
+    
+    except Exception as e:
+        logger.error(f"Get card stats error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch card stats'}), 500
+
+
+def _parse_time(value):
+    """Parse an ISO 8601 query parameter into a naive UTC datetime (None when absent)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+@cards_bp.route('/stats/history', methods=['GET'])
+@token_required
+def get_card_stats_history():
+    """Get the current user's portfolio value over time from the price history
+
+    The series values the user's current cards and quantities at each
+    bucket's prices ("holdings": "current" in the response); it does not
+    replay when cards were added or removed.
+
+    Query parameters:
+        resolution - hour, day (default), week or month: at most one point per bucket
+        from, to   - ISO 8601 window (default: the last PRICE_HISTORY_DEFAULT_DAYS days)
+    """
+    try:
+        db = get_db()
+        user_id = request.user_id
+        
+        resolution = request.args.get('resolution', 'day')
+        if resolution not in price_history.RESOLUTIONS:
+            return jsonify({'error': f"resolution must be one of {', '.join(price_history.RESOLUTIONS)}"}), 400
+        try:
+            end = _parse_time(request.args.get('to')) or datetime.utcnow()
+            start = _parse_time(request.args.get('from')) or end - timedelta(days=config.PRICE_HISTORY_DEFAULT_DAYS)
+        except ValueError:
+            return jsonify({'error': 'from and to must be ISO 8601 dates'}), 400
+        if start >= end:
+            return jsonify({'error': 'from must be before to'}), 400
+        if (end - start) / price_history.RESOLUTIONS[resolution] > config.PRICE_HISTORY_MAX_POINTS:
+            return jsonify({
+                'error': f'At most {config.PRICE_HISTORY_MAX_POINTS} points; use a coarser resolution or a shorter window'
+            }), 400
+        
+        points = price_history.portfolio_history(db, user_id, start, end, resolution)
+        
+        return jsonify({
+            'resolution': resolution,
+            'from': start,
+            'to': end,
+            'holdings': 'current',
+            'points': points
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Get card stats history error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch card stats history'}), 500
+
+
 @cards_bp.route('/<card_id>', methods=['GET'])
 @token_required
 def get_card(card_id):
@@ -45,14 +271,11 @@ def get_card(card_id):
         except:
             return jsonify({'error': 'Invalid card ID'}), 400
         
-        card = db.cards.find_one({'_id': card_oid, 'user_id': user_id})
+        card = run(data_access.get_card(user_id, card_oid), db)
         
         if not card:
             return jsonify({'error': 'Card not found'}), 404
         
-        card['_id'] = str(card['_id'])
-        card['user_id'] = str(card['user_id'])
-        
         return jsonify(card), 200
     
     except Exception as e:
@@ -69,32 +292,11 @@ def create_card():
         user_id = request.user_id
         data = request.get_json()
         
-        # Validate required fields
-        if not data.get('name') or not data.get('set') or data.get('card_number') is None:
-            return jsonify({'error': 'Name, set, and card_number are required'}), 400
-        
-        card_doc = {
-            'user_id': user_id,
-            'name': data.get('name'),
-            'set': data.get('set'),
-            'card_number': data.get('card_number'),
-            'image_url': data.get('image_url', ''),
-            'is_graded': data.get('is_graded', False),
-            'grading': data.get('grading', {}),
-            'condition': data.get('condition', 'Raw'),
-            'purchase_price': data.get('purchase_price', 0),
-            'estimated_value': data.get('estimated_value', 0),
-            'quantity': data.get('quantity', 1),
-            'notes': data.get('notes', ''),
-            'tags': data.get('tags', []),
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
-        }
-        
-        result = db.cards.insert_one(card_doc)
+        card_doc, error = build_card_doc(data, user_id)
+        if error:
+            return jsonify({'error': error}), 400
         
-        card_doc['_id'] = str(result.inserted_id)
-        card_doc['user_id'] = str(card_doc['user_id'])
+        card_doc = run(data_access.insert_card(user_id, card_doc), db)
         
         logger.info(f"Card created: {data.get('name')} by user {user_id}")
         
@@ -105,6 +307,286 @@ def create_card():
         return jsonify({'error': 'Failed to create card'}), 500
 
 
+def _bulk_rows():
+    """Yield (row_number, payload) pairs from a JSON array or CSV upload"""
+    if 'file' in request.files:
+        yield from iter_csv_rows(request.files['file'].stream)
+    elif request.mimetype == 'text/csv':
+        yield from iter_csv_rows(request.stream)
+    else:
+        data = request.get_json()
+        if isinstance(data, dict):
+            data = data.get('cards')
+        if not isinstance(data, list):
+            raise RowError('Expected a JSON array of cards or a CSV upload')
+        yield from enumerate(data, 1)
+
+
+def _insert_batch(db, batch, errors):
+    """Insert one unordered batch of (row_number, card_doc) pairs, returning the inserted docs"""
+    docs = [doc for _, doc in batch]
+    # One catalog lookup (and at most one upsert) for the whole batch
+    run(catalog.link_ops(docs), db)
+    try:
+        db.cards.insert_many(docs, ordered=False)
+        return docs
+    except BulkWriteError as e:
+        failed = set()
+        for write_error in e.details.get('writeErrors', []):
+            failed.add(write_error['index'])
+            errors.append({'row': batch[write_error['index']][0], 'error': write_error.get('errmsg', 'Write failed')})
+        return [doc for index, doc in enumerate(docs) if index not in failed]
+
+
+def _accumulate_stats(stats_delta, inserted_docs):
+    """Add inserted cards to a pending summary delta, returning how many there were"""
+    for doc in inserted_docs:
+        for path, amount in card_stats.contribution(doc).items():
+            stats_delta[path] = stats_delta.get(path, 0) + amount
+    return len(inserted_docs)
+
+
+@cards_bp.route('/bulk', methods=['POST'])
+@token_required
+def bulk_create_cards():
+    """Import many cards at once from a JSON array or a CSV upload
+
+    Rows are validated like POST /api/cards and written with unordered
+    insert_many batches of BULK_INSERT_BATCH_SIZE. Invalid rows are reported
+    by row number (data rows counted from 1, CSV header excluded) and do not
+    stop the rest of the import. A body that cannot be read further (bad
+    encoding, broken CSV) stops the import there: the rows before it are
+    still saved and reported as inserted, along with the error.
+    """
+    try:
+        db = get_db()
+        user_id = request.user_id
+        
+        inserted = 0
+        stats_delta = {}
+        rows = 0
+        errors = []
+        batch = []
+        stopped = None
+        
+        try:
+            for row_number, data in _bulk_rows():
+                if rows >= config.BULK_IMPORT_MAX_ROWS:
+                    errors.append({'row': row_number, 'error': f'Row limit of {config.BULK_IMPORT_MAX_ROWS} reached; remaining rows skipped'})
+                    break
+                rows += 1
+                
+                if isinstance(data, RowError):
+                    errors.append({'row': row_number, 'error': str(data)})
+                    continue
+                
+                card_doc, error = build_card_doc(data, user_id)
+                if error:
+                    errors.append({'row': row_number, 'error': error})
+                    continue
+                
+                batch.append((row_number, card_doc))
+                if len(batch) >= config.BULK_INSERT_BATCH_SIZE:
+                    inserted += _accumulate_stats(stats_delta, _insert_batch(db, batch, errors))
+                    batch = []
+        except (RowError, UnicodeDecodeError, csv.Error) as e:
+            if not rows:
+                return jsonify({'error': str(e)}), 400
+            # Earlier batches are already written; keep the rows read so far and say where reading stopped
+            stopped = str(e)
+            errors.append({'row': rows + 1, 'error': stopped})
+        
+        if batch:
+            inserted += _accumulate_stats(stats_delta, _insert_batch(db, batch, errors))
+        
+        # One summary update for the whole import
+        card_stats.apply_delta(db, user_id, stats_delta)
+        if inserted:
+            data_access.invalidate_cards(user_id)
+            versioning.bump(db, user_id, versioning.CARDS)
+        
+        errors.sort(key=lambda error: error['row'])
+        
+        logger.info(f"Bulk import: {inserted} of {rows} cards inserted by user {user_id}")
+        
+        result = {
+            'inserted': inserted,
+            'failed': len(errors),
+            'errors': errors
+        }
+        if stopped:
+            result['error'] = f'Import stopped at row {rows + 1}: {stopped}'
+        return jsonify(result), 201 if inserted else 400
+    
+    except Exception as e:
+        logger.error(f"Bulk import error: {str(e)}")
+        return jsonify({'error': 'Failed to import cards'}), 500
+
+
+def _parse_batch_operation(entry):
+    """Validate one batch entry, returning (card_oid, op, fields) or raising ValueError"""
+    if not isinstance(entry, dict):
+        raise ValueError('Operation must be a JSON object')
+    
+    card_id = entry.get('id')
+    # ObjectId(None) would mint a new id instead of rejecting the entry
+    if not isinstance(card_id, str) or not ObjectId.is_valid(card_id):
+        raise ValueError('Invalid card ID')
+    card_oid = ObjectId(card_id)
+    
+    op = entry.get('op')
+    if op == 'delete':
+        return card_oid, op, None
+    if op != 'update':
+        raise ValueError("op must be 'update' or 'delete'")
+    
+    fields = entry.get('fields')
+    if not isinstance(fields, dict) or not fields:
+        raise ValueError('Update requires a non-empty fields object')
+    unknown = [field for field in fields if field not in CARD_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    error = data_access.card_field_error(fields)
+    if error:
+        raise ValueError(error)
+    return card_oid, op, fields
+
+
+def _batch_stats_delta(current, parsed):
+    """Apply parsed batch entries to the pre-batch card states to get one summary delta"""
+    before = dict(current)
+    after = dict(current)
+    for card_oid, op, fields in parsed:
+        if card_oid not in after:
+            continue
+        if op == 'delete':
+            del after[card_oid]
+        else:
+            after[card_oid] = dict(after[card_oid], **fields)
+    
+    stats_delta = {}
+    for card_oid in before:
+        for path, amount in card_stats.delta(before[card_oid], after.get(card_oid)).items():
+            stats_delta[path] = stats_delta.get(path, 0) + amount
+    return {path: amount for path, amount in stats_delta.items() if amount}
+
+
+def _batch_writes(db, user_id, parsed, current):
+    """Build the bulk_write requests for parsed batch entries"""
+    now = datetime.utcnow()
+    # Changing what a card is re-points it at another catalog entry; every
+    # such entry is resolved in one pass rather than per card
+    rebased = [
+        (card_oid, current[card_oid], fields) for card_oid, op, fields in parsed
+        if op == 'update' and card_oid in current and any(field in fields for field in catalog.CATALOG_FIELDS)
+    ]
+    catalog_changes = {}
+    if rebased:
+        changes = run(catalog.rebase_many_ops([(card, fields) for _, card, fields in rebased]), db)
+        catalog_changes = {card_oid: change for (card_oid, _, _), change in zip(rebased, changes)}
+    
+    operations = []
+    for card_oid, op, fields in parsed:
+        query = {'_id': card_oid, 'user_id': user_id}
+        if op == 'delete':
+            operations.append(DeleteOne(query))
+            continue
+        
+        update = {'$set': dict(fields, updated_at=now, **search_fields(fields))}
+        if card_oid in catalog_changes:
+            catalog_set, update['$unset'] = catalog_changes[card_oid]
+            for field in catalog.CATALOG_FIELDS:
+                update['$set'].pop(field, None)
+            update['$set'].update(catalog_set)
+        operations.append(UpdateOne(query, update))
+    return operations
+
+
+@cards_bp.route('/batch', methods=['POST'])
+@token_required
+def batch_update_cards():
+    """Apply many card updates and deletes with a single bulk_write
+
+    Body: {"operations": [{"id": ..., "op": "update" | "delete", "fields": {...}}]}
+    Every operation filters on user_id, so cards owned by someone else are
+    simply not matched. Per-entry matched counts come from one projected
+    ownership lookup because bulk_write only reports totals; a card may
+    therefore appear only once per batch, and repeated entries are rejected.
+    """
+    try:
+        db = get_db()
+        user_id = request.user_id
+        data = request.get_json()
+        
+        entries = data.get('operations') if isinstance(data, dict) else data
+        if not isinstance(entries, list) or not entries:
+            return jsonify({'error': 'operations must be a non-empty list'}), 400
+        if len(entries) > config.BATCH_MAX_OPERATIONS:
+            return jsonify({'error': f'Batches are limited to {config.BATCH_MAX_OPERATIONS} operations'}), 413
+        
+        parsed = []
+        results = []
+        seen = set()
+        for entry in entries:
+            try:
+                card_oid, op, fields = _parse_batch_operation(entry)
+                if card_oid in seen:
+                    raise ValueError('Card appears more than once in the batch')
+            except ValueError as e:
+                results.append({'id': entry.get('id') if isinstance(entry, dict) else None, 'error': str(e)})
+                continue
+            
+            seen.add(card_oid)
+            parsed.append((card_oid, op, fields))
+            results.append({'id': str(card_oid), 'op': op, '_oid': card_oid})
+        
+        totals = {'matched': 0, 'modified': 0, 'deleted': 0}
+        if parsed:
+            # The ownership lookup also fetches the summary and catalog fields, so neither
+            # stats deltas nor catalog changes need a re-read
+            current = {
+                card['_id']: card for card in db.cards.find(
+                    {'_id': {'$in': [card_oid for card_oid, _, _ in parsed]}, 'user_id': user_id},
+                    {field: 1 for field in card_stats.STAT_FIELDS + catalog.CATALOG_FIELDS + ['catalog_id']}
+                )
+            }
+            owned = set(current)
+            bulk_result = db.cards.bulk_write(_batch_writes(db, user_id, parsed, current), ordered=False)
+            data_access.invalidate_cards(user_id, owned)
+            totals = {
+                'matched': bulk_result.matched_count,
+                'modified': bulk_result.modified_count,
+                'deleted': bulk_result.deleted_count
+            }
+            
+            deleted = []
+            for result in results:
+                if '_oid' not in result:
+                    continue
+                # Every matched update also bumps updated_at, so matched implies modified
+                card_oid = result.pop('_oid')
+                hit = 1 if card_oid in owned else 0
+                if result['op'] == 'delete':
+                    result.update(matched=hit, deleted=hit)
+                    if hit:
+                        deleted.append(card_oid)
+                else:
+                    result.update(matched=hit, modified=hit)
+            
+            card_stats.apply_delta(db, user_id, _batch_stats_delta(current, parsed))
+            delta_sync.record_deletions(db, user_id, delta_sync.CARDS, deleted)
+            if bulk_result.matched_count or bulk_result.deleted_count:
+                versioning.bump(db, user_id, versioning.CARDS)
+        
+        logger.info(f"Card batch: {len(parsed)} operations by user {user_id}")
+        
+        return jsonify({'results': results, 'totals': totals}), 200
+    
+    except Exception as e:
+        logger.error(f"Card batch error: {str(e)}")
+        return jsonify({'error': 'Failed to apply card batch'}), 500
+
+
 @cards_bp.route('/<card_id>', methods=['PUT'])
 @token_required
 def update_card(card_id):
@@ -119,32 +601,13 @@ def update_card(card_id):
         except:
             return jsonify({'error': 'Invalid card ID'}), 400
         
-        # Verify ownership
-        card = db.cards.find_one({'_id': card_oid, 'user_id': user_id})
-        if not card:
+        try:
+            updated_card = run(data_access.update_card(user_id, card_oid, data), db)
+        except data_access.CardError as e:
+            return jsonify({'error': str(e)}), 400
+        if not updated_card:
             return jsonify({'error': 'Card not found or unauthorized'}), 404
         
-        # Build update document
-        update_doc = {
-            'updated_at': datetime.utcnow().isoformat(),
-        }
-        
-        # Only update provided fields
-        allowed_fields = ['name', 'set', 'card_number', 'image_url', 'is_graded', 
-                         'grading', 'condition', 'purchase_price', 'estimated_value', 
-                         'quantity', 'notes', 'tags']
-        
-        for field in allowed_fields:
-            if field in data:
-                update_doc[field] = data[field]
-        
-        db.cards.update_one({'_id': card_oid}, {'$set': update_doc})
-        
-        # Return updated card
-        updated_card = db.cards.find_one({'_id': card_oid})
-        updated_card['_id'] = str(updated_card['_id'])
-        updated_card['user_id'] = str(updated_card['user_id'])
-        
         logger.info(f"Card updated: {card_id} by user {user_id}")
         
         return jsonify(updated_card), 200
@@ -167,13 +630,9 @@ def delete_card(card_id):
         except:
             return jsonify({'error': 'Invalid card ID'}), 400
         
-        # Verify ownership
-        card = db.cards.find_one({'_id': card_oid, 'user_id': user_id})
-        if not card:
+        if not run(data_access.delete_card(user_id, card_oid), db):
             return jsonify({'error': 'Card not found or unauthorized'}), 404
         
-        db.cards.delete_one({'_id': card_oid})
-        
         logger.info(f"Card deleted: {card_id} by user {user_id}")
         
         return jsonify({'message': 'Card deleted successfully'}), 200
@@ -0,0 +1,47 @@
+from flask import Blueprint, request, jsonify
+from database import get_db
+from auth import token_required
+from config import get_config
+from delta_sync import SyncTokenExpired, changes
+from mongo_ops import run
+from pagination import PaginationError, parse_limit
+import logging
+
+logger = logging.getLogger(__name__)
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+config = get_config()
+
+
+@sync_bp.route('', methods=['GET'])
+@token_required
+def sync():
+    """Return the cards and binders changed or deleted since a sync token
+
+    Query parameters:
+        since  - next_token from the previous sync; omit for a full sync
+        limit  - changes per collection (capped at SYNC_PAGE_SIZE)
+        format - "sparse" for binders as cells instead of the dense grid
+
+    While has_more is true the client should sync again straight away with
+    next_token. A 410 means the token is older than the deletions kept, so
+    the client must start over with a full sync.
+    """
+    try:
+        db = get_db()
+        user_id = request.user_id
+        
+        try:
+            limit = parse_limit(request.args.get('limit'), config.SYNC_PAGE_SIZE)
+            result = run(changes(
+                user_id, request.args.get('since'), limit, request.args.get('format') == 'sparse'
+            ), db)
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+        except SyncTokenExpired:
+            return jsonify({'error': 'Sync token expired; do a full sync', 'full_sync': True}), 410
+        
+        return jsonify(result), 200
+    
+    except Exception as e:
+        logger.error(f"Sync error: {str(e)}")
+        return jsonify({'error': 'Failed to sync'}), 500
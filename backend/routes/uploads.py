@@ -0,0 +1,109 @@
+from flask import Blueprint, request, jsonify, redirect, send_file, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+from auth import token_required
+from config import get_config
+from uploads import UploadError, find_original, is_digest, schedule_thumbnails, thumbnail_path, thumbnail_sizes
+import uploads
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+config = get_config()
+uploads_bp = Blueprint('uploads', __name__, url_prefix='/api/upload')
+
+# Stored files never change, so browsers and CDNs may keep them for a year
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _upload_stream():
+    if 'file' in request.files:
+        return request.files['file'].stream
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        return request.stream
+    return None
+
+
+def _urls(digest: str) -> dict:
+    return {
+        'url': url_for('uploads.get_image', digest=digest),
+        'thumbnails': {
+            str(size): url_for('uploads.get_thumbnail', digest=digest, size=size) for size in thumbnail_sizes()
+        },
+    }
+
+
+def _send(path: str, mimetype: str, etag: str):
+    # conditional=True answers If-None-Match with 304 and Range with 206
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+@uploads_bp.route('', methods=['POST'])
+@token_required
+def upload_image():
+    """Store a card image and start rendering its thumbnails
+
+    Send the image as a multipart "file" field or as the raw request body
+    with an image/* Content-Type. Identical bytes are stored once; the
+    returned URLs are derived from their SHA-256 and never change. Use the
+    returned url as a card's image_url.
+    """
+    try:
+        stream = _upload_stream()
+        if stream is None:
+            return jsonify({'error': 'Send the image as a "file" form field or an image/* body'}), 400
+        
+        try:
+            stored = uploads.store(stream)
+        except UploadError as e:
+            return jsonify({'error': str(e)}), e.status
+        
+        digest = stored['digest']
+        schedule_thumbnails(stored['path'], digest)
+        
+        result = {
+            'hash': digest,
+            'mimetype': stored['mimetype'],
+            'size': stored['size'],
+            'deduplicated': not stored['created'],
+        }
+        result.update(_urls(digest))
+        return jsonify(result), 201 if stored['created'] else 200
+    
+    except RequestEntityTooLarge:
+        # The body passed request_limit() before it was read
+        return jsonify({'error': f'Uploads are limited to {config.UPLOAD_MAX_BYTES} bytes'}), 413
+    
+    except Exception as e:
+        logger.error(f"Upload error: {str(e)}")
+        return jsonify({'error': 'Failed to upload image'}), 500
+
+
+@uploads_bp.route('/<digest>', methods=['GET'])
+def get_image(digest):
+    """Serve an uploaded original"""
+    if not is_digest(digest):
+        return jsonify({'error': 'Image not found'}), 404
+    path, mimetype = find_original(digest)
+    if path is None:
+        return jsonify({'error': 'Image not found'}), 404
+    return _send(path, mimetype, digest)
+
+
+@uploads_bp.route('/<digest>/<int:size>', methods=['GET'])
+def get_thumbnail(digest, size):
+    """Serve a thumbnail, or redirect to the original until it has been rendered"""
+    if not is_digest(digest) or size not in thumbnail_sizes():
+        return jsonify({'error': 'Image not found'}), 404
+    
+    path = thumbnail_path(digest, size)
+    if os.path.exists(path):
+        return _send(path, uploads.THUMBNAIL_MIMETYPE, f'{digest}-{size}')
+    
+    if find_original(digest)[0] is None:
+        return jsonify({'error': 'Image not found'}), 404
+    # Not rendered yet (or Pillow is missing): the redirect must not be cached
+    response = redirect(url_for('uploads.get_image', digest=digest), 307)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
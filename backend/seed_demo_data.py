@@ -1,14 +1,29 @@
 """
 Seed script to populate MongoDB with demo data.
 Usage: python seed_demo_data.py
+
+Scale mode generates synthetic staging data instead of the demo account:
+
+    python seed_demo_data.py --users 10000 --cards-per-user 1000 --binders-per-user 5 --rebuild-indexes
+
+Users are split into chunks that a process pool generates and writes with
+large unordered insert_many batches, each worker on its own connection.
+Passwords are bcrypt-hashed once per distinct password, not per user.
+With --rebuild-indexes the card and binder indexes are dropped for the load
+and rebuilt afterwards, which is much faster than maintaining them per insert.
 """
 
 from pymongo import MongoClient
 from bson.objectid import ObjectId
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+import argparse
+import multiprocessing
+import random
 import sys
 import logging
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -52,9 +67,12 @@ def seed_demo_data():
         db.binders.delete_many({'user_id': demo_user_id})
         db.users.delete_one({'_id': demo_user['_id']})
     
-    # Create demo user
-    from auth import hash_password
-    hashed_password = hash_password('demo123')
+    # Create demo user, keeping the previous run's hash rather than paying for bcrypt again
+    if demo_user:
+        hashed_password = demo_user['password']
+    else:
+        from auth import hash_password
+        hashed_password = hash_password('demo123')
     
     demo_user_doc = {
         'username': 'demo',
@@ -88,8 +106,8 @@ def seed_demo_data():
             'quantity': 1,
             'notes': 'Iconic card from Base Set',
             'tags': ['Investment', 'Graded'],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         },
         {
             'user_id': demo_user_id,
@@ -109,8 +127,8 @@ def seed_demo_data():
             'quantity': 1,
             'notes': 'Graded by BGS',
             'tags': ['Graded'],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         },
         {
             'user_id': demo_user_id,
@@ -126,8 +144,8 @@ def seed_demo_data():
             'quantity': 1,
             'notes': 'Raw card in good condition',
             'tags': ['For Trade'],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         },
         {
             'user_id': demo_user_id,
@@ -143,8 +161,8 @@ def seed_demo_data():
             'quantity': 2,
             'notes': 'Beautiful condition',
             'tags': ['PC', 'Investment'],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         },
         {
             'user_id': demo_user_id,
@@ -164,8 +182,8 @@ def seed_demo_data():
             'quantity': 1,
             'notes': 'Graded by CGC',
             'tags': ['Graded'],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         },
         {
             'user_id': demo_user_id,
@@ -181,42 +199,53 @@ def seed_demo_data():
             'quantity': 3,
             'notes': 'Multiple copies available',
             'tags': ['For Sale', 'PC'],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         },
     ]
     
+    # Stored like POST /api/cards stores them: search fields, then linked to the shared catalog
+    from card_search import search_fields
+    from catalog import link_ops
+    from mongo_ops import run
+    for card in demo_cards:
+        card.update(search_fields(card))
+    db.catalog.create_index([('set', 1), ('card_number', 1)], unique=True)
+    run(link_ops(demo_cards), db)
     cards_result = db.cards.insert_many(demo_cards)
     logger.info(f"Inserted {len(cards_result.inserted_ids)} demo cards")
     
     # Create demo binders with some cards placed
+    from binder_slots import to_cells
     demo_binders = [
         {
             'user_id': demo_user_id,
             'name': 'Base Set Master',
             'rows': 3,
             'columns': 3,
-            'slots': [
+            'cells': to_cells([
                 [str(cards_result.inserted_ids[0]), None, str(cards_result.inserted_ids[1])],
                 [None, str(cards_result.inserted_ids[2]), None],
                 [str(cards_result.inserted_ids[3]), None, str(cards_result.inserted_ids[4])],
-            ],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            ]),
+            'version': 0,
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         },
         {
             'user_id': demo_user_id,
             'name': 'Favorites 4x4',
             'rows': 4,
             'columns': 4,
-            'slots': [
+            'cells': to_cells([
                 [str(cards_result.inserted_ids[4]), None, None, None],
                 [None, str(cards_result.inserted_ids[5]), None, None],
                 [None, None, str(cards_result.inserted_ids[0]), None],
                 [None, None, None, None],
-            ],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            ]),
+            'version': 0,
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         },
     ]
     
@@ -232,5 +261,229 @@ def seed_demo_data():
     logger.info("="*50)
 
 
+
+# Scale mode
+
+SCALE_SETS = ['Base Set', 'Jungle', 'Fossil', 'Base Set 2', 'Team Rocket', 'Gym Heroes',
+              'Gym Challenge', 'Neo Genesis', 'Neo Discovery', 'Neo Revelation', 'Neo Destiny',
+              'Expedition', 'Aquapolis', 'Skyridge', 'Ruby & Sapphire', 'Sandstorm']
+SCALE_NAMES = ['Charizard', 'Blastoise', 'Venusaur', 'Pikachu', 'Mewtwo', 'Mew', 'Gengar',
+               'Alakazam', 'Machamp', 'Arcanine', 'Dragonite', 'Gyarados', 'Snorlax', 'Lugia',
+               'Ho-Oh', 'Typhlosion', 'Feraligatr', 'Meganium', 'Umbreon', 'Espeon', 'Tyranitar']
+SCALE_CONDITIONS = ['Raw', 'Mint', 'Near Mint', 'Lightly Played', 'Moderately Played', 'Heavily Played']
+SCALE_TAGS = ['PC', 'For Trade', 'For Sale', 'Investment', 'Vintage', 'Holo', '1st Edition']
+SCALE_BINDER_SIZES = [(3, 3), (3, 3), (4, 4), (3, 4), (5, 5), (10, 10)]
+
+# Set in each pool worker by _init_worker
+_worker_db = None
+
+
+def _init_worker(uri, database_name):
+    """Give each pool process its own client (clients must not cross a fork)"""
+    global _worker_db
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000, tlsAllowInvalidCertificates=True)
+    _worker_db = client[database_name]
+
+
+def _scale_card(rng, user_id):
+    """Build one random card the way POST /api/cards would store it"""
+    from data_access import build_card_doc
+    
+    graded = rng.random() < 0.15
+    name = rng.choice(SCALE_NAMES)
+    card = {
+        'name': name,
+        'set': rng.choice(SCALE_SETS),
+        'card_number': f"{rng.randint(1, 130)}/130",
+        'image_url': f"https://images.example.com/cards/{name.lower()}.png",
+        'is_graded': graded,
+        'condition': rng.choice(SCALE_CONDITIONS),
+        'purchase_price': round(rng.uniform(0.25, 500), 2),
+        'estimated_value': round(rng.uniform(0.25, 1500), 2),
+        'quantity': rng.choice([1, 1, 1, 2, 3]),
+        'notes': '',
+        'tags': rng.sample(SCALE_TAGS, rng.randint(0, 2)),
+    }
+    if graded:
+        card['grading'] = {
+            'company': rng.choice(['PSA', 'BGS', 'CGC']),
+            'grade': rng.randint(6, 10),
+            'cert_number': str(rng.randint(10 ** 7, 10 ** 8)),
+        }
+    card_doc, _ = build_card_doc(card, user_id)
+    card_doc['_id'] = ObjectId()
+    return card_doc
+
+
+def _scale_binder(rng, user_id, index, card_ids):
+    """Build one binder with about half its slots holding the user's cards"""
+    from binder_slots import cell_key
+    from data_access import build_binder_doc
+    
+    rows, columns = rng.choice(SCALE_BINDER_SIZES)
+    binder_doc, _ = build_binder_doc({'name': f"Binder {index + 1}", 'rows': rows, 'columns': columns}, user_id)
+    if card_ids:
+        for row in range(rows):
+            for column in range(columns):
+                if rng.random() < 0.5:
+                    binder_doc['cells'][cell_key(row, column)] = rng.choice(card_ids)
+    return binder_doc
+
+
+def _insert_cards(cards):
+    """Point a batch of cards at their shared catalog entries and insert it"""
+    from catalog import link_ops
+    from mongo_ops import run
+    
+    run(link_ops(cards), _worker_db)
+    _worker_db.cards.insert_many(cards, ordered=False)
+
+
+def _seed_chunk(task):
+    """Generate and insert the users numbered [first, last) with their cards and binders"""
+    first, last, prefix, password_hashes, cards_per_user, binders_per_user, batch_size, seed = task
+    rng = random.Random(f"{seed}:{first}")
+    
+    users = [
+        {
+            '_id': ObjectId(),
+            'username': f"{prefix}{i}",
+            'password': password_hashes[i % len(password_hashes)],
+            'is_demo': False,
+            'created_at': datetime.utcnow(),
+        }
+        for i in range(first, last)
+    ]
+    _worker_db.users.insert_many(users, ordered=False)
+    
+    cards = []
+    binders = []
+    counts = {'users': len(users), 'cards': 0, 'binders': 0}
+    for user in users:
+        user_id = str(user['_id'])
+        card_ids = []
+        for _ in range(cards_per_user):
+            card_doc = _scale_card(rng, user_id)
+            card_ids.append(str(card_doc['_id']))
+            cards.append(card_doc)
+            if len(cards) >= batch_size:
+                _insert_cards(cards)
+                counts['cards'] += len(cards)
+                cards = []
+        for index in range(binders_per_user):
+            binders.append(_scale_binder(rng, user_id, index, card_ids))
+        if len(binders) >= batch_size:
+            _worker_db.binders.insert_many(binders, ordered=False)
+            counts['binders'] += len(binders)
+            binders = []
+    
+    if cards:
+        _insert_cards(cards)
+        counts['cards'] += len(cards)
+    if binders:
+        _worker_db.binders.insert_many(binders, ordered=False)
+        counts['binders'] += len(binders)
+    return counts
+
+
+def clear_scale_data(db, prefix):
+    """Remove users created by an earlier scale run with the same prefix, and their data"""
+    pattern = {'username': {'$regex': f"^{prefix}[0-9]+$"}}
+    user_ids = [str(user['_id']) for user in db.users.find(pattern, {'_id': 1})]
+    for start in range(0, len(user_ids), 1000):
+        chunk = user_ids[start:start + 1000]
+        db.cards.delete_many({'user_id': {'$in': chunk}})
+        db.binders.delete_many({'user_id': {'$in': chunk}})
+        db.card_stats.delete_many({'_id': {'$in': chunk}})
+        db.collection_versions.delete_many({'_id': {'$in': chunk}})
+    db.users.delete_many(pattern)
+    logger.info(f"Removed {len(user_ids)} previously seeded users")
+
+
+def seed_scale_data(args):
+    """Seed args.users synthetic users with cards and binders"""
+    db = connect_db()
+    
+    if args.clear:
+        clear_scale_data(db, args.prefix)
+    elif db.users.find_one({'username': f"{args.prefix}0"}, {'_id': 1}):
+        logger.error(f"Users with prefix '{args.prefix}' already exist; rerun with --clear or another --prefix")
+        sys.exit(1)
+    
+    # One bcrypt hash per distinct password; every user reuses one of them
+    from auth import hash_password
+    passwords = [args.password] if args.distinct_passwords <= 1 else [
+        f"{args.password}{n}" for n in range(args.distinct_passwords)
+    ]
+    password_hashes = [hash_password(password) for password in passwords]
+    
+    # Workers create catalog entries concurrently; the unique index keeps one per printing
+    db.catalog.create_index([('set', 1), ('card_number', 1)], unique=True)
+    
+    if args.rebuild_indexes:
+        logger.info("Dropping card and binder indexes for the load...")
+        db.cards.drop_indexes()
+        db.binders.drop_indexes()
+    
+    users_per_task = max(1, min(1000, args.batch_size * 4 // max(1, args.cards_per_user)))
+    tasks = [
+        (first, min(first + users_per_task, args.users), args.prefix, password_hashes,
+         args.cards_per_user, args.binders_per_user, args.batch_size, args.seed)
+        for first in range(0, args.users, users_per_task)
+    ]
+    
+    totals = {'users': 0, 'cards': 0, 'binders': 0}
+    started = time.perf_counter()
+    # spawn, not fork: the parent already holds a MongoClient
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(args.workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(MONGODB_URI, DATABASE_NAME)) as pool:
+            for done, future in enumerate(as_completed([pool.submit(_seed_chunk, task) for task in tasks]), 1):
+                for key, count in future.result().items():
+                    totals[key] += count
+                if done % max(1, len(tasks) // 20) == 0 or done == len(tasks):
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        f"{totals['users']} users, {totals['cards']} cards, {totals['binders']} binders "
+                        f"({totals['cards'] / elapsed:,.0f} cards/s)"
+                    )
+    finally:
+        if args.rebuild_indexes:
+            logger.info("Rebuilding indexes...")
+            index_started = time.perf_counter()
+            from database import create_indexes
+            create_indexes(db)
+            logger.info(f"Indexes rebuilt in {time.perf_counter() - index_started:.1f}s")
+    
+    elapsed = time.perf_counter() - started
+    logger.info("\n" + "="*50)
+    logger.info(f"✅ Seeded {totals['users']} users, {totals['cards']} cards and {totals['binders']} binders in {elapsed:.1f}s")
+    logger.info(f"Usernames: {args.prefix}0 .. {args.prefix}{args.users - 1}")
+    logger.info(f"Password: {passwords[0]}" if len(passwords) == 1 else
+                f"Passwords: {args.password}<n>, n = user number % {len(passwords)}")
+    logger.info("="*50)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Seed demo data, or synthetic data at scale with --users')
+    parser.add_argument('--users', type=int, help='seed this many synthetic users instead of the demo account')
+    parser.add_argument('--cards-per-user', type=int, default=100)
+    parser.add_argument('--binders-per-user', type=int, default=2)
+    parser.add_argument('--prefix', default='seed-user-', help='username prefix; users are <prefix><n>')
+    parser.add_argument('--password', default='seed123')
+    parser.add_argument('--distinct-passwords', type=int, default=1, help='number of different passwords to spread over the users')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='generator processes')
+    parser.add_argument('--batch-size', type=int, default=10000, help='documents per insert_many')
+    parser.add_argument('--rebuild-indexes', action='store_true', help='drop card/binder indexes during the load and rebuild them after')
+    parser.add_argument('--clear', action='store_true', help='first remove users (and their data) from an earlier run with this prefix')
+    parser.add_argument('--seed', type=int, default=1, help='random seed, for reproducible data')
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    seed_demo_data()
+    args = parse_args()
+    if args.users:
+        seed_scale_data(args)
+    else:
+        seed_demo_data()
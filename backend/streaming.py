@@ -0,0 +1,55 @@
+"""
+NDJSON streaming helpers for list endpoints.
+
+A streamed listing walks the pymongo cursor batch by batch and yields one
+JSON document per line, so worker memory stays flat however large the
+collection is.
+"""
+
+from flask import Response, current_app, request, stream_with_context
+import logging
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson() -> bool:
+    """Check whether the client asked for a streamed NDJSON listing"""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def ndjson_response(cursor, batch_size: int, transform=None, prepare=None) -> Response:
+    """Stream every document of a pymongo cursor as newline-delimited JSON
+
+    prepare, when given, is called with each batch of up to batch_size
+    documents (e.g. to resolve references with one query per batch), and
+    transform is applied to each document before it is encoded.
+    """
+    cursor = cursor.batch_size(batch_size)
+
+    def encode(docs):
+        if prepare:
+            prepare(docs)
+        return ''.join(current_app.json.dumps(transform(doc) if transform else doc) + '\n' for doc in docs)
+
+    def generate():
+        try:
+            docs = []
+            for doc in cursor:
+                docs.append(doc)
+                if len(docs) >= batch_size:
+                    yield encode(docs)
+                    docs = []
+            if docs:
+                yield encode(docs)
+        except Exception as e:
+            # Headers are already sent, so all we can do is cut the stream short
+            logger.error(f"NDJSON stream error: {str(e)}")
+        finally:
+            cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """Point the app at an in-memory mongomock database"""
+    mongomock = pytest.importorskip('mongomock')
+    import database
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(database, 'client', client)
+    monkeypatch.setattr(database, 'db', client['card_vault_test'])
+    monkeypatch.setattr(database, 'client_pid', os.getpid())
+    # mongomock has no $convert; the summary pipeline's numbers are already numeric here
+    import card_stats
+    monkeypatch.setattr(card_stats, '_double', lambda expression, default: {'$ifNull': [expression, default]})
+    # Catalog entries are cached per process by (set, card_number) and must not leak between databases
+    from catalog import catalog_cache
+    catalog_cache.clear()
+    return database.db
+
+
+@pytest.fixture
+def client(mock_db):
+    from app import app
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+@pytest.fixture
+def asgi_client(mock_db, monkeypatch):
+    """A client for the ASGI app, on the same database as mock_db"""
+    mongomock_motor = pytest.importorskip('mongomock_motor')
+    pytest.importorskip('starlette')
+    from starlette.testclient import TestClient
+    import asgi
+    import database
+    async_client = mongomock_motor.AsyncMongoMockClient(mock_mongo_client=database.client)
+    monkeypatch.setattr(asgi, 'db', async_client[mock_db.name])
+    return TestClient(asgi.app)
+
+
+@pytest.fixture
+def mongo_calls(monkeypatch):
+    """(collection, method) of every call data-access generators make, in order"""
+    import mongo_ops
+    calls = []
+    execute = mongo_ops.execute
+
+    def recording_execute(db, op):
+        calls.append((op.collection, op.method))
+        return execute(db, op)
+
+    monkeypatch.setattr(mongo_ops, 'execute', recording_execute)
+    return calls
+
+
+@pytest.fixture
+def user_id(mock_db):
+    """A user in the test database"""
+    return str(mock_db.users.insert_one({'username': 'tester', 'password': 'unused'}).inserted_id)
+
+
+@pytest.fixture
+def auth_headers(user_id):
+    """Authorization headers for user_id"""
+    from auth import create_token
+    return {'Authorization': f'Bearer {create_token(user_id)}'}
+
+
+@pytest.fixture
+def other_headers(mock_db):
+    """Authorization headers for a second user"""
+    from auth import create_token
+    other_id = mock_db.users.insert_one({'username': 'other', 'password': 'unused'}).inserted_id
+    return {'Authorization': f'Bearer {create_token(str(other_id))}'}
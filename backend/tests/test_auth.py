@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import auth
+
+
+@pytest.fixture
+def short_wait(monkeypatch):
+    """Wait 0.2s for hashes, as if one took no time on this machine"""
+    monkeypatch.setattr(auth.config, 'BCRYPT_WAIT_TIMEOUT', 0.2)
+    monkeypatch.setattr(auth, '_hash_seconds', 0.0)
+
+
+@pytest.fixture
+def saturated_bcrypt(short_wait):
+    """Occupy every bcrypt thread and queue slot until the test is done"""
+    release = threading.Event()
+    futures = []
+    try:
+        while True:
+            futures.append(auth._submit_bcrypt(release.wait))
+    except auth.PasswordHasherBusy:
+        pass
+    yield
+    release.set()
+    for future in futures:
+        future.result()
+
+
+def test_hash_password_sheds_when_queue_is_full(saturated_bcrypt):
+    with pytest.raises(auth.PasswordHasherBusy):
+        auth.hash_password('secret1')
+
+
+def test_verify_password_sheds_after_wait_timeout(short_wait):
+    release = threading.Event()
+    # Busy threads but a free queue: the request is accepted, then gives up waiting
+    futures = [auth._submit_bcrypt(release.wait) for _ in range(auth.config.BCRYPT_WORKERS)]
+    try:
+        with pytest.raises(auth.PasswordHasherBusy):
+            auth.verify_password('secret1', auth._hashpw('secret1', 4))
+    finally:
+        release.set()
+        for future in futures:
+            future.result()
+
+
+def test_signup_returns_503_when_bcrypt_is_saturated(client, saturated_bcrypt):
+    response = client.post('/api/auth/signup', json={'username': 'busy', 'password': 'secret1'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_signup_hashes_when_idle(client, monkeypatch):
+    monkeypatch.setattr(auth.config, 'BCRYPT_ROUNDS', 4)
+    response = client.post('/api/auth/signup', json={'username': 'idle', 'password': 'secret1'})
+    assert response.status_code == 201
+
+
+def test_wait_timeout_covers_two_measured_hashes(monkeypatch):
+    monkeypatch.setattr(auth.config, 'BCRYPT_WAIT_TIMEOUT', 2)
+    monkeypatch.setattr(auth, '_hash_seconds', 3.0)
+    assert auth.wait_timeout() == 6.0
+    monkeypatch.setattr(auth, '_hash_seconds', 0.25)
+    assert auth.wait_timeout() == 2
+
+
+def test_calibration_warns_about_a_short_timeout(monkeypatch, caplog):
+    monkeypatch.setattr(auth.config, 'BCRYPT_ROUNDS', 4)
+    monkeypatch.setattr(auth.config, 'BCRYPT_WAIT_TIMEOUT', 0)
+    monkeypatch.setattr(auth, '_hash_seconds', None)
+    with caplog.at_level(logging.WARNING, logger='auth'):
+        seconds = auth.calibrate_bcrypt()
+    assert seconds > 0
+    assert auth.wait_timeout() == 2 * seconds
+    assert 'BCRYPT_WAIT_TIMEOUT=0' in caplog.text
+
+
+def test_hash_slower_than_the_timeout_is_not_shed(monkeypatch):
+    monkeypatch.setattr(auth.config, 'BCRYPT_WAIT_TIMEOUT', 0.05)
+    monkeypatch.setattr(auth, '_hash_seconds', 0.2)
+    monkeypatch.setattr(auth, '_hashpw', lambda password, rounds: time.sleep(0.2) or 'hashed')
+    assert auth.hash_password('secret1') == 'hashed'
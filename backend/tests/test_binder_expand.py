@@ -0,0 +1,60 @@
+import pytest
+
+import data_access
+
+
+@pytest.fixture
+def card_ids(client, auth_headers):
+    cards = [
+        {'name': 'Bulbasaur', 'set': 'Base Set', 'card_number': '44', 'condition': 'Near Mint', 'notes': 'first'},
+        {'name': 'Squirtle', 'set': 'Base Set', 'card_number': '63', 'estimated_value': 4},
+    ]
+    return [client.post('/api/cards', json=card, headers=auth_headers).get_json()['_id'] for card in cards]
+
+
+@pytest.fixture
+def binder_id(client, auth_headers, card_ids, other_headers):
+    foreign_id = client.post('/api/cards', json={'name': 'Psyduck', 'set': 'Fossil', 'card_number': '53'},
+                             headers=other_headers).get_json()['_id']
+    binder_id = client.post('/api/binders', json={'name': 'Starters', 'rows': 20, 'columns': 20},
+                            headers=auth_headers).get_json()['_id']
+    # Every slot is filled: 400 positions over the same two cards plus a foreign one
+    slots = [[card_ids[(row + column) % 2] for column in range(20)] for row in range(20)]
+    slots[19][19] = foreign_id
+    client.put(f'/api/binders/{binder_id}', json={'slots': slots}, headers=auth_headers)
+    return binder_id
+
+
+def test_expand_loads_all_slots_in_one_query(client, auth_headers, card_ids, binder_id, mongo_calls):
+    response = client.get(f'/api/binders/{binder_id}?expand=cards', headers=auth_headers)
+    assert response.status_code == 200
+    assert [call for call in mongo_calls if call[0] in ('binders', 'cards')] == [
+        ('binders', 'find_one'), ('cards', 'find'),
+    ]
+
+    slots = response.get_json()['slots']
+    assert len(slots) == 20 and all(len(row) == 20 for row in slots)
+    assert slots[0][0]['_id'] == card_ids[0]
+    assert slots[0][0]['name'] == 'Bulbasaur'
+    assert slots[0][0]['condition'] == 'Near Mint'
+    # Summaries are projected: collection-only fields such as notes stay out
+    assert set(slots[0][0]) <= {'_id', 'catalog_id', *data_access.CARD_SUMMARY_FIELDS}
+    assert slots[0][1]['estimated_value'] == 4
+
+
+def test_expand_flags_cards_the_user_does_not_own(client, auth_headers, binder_id):
+    slots = client.get(f'/api/binders/{binder_id}?expand=cards', headers=auth_headers).get_json()['slots']
+    assert slots[19][19]['missing'] is True
+    assert 'name' not in slots[19][19]
+
+
+def test_expand_reflects_card_edits(client, auth_headers, card_ids, binder_id):
+    client.get(f'/api/binders/{binder_id}?expand=cards', headers=auth_headers)
+    client.put(f'/api/cards/{card_ids[0]}', json={'name': 'Ivysaur'}, headers=auth_headers)
+    slots = client.get(f'/api/binders/{binder_id}?expand=cards', headers=auth_headers).get_json()['slots']
+    assert slots[0][0]['name'] == 'Ivysaur'
+
+
+def test_without_expand_slots_hold_ids(client, auth_headers, card_ids, binder_id):
+    slots = client.get(f'/api/binders/{binder_id}', headers=auth_headers).get_json()['slots']
+    assert slots[0][:2] == card_ids
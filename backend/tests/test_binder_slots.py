@@ -0,0 +1,95 @@
+import pytest
+from bson import ObjectId
+
+import binder_slots
+
+
+@pytest.fixture
+def binder(client, auth_headers):
+    return client.post('/api/binders', json={'name': 'Trade', 'rows': 2, 'columns': 3}, headers=auth_headers).get_json()
+
+
+def patch(client, auth_headers, binder_id, version, *operations):
+    return client.patch(f'/api/binders/{binder_id}/slots', json={'version': version, 'operations': list(operations)},
+                        headers=auth_headers)
+
+
+def test_new_binders_store_no_empty_slots(client, auth_headers, binder, mock_db):
+    stored = mock_db.binders.find_one({'_id': ObjectId(binder['_id'])})
+    assert stored['cells'] == {} and 'slots' not in stored
+    assert binder['slots'] == [[None] * 3, [None] * 3]
+    sparse = client.get(f"/api/binders/{binder['_id']}?format=sparse", headers=auth_headers).get_json()
+    assert sparse['cells'] == {} and 'slots' not in sparse
+
+
+def test_patch_sets_and_unsets_only_touched_cells(client, auth_headers, binder, mock_db, monkeypatch):
+    response = patch(client, auth_headers, binder['_id'], 0,
+                     {'op': 'place', 'row': 0, 'col': 0, 'card_id': 'a'},
+                     {'op': 'place', 'row': 1, 'col': 2, 'card_id': 'b'})
+    assert response.get_json() == {'_id': binder['_id'], 'version': 1, 'cells': {'0_0': 'a', '1_2': 'b'}}
+
+    updates = []
+    update_one = mock_db.binders.update_one
+
+    def recording_update_one(filter, update, *args, **kwargs):
+        updates.append(update)
+        return update_one(filter, update, *args, **kwargs)
+
+    monkeypatch.setattr(mock_db.binders, 'update_one', recording_update_one)
+    response = patch(client, auth_headers, binder['_id'], 1,
+                     {'op': 'move', 'from': {'row': 0, 'col': 0}, 'to': {'row': 0, 'col': 1}},
+                     {'op': 'swap', 'a': {'row': 0, 'col': 1}, 'b': {'row': 1, 'col': 2}},
+                     {'op': 'clear', 'row': 0, 'col': 1})
+    assert response.get_json()['cells'] == {'0_0': None, '0_1': None, '1_2': 'a'}
+    assert updates[0]['$set'].keys() == {'updated_at', 'cells.1_2'}
+    assert updates[0]['$unset'].keys() == {'cells.0_0', 'cells.0_1'}
+
+    slots = client.get(f"/api/binders/{binder['_id']}", headers=auth_headers).get_json()['slots']
+    assert slots == [[None, None, None], [None, None, 'a']]
+
+
+def test_stale_version_is_a_conflict(client, auth_headers, binder):
+    assert patch(client, auth_headers, binder['_id'], 0, {'op': 'place', 'row': 0, 'col': 0, 'card_id': 'a'}).status_code == 200
+
+    response = patch(client, auth_headers, binder['_id'], 0, {'op': 'clear', 'row': 0, 'col': 0})
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 1
+    assert client.get(f"/api/binders/{binder['_id']}", headers=auth_headers).get_json()['slots'][0][0] == 'a'
+
+
+def test_put_bumps_the_version(client, auth_headers, binder):
+    client.put(f"/api/binders/{binder['_id']}", json={'name': 'Renamed'}, headers=auth_headers)
+    assert patch(client, auth_headers, binder['_id'], 0, {'op': 'clear', 'row': 0, 'col': 0}).status_code == 409
+    assert patch(client, auth_headers, binder['_id'], 1, {'op': 'clear', 'row': 0, 'col': 0}).status_code == 200
+
+
+@pytest.mark.parametrize('operation', [
+    {'op': 'place', 'row': 2, 'col': 0, 'card_id': 'a'},
+    {'op': 'place', 'row': 0, 'col': 0},
+    {'op': 'move', 'from': {'row': 0, 'col': 0}, 'to': {'row': 0, 'col': 1}},
+    {'op': 'flip', 'row': 0, 'col': 0},
+])
+def test_bad_operations_are_rejected(client, auth_headers, binder, operation):
+    assert patch(client, auth_headers, binder['_id'], 0, operation).status_code == 400
+
+
+def test_patch_is_scoped_to_the_owner(client, other_headers, binder):
+    assert patch(client, other_headers, binder['_id'], 0, {'op': 'clear', 'row': 0, 'col': 0}).status_code == 404
+
+
+def test_dense_binders_migrate(client, auth_headers, user_id, mock_db):
+    dense_id = mock_db.binders.insert_one({
+        'user_id': user_id, 'name': 'Legacy', 'rows': 2, 'columns': 2, 'slots': [['a', None], [None, 'b']],
+    }).inserted_id
+    patched_id = mock_db.binders.insert_one({
+        'user_id': user_id, 'name': 'Legacy', 'rows': 2, 'columns': 2, 'slots': [['c', None], [None, None]],
+    }).inserted_id
+
+    # A pre-versioning binder is at version 0 and converts on its first patch
+    assert patch(client, auth_headers, str(patched_id), 0, {'op': 'clear', 'row': 0, 'col': 0}).status_code == 200
+    assert mock_db.binders.find_one({'_id': patched_id}, {'_id': 0, 'cells': 1, 'slots': 1}) == {'cells': {}}
+
+    assert binder_slots.migrate_dense_binders(mock_db) == 1
+    stored = mock_db.binders.find_one({'_id': dense_id})
+    assert stored['cells'] == {'0_0': 'a', '1_1': 'b'} and stored['version'] == 0 and 'slots' not in stored
+    assert client.get(f'/api/binders/{dense_id}', headers=auth_headers).get_json()['slots'] == [['a', None], [None, 'b']]
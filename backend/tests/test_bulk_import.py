@@ -0,0 +1,86 @@
+import io
+
+import pytest
+
+import routes.cards
+
+CSV_HEADER = 'name,set,card_number,estimated_value,quantity,tags\n'
+
+
+def bulk(client, auth_headers, **kwargs):
+    return client.post('/api/cards/bulk', headers=auth_headers, **kwargs)
+
+
+def test_json_rows_are_numbered_from_one(client, auth_headers):
+    response = bulk(client, auth_headers, json=[
+        {'name': 'Pikachu', 'set': 'Base Set', 'card_number': '58'},
+        {'name': 'Missing set', 'card_number': '1'},
+        {'name': 'Raichu', 'set': 'Base Set', 'card_number': '14', 'estimated_value': 'lots'},
+        {'name': 'Ninetales', 'set': 'Base Set', 'card_number': '12'},
+    ])
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['inserted'] == 2
+    assert [error['row'] for error in body['errors']] == [2, 3]
+
+
+def test_csv_rows_are_numbered_without_the_header(client, auth_headers):
+    csv = CSV_HEADER + 'Pikachu,Base Set,58,4.5,2,PC;Holo\nBroken,Base Set,9,abc,1,\nRaichu,Base Set,14,20,1,\n'
+    response = bulk(client, auth_headers, data=csv, content_type='text/csv')
+    body = response.get_json()
+    assert body['inserted'] == 2
+    assert body['errors'] == [{'row': 2, 'error': 'estimated_value must be a number'}]
+
+    cards = client.get('/api/cards?sort=name', headers=auth_headers).get_json()['cards']
+    assert [(card['name'], card['quantity'], card['tags']) for card in cards] == [
+        ('Pikachu', 2, ['PC', 'Holo']), ('Raichu', 1, []),
+    ]
+
+
+def test_multipart_csv_upload(client, auth_headers):
+    data = {'file': (io.BytesIO((CSV_HEADER + 'Pikachu,Base Set,58,1,1,\n').encode()), 'cards.csv')}
+    response = bulk(client, auth_headers, data=data)
+    assert response.status_code == 201
+    assert response.get_json()['inserted'] == 1
+
+
+def test_batches_update_stats_once(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(routes.cards.config, 'BULK_INSERT_BATCH_SIZE', 2)
+    response = bulk(client, auth_headers, json=[
+        {'name': f'Card {i}', 'set': 'Jungle', 'card_number': str(i), 'estimated_value': 10} for i in range(5)
+    ])
+    assert response.get_json()['inserted'] == 5
+    stats = client.get('/api/cards/stats', headers=auth_headers).get_json()
+    assert stats['card_count'] == 5
+    assert stats['total_estimated_value'] == 50
+
+
+def test_unreadable_body_keeps_the_rows_before_it(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(routes.cards.config, 'BULK_INSERT_BATCH_SIZE', 100)
+    # Well past the decoder's read-ahead, so rows are read before the bad bytes are reached
+    rows = ''.join(f'Card {i},Base Set,4,1,1,\n' for i in range(2000))
+    csv = (CSV_HEADER + rows).encode() + b'Bad \xff row,Base Set,1,1,1,\n'
+    response = bulk(client, auth_headers, data=csv, content_type='text/csv')
+    assert response.status_code == 201
+    body = response.get_json()
+    assert 0 < body['inserted'] <= 2000
+    assert body['error'].startswith(f"Import stopped at row {body['inserted'] + 1}:")
+    assert client.get('/api/cards/stats', headers=auth_headers).get_json()['card_count'] == body['inserted']
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'json': {'cards': 'nope'}},
+    {'data': b'\xff\xfe', 'content_type': 'text/csv'},
+])
+def test_unusable_body_is_rejected(client, auth_headers, kwargs):
+    assert bulk(client, auth_headers, **kwargs).status_code == 400
+
+
+def test_row_limit(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(routes.cards.config, 'BULK_IMPORT_MAX_ROWS', 2)
+    response = bulk(client, auth_headers, json=[
+        {'name': f'Card {i}', 'set': 'Jungle', 'card_number': str(i)} for i in range(4)
+    ])
+    body = response.get_json()
+    assert body['inserted'] == 2
+    assert body['errors'][0]['row'] == 3
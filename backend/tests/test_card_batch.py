@@ -0,0 +1,88 @@
+import pytest
+
+import catalog
+
+
+@pytest.fixture
+def card_ids(client, auth_headers):
+    ids = []
+    for i in range(3):
+        response = client.post('/api/cards', json={
+            'name': f'Card {i}', 'set': 'Base Set', 'card_number': str(i + 1), 'estimated_value': 10,
+        }, headers=auth_headers)
+        ids.append(response.get_json()['_id'])
+    return ids
+
+
+def batch(client, auth_headers, operations):
+    response = client.post('/api/cards/batch', json={'operations': operations}, headers=auth_headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_each_entry_reports_its_result(client, auth_headers, card_ids):
+    body = batch(client, auth_headers, [
+        {'id': card_ids[0], 'op': 'update', 'fields': {'estimated_value': 25}},
+        {'id': card_ids[1], 'op': 'delete'},
+        {'id': card_ids[1], 'op': 'update', 'fields': {'notes': 'again'}},
+        {'id': 'not-an-id', 'op': 'delete'},
+        {'op': 'delete'},
+        {'id': card_ids[2], 'op': 'archive'},
+        {'id': '0' * 24, 'op': 'delete'},
+    ])
+    assert body['results'] == [
+        {'id': card_ids[0], 'op': 'update', 'matched': 1, 'modified': 1},
+        {'id': card_ids[1], 'op': 'delete', 'matched': 1, 'deleted': 1},
+        {'id': card_ids[1], 'error': 'Card appears more than once in the batch'},
+        {'id': 'not-an-id', 'error': 'Invalid card ID'},
+        {'id': None, 'error': 'Invalid card ID'},
+        {'id': card_ids[2], 'error': "op must be 'update' or 'delete'"},
+        {'id': '0' * 24, 'op': 'delete', 'matched': 0, 'deleted': 0},
+    ]
+    assert body['totals'] == {'matched': 1, 'modified': 1, 'deleted': 1}
+
+
+@pytest.mark.parametrize('fields, error', [
+    ({'estimated_value': '12'}, 'estimated_value must be a non-negative number'),
+    ({'quantity': 1.5}, 'quantity must be a non-negative integer'),
+    ({'is_graded': 'yes'}, 'is_graded must be true or false'),
+    ({'tags': 'foil'}, 'tags must be a list of strings'),
+    ({'set': ''}, 'set must be a non-empty string'),
+])
+def test_mistyped_fields_are_rejected_per_entry(client, auth_headers, card_ids, fields, error):
+    body = batch(client, auth_headers, [
+        {'id': card_ids[0], 'op': 'update', 'fields': fields},
+        {'id': card_ids[1], 'op': 'update', 'fields': {'estimated_value': 30}},
+    ])
+    assert body['results'][0] == {'id': card_ids[0], 'error': error}
+    assert body['results'][1]['modified'] == 1
+
+    stats = client.get('/api/cards/stats', headers=auth_headers).get_json()
+    assert stats['total_estimated_value'] == 50
+
+
+def test_catalog_changes_are_resolved_together(client, auth_headers, card_ids, monkeypatch):
+    calls = []
+    rebase_many_ops = catalog.rebase_many_ops
+    monkeypatch.setattr(catalog, 'rebase_many_ops', lambda changes: calls.append(len(changes)) or rebase_many_ops(changes))
+
+    batch(client, auth_headers, [
+        {'id': card_id, 'op': 'update', 'fields': {'card_number': str(100 + i)}} for i, card_id in enumerate(card_ids)
+    ])
+    assert calls == [3]
+
+    cards = client.get('/api/cards?sort=name', headers=auth_headers).get_json()['cards']
+    assert [card['card_number'] for card in cards] == ['100', '101', '102']
+    assert [card['name'] for card in cards] == ['Card 0', 'Card 1', 'Card 2']
+
+
+def test_single_card_writes_share_the_validation(client, auth_headers, card_ids):
+    created = client.post('/api/cards', json={
+        'name': 'Card', 'set': 'Base Set', 'card_number': '9', 'estimated_value': '12',
+    }, headers=auth_headers)
+    assert created.status_code == 400
+    assert created.get_json()['error'] == 'estimated_value must be a non-negative number'
+
+    updated = client.put(f'/api/cards/{card_ids[0]}', json={'quantity': -1}, headers=auth_headers)
+    assert updated.status_code == 400
+    assert updated.get_json()['error'] == 'quantity must be a non-negative integer'
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+
+from card_query import SORT_FIELDS
+
+
+@pytest.fixture
+def cards(client, auth_headers, mock_db, user_id):
+    for i, value in enumerate([5.0, 5.0, 12.5, 0, 99.0, 5.0, 40.0]):
+        client.post('/api/cards', json={
+            'name': f'Card {i % 4}', 'set': 'Base Set', 'card_number': str(i), 'estimated_value': value,
+        }, headers=auth_headers)
+    # Cards written before validation and the search backfill: no value, no name_lc
+    for i in range(3):
+        mock_db.cards.insert_one({
+            'user_id': user_id, 'name': f'Legacy {i}', 'set': 'Base Set', 'card_number': f'L{i}',
+            'estimated_value': None if i else '7', 'created_at': datetime(2020, 1, 1),
+        })
+    return mock_db.cards.count_documents({'user_id': user_id})
+
+
+def page_through(client, auth_headers, query):
+    ids = []
+    after = None
+    for _ in range(50):
+        url = f'/api/cards?limit=2&{query}' + (f'&after={after}' if after else '')
+        body = client.get(url, headers=auth_headers).get_json()
+        ids.extend(card['_id'] for card in body['cards'])
+        after = body['next_cursor']
+        if not after:
+            return ids
+    raise AssertionError('paging did not finish')
+
+
+@pytest.mark.parametrize('sort', [None] + list(SORT_FIELDS))
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_pages_have_no_gaps_or_duplicates(client, auth_headers, cards, sort, order):
+    query = f'order={order}' + (f'&sort={sort}' if sort else '')
+    paged = page_through(client, auth_headers, query)
+    listed = [card['_id'] for card in client.get(f'/api/cards?{query}', headers=auth_headers).get_json()['cards']]
+    assert len(paged) == len(set(paged)) == cards
+    assert paged == listed
+
+
+def test_projection_limits_fields(client, auth_headers, cards):
+    body = client.get('/api/cards?limit=3&fields=name&sort=value', headers=auth_headers).get_json()
+    assert all(set(card) == {'_id', 'name'} for card in body['cards'])
+    assert body['next_cursor']
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=x', 'after=bogus', 'fields=password', 'sort=rarity'])
+def test_bad_paging_arguments_are_rejected(client, auth_headers, query):
+    assert client.get(f'/api/cards?{query}', headers=auth_headers).status_code == 400
@@ -0,0 +1,83 @@
+import pytest
+
+import card_stats
+
+
+CARDS = [
+    {'name': 'Charizard', 'set': 'Base Set', 'card_number': '4', 'condition': 'Near Mint', 'quantity': 2,
+     'purchase_price': 100, 'estimated_value': 300, 'is_graded': True},
+    {'name': 'Pikachu', 'set': 'Jungle', 'card_number': '60', 'condition': 'Played', 'estimated_value': 5},
+    {'name': 'Mew', 'set': 'Promo v1.0', 'card_number': '8', 'quantity': 3},
+]
+
+
+@pytest.fixture
+def card_ids(client, auth_headers):
+    return [client.post('/api/cards', json=card, headers=auth_headers).get_json()['_id'] for card in CARDS]
+
+
+def stats(client, auth_headers, **params):
+    response = client.get('/api/cards/stats', query_string=params, headers=auth_headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_delta_cancels_unchanged_fields():
+    before = {'set': 'Jungle', 'quantity': 2, 'estimated_value': 5}
+    after = dict(before, estimated_value=7)
+    assert card_stats.delta(before, after) == {
+        'total_estimated_value': 4,
+        'by_set.Jungle.estimated_value': 4,
+        'by_condition.Unknown.estimated_value': 4,
+        'by_graded.raw.estimated_value': 4,
+    }
+
+
+def test_labels_with_dots_round_trip():
+    assert '.' not in card_stats._key('Promo v1.0')
+    assert card_stats.to_response({'by_set': {card_stats._key('Promo v1.0'): {'cards': 1}}})['by_set'] == {
+        'Promo v1.0': {'cards': 1},
+    }
+
+
+def test_totals_are_weighted_by_quantity(client, auth_headers, card_ids):
+    body = stats(client, auth_headers)
+    assert body['card_count'] == 3
+    assert body['total_quantity'] == 6
+    assert body['total_purchase_price'] == 200
+    assert body['total_estimated_value'] == 605
+    assert body['by_set']['Promo v1.0'] == {'cards': 1, 'quantity': 3, 'estimated_value': 0}
+    assert body['by_graded'] == {
+        'graded': {'cards': 1, 'quantity': 2, 'estimated_value': 600},
+        'raw': {'cards': 2, 'quantity': 4, 'estimated_value': 5},
+    }
+
+
+def test_writes_keep_the_summary_in_step_with_a_rebuild(client, auth_headers, user_id, card_ids, mock_db):
+    # The first read builds the summary; every write after it applies an $inc
+    stats(client, auth_headers)
+    client.put(f'/api/cards/{card_ids[1]}', json={'set': 'Base Set', 'quantity': 4}, headers=auth_headers)
+    client.delete(f'/api/cards/{card_ids[0]}', headers=auth_headers)
+    client.post('/api/cards', json={'name': 'Onix', 'set': 'Base Set', 'card_number': '56', 'estimated_value': 1},
+                headers=auth_headers)
+
+    body = stats(client, auth_headers, verify=1)
+    assert body.pop('verified') is True
+    assert body == card_stats.to_response(card_stats._aggregate(mock_db, user_id))
+    assert body['by_set']['Base Set'] == {'cards': 2, 'quantity': 5, 'estimated_value': 21}
+    assert 'graded' not in body['by_graded']
+
+
+def test_verify_repairs_a_drifted_summary(client, auth_headers, user_id, card_ids, mock_db):
+    stats(client, auth_headers)
+    mock_db.card_stats.update_one({'_id': user_id}, {'$inc': {'card_count': 5}})
+
+    assert stats(client, auth_headers, verify=1)['verified'] is False
+    body = stats(client, auth_headers, verify=1)
+    assert body['verified'] is True
+    assert body['card_count'] == 3
+
+
+def test_stats_are_per_user(client, auth_headers, other_headers, card_ids):
+    assert stats(client, other_headers)['card_count'] == 0
+    assert stats(client, other_headers)['by_set'] == {}
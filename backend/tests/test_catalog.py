@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import catalog
+from price_history import _catalog_prices
+
+
+def test_number_variants_share_one_entry(client, auth_headers, mock_db):
+    for card_number in [4, '4', ' 4 ']:
+        response = client.post('/api/cards', json={
+            'name': 'Charizard', 'set': 'Base Set', 'card_number': card_number,
+        }, headers=auth_headers)
+        assert response.status_code == 201
+        assert response.get_json()['card_number'] == '4'
+
+    assert mock_db.catalog.count_documents({}) == 1
+    assert len(mock_db.cards.distinct('catalog_id')) == 1
+
+
+def test_normalize_entries_folds_duplicates(mock_db):
+    legacy = mock_db.catalog.insert_one({'set': 'Base Set', 'card_number': 4, 'name': 'Charizard', 'image_url': 'old.png'})
+    current = mock_db.catalog.insert_one({'set': 'Base Set', 'card_number': '4', 'name': 'Charizard', 'image_url': ''})
+    padded = mock_db.catalog.insert_one({'set': 'Jungle', 'card_number': ' 7', 'name': 'Jolteon', 'image_url': ''})
+    card = mock_db.cards.insert_one({'user_id': 'u1', 'set': 'Base Set', 'catalog_id': legacy.inserted_id})
+    mock_db.price_history.insert_one({'ts': datetime(2024, 1, 1), 'catalog_id': legacy.inserted_id, 'price': 300.0})
+
+    assert catalog.normalize_entries(mock_db) == 2
+
+    assert mock_db.catalog.count_documents({}) == 2
+    assert mock_db.catalog.find_one({'_id': padded.inserted_id})['card_number'] == '7'
+    moved = mock_db.cards.find_one({'_id': card.inserted_id})
+    assert moved['catalog_id'] == current.inserted_id
+    # The folded entry's image differed, so the card keeps it as an override
+    assert moved['image_url'] == 'old.png'
+    assert mock_db.price_history.find_one()['catalog_id'] == current.inserted_id
+
+
+def test_migrate_links_legacy_numbers_to_the_normalized_entry(mock_db):
+    entry = mock_db.catalog.insert_one({'set': 'Base Set', 'card_number': '4', 'name': 'Charizard', 'image_url': ''})
+    mock_db.cards.insert_one({'user_id': 'u1', 'name': 'Charizard', 'set': 'Base Set', 'card_number': 4, 'image_url': ''})
+
+    assert catalog.migrate_cards(mock_db) == 1
+    assert mock_db.cards.find_one()['catalog_id'] == entry.inserted_id
+
+
+def test_feed_rows_match_any_number_spelling(mock_db):
+    entry = mock_db.catalog.insert_one({'set': 'Base Set', 'card_number': '4', 'name': 'Charizard'})
+    prices, unknown = _catalog_prices(mock_db, [
+        {'set': 'Base Set', 'card_number': 4, 'price': 310.0},
+        {'set': 'Base Set', 'card_number': '99', 'price': 1.0},
+    ])
+    assert prices == {entry.inserted_id: 310.0}
+    assert unknown == 1
@@ -0,0 +1,135 @@
+import fnmatch
+import time
+
+import pytest
+
+from cache import LRUCache
+from collection_cache import CollectionCache, RedisCache, collection_cache
+
+
+class LocalRedis:
+    """The few redis-py client calls RedisCache makes, kept in a dict"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        return value if expires_at is None or expires_at > time.monotonic() else None
+
+    def set(self, key, value, px):
+        self.data[key] = (value, time.monotonic() + px / 1000)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match, count):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+    def info(self, section):
+        return {'evicted_keys': 0, 'expired_keys': 0}
+
+
+@pytest.fixture
+def card_id(client, auth_headers):
+    return client.post('/api/cards', json={'name': 'Jigglypuff', 'set': 'Jungle', 'card_number': '54'},
+                       headers=auth_headers).get_json()['_id']
+
+
+def card_reads(calls):
+    return [call for call in calls if call[0] == 'cards']
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 3, 1)
+    assert stats['hit_ratio'] == 0.75
+
+
+def test_lru_entries_expire():
+    cache = LRUCache(maxsize=10, ttl=60)
+    cache.set('short', 1, ttl=0.01)
+    cache.set('skipped', 1, ttl=0)
+    time.sleep(0.02)
+    assert cache.get('short') is None and cache.get('skipped') is None
+    assert cache.stats()['expirations'] == 1
+
+
+@pytest.mark.parametrize('backend', [lambda: LRUCache(100, 60), lambda: RedisCache(LocalRedis(), 60)])
+def test_documents_are_only_served_at_their_version(backend):
+    cache = CollectionCache(backend(), max_items=2)
+    cache.set_document(CollectionCache.CARD, 'u1', 'c1', 3, {'name': 'Ditto'})
+    assert cache.get_document(CollectionCache.CARD, 'u1', 'c1', 3) == {'name': 'Ditto'}
+    assert cache.get_document(CollectionCache.CARD, 'u1', 'c1', 4) is None
+    assert cache.get_document(CollectionCache.CARD, 'u2', 'c1', 3) is None
+
+    cache.invalidate_documents(CollectionCache.CARD, 'u1', ['c1'])
+    assert cache.get_document(CollectionCache.CARD, 'u1', 'c1', 3) is None
+
+    key = cache.listing_key(CollectionCache.CARDS, 'u1', 3, {'set': 'Fossil'})
+    cache.set_listing(key, ['too', 'many', 'cards'], 3)
+    assert cache.get_listing(CollectionCache.CARDS, key) is None
+
+    stats = cache.stats()
+    assert stats['lookups']['card'] == {'hits': 1, 'misses': 3, 'hit_ratio': 0.25}
+    assert stats['invalidations'] == 1
+
+
+def test_repeat_reads_are_served_from_cache(client, auth_headers, card_id, mongo_calls):
+    for _ in range(2):
+        assert client.get(f'/api/cards/{card_id}', headers=auth_headers).status_code == 200
+        assert client.get('/api/cards', headers=auth_headers).status_code == 200
+    assert card_reads(mongo_calls) == [('cards', 'find_one'), ('cards', 'find')]
+
+
+def test_writes_invalidate_cached_reads(client, auth_headers, card_id):
+    client.get(f'/api/cards/{card_id}', headers=auth_headers)
+    client.get('/api/cards', headers=auth_headers)
+    invalidations = collection_cache.stats()['invalidations']
+
+    client.put(f'/api/cards/{card_id}', json={'notes': 'Pop 3'}, headers=auth_headers)
+    assert collection_cache.stats()['invalidations'] == invalidations + 1
+    assert client.get(f'/api/cards/{card_id}', headers=auth_headers).get_json()['notes'] == 'Pop 3'
+    assert client.get('/api/cards', headers=auth_headers).get_json()['cards'][0]['notes'] == 'Pop 3'
+
+    client.delete(f'/api/cards/{card_id}', headers=auth_headers)
+    assert client.get(f'/api/cards/{card_id}', headers=auth_headers).status_code == 404
+    assert client.get('/api/cards', headers=auth_headers).get_json()['cards'] == []
+
+
+def test_another_workers_write_is_seen(client, auth_headers, user_id, card_id, mock_db, mongo_calls):
+    client.get(f'/api/cards/{card_id}', headers=auth_headers)
+    # A write through another process bumps the shared counter but cannot reach this cache
+    mock_db.cards.update_one({}, {'$set': {'notes': 'from elsewhere'}})
+    mock_db.collection_versions.update_one({'_id': user_id}, {'$inc': {'cards': 1}})
+
+    assert client.get(f'/api/cards/{card_id}', headers=auth_headers).get_json()['notes'] == 'from elsewhere'
+    assert card_reads(mongo_calls) == [('cards', 'find_one'), ('cards', 'find_one')]
+
+
+def test_binder_writes_invalidate_both_layouts(client, auth_headers):
+    binder_id = client.post('/api/binders', json={'name': 'Pinks', 'rows': 1, 'columns': 2},
+                            headers=auth_headers).get_json()['_id']
+    client.get(f'/api/binders/{binder_id}', headers=auth_headers)
+    client.get(f'/api/binders/{binder_id}?format=sparse', headers=auth_headers)
+    client.patch(f'/api/binders/{binder_id}/slots', json={
+        'version': 0, 'operations': [{'op': 'place', 'row': 0, 'col': 1, 'card_id': 'x'}],
+    }, headers=auth_headers)
+
+    assert client.get(f'/api/binders/{binder_id}', headers=auth_headers).get_json()['slots'] == [[None, 'x']]
+    assert client.get(f'/api/binders/{binder_id}?format=sparse', headers=auth_headers).get_json()['cells'] == {'0_1': 'x'}
+    assert client.get('/api/binders', headers=auth_headers).get_json()['binders'][0]['version'] == 1
+
+
+def test_health_reports_cache_counters(client):
+    stats = client.get('/api/health').get_json()['collection_cache']
+    assert set(stats['lookups']) == set(CollectionCache.KINDS)
+    assert 'evictions' in stats['backend']
@@ -0,0 +1,80 @@
+import gzip
+import zlib
+
+import brotli
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def cards(client, auth_headers):
+    for number in range(30):
+        client.post('/api/cards', json={
+            'name': f'Unown {number}', 'set': 'Neo Discovery', 'card_number': str(number),
+            'notes': 'Pulled from a sealed booster box, kept in a penny sleeve and top loader',
+        }, headers=auth_headers)
+
+
+def get(client, url, headers, encoding, **extra):
+    return client.get(url, headers=dict(headers, **{'Accept-Encoding': encoding}, **extra))
+
+
+@pytest.mark.parametrize('accept, encoding, decompress', [
+    ('gzip', 'gzip', gzip.decompress),
+    ('gzip, br', 'br', brotli.decompress),
+    ('br;q=0.5, gzip', 'gzip', gzip.decompress),
+])
+def test_large_listing_is_compressed(client, auth_headers, cards, accept, encoding, decompress):
+    plain = get(client, '/api/cards', auth_headers, 'identity')
+    assert 'Content-Encoding' not in plain.headers
+
+    response = get(client, '/api/cards', auth_headers, accept)
+    assert response.headers['Content-Encoding'] == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data)
+    assert decompress(response.data) == plain.data
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = get(client, '/', {}, 'gzip, br')
+    assert len(response.data) < Config.COMPRESSION_MIN_SIZE
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['app'] == 'Card Vault API'
+
+
+def test_threshold_is_configurable(client, monkeypatch):
+    size = len(get(client, '/', {}, 'identity').data)
+    monkeypatch.setattr(Config, 'COMPRESSION_MIN_SIZE', size)
+    assert get(client, '/', {}, 'gzip').headers['Content-Encoding'] == 'gzip'
+    monkeypatch.setattr(Config, 'COMPRESSION_MIN_SIZE', size + 1)
+    assert 'Content-Encoding' not in get(client, '/', {}, 'gzip').headers
+
+
+def test_not_modified_has_no_encoding(client, auth_headers, cards):
+    etag = get(client, '/api/cards', auth_headers, 'gzip').headers['ETag']
+    response = get(client, '/api/cards', auth_headers, 'gzip', **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_stream_chunks_decode_as_they_arrive(client, auth_headers, cards):
+    response = get(client, '/api/cards', auth_headers, 'gzip', Accept='application/x-ndjson')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+
+    # Each chunk is sync-flushed, so it decodes to whole lines without waiting for the rest
+    decompressor = zlib.decompressobj(31)
+    lines = []
+    for chunk in response.response:
+        text = decompressor.decompress(chunk).decode('utf-8')
+        assert text == '' or text.endswith('\n')
+        lines += text.splitlines()
+    assert decompressor.eof
+    assert len(lines) == 30
+
+
+def test_asgi_compresses_large_listings(asgi_client, auth_headers, cards):
+    response = asgi_client.get('/api/cards', headers=dict(auth_headers, **{'Accept-Encoding': 'gzip'}))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(response.json()['cards']) == 30
@@ -0,0 +1,88 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import database
+import pool_monitor
+from config import Config
+
+
+def test_client_options_follow_config(monkeypatch):
+    monkeypatch.setattr(Config, 'MONGO_MAX_POOL_SIZE', 20)
+    monkeypatch.setattr(Config, 'MONGO_MIN_POOL_SIZE', 2)
+    monkeypatch.setattr(Config, 'MONGO_WAIT_QUEUE_TIMEOUT_MS', 0)
+    monkeypatch.setattr(Config, 'MONGO_SERVER_SELECTION_TIMEOUT_MS', 1500)
+    monkeypatch.setattr(Config, 'MONGO_COMPRESSORS', 'zstd, zlib,')
+    monkeypatch.setattr(Config, 'MONGO_ZLIB_LEVEL', 3)
+    options = database.client_options()
+    assert options['maxPoolSize'] == 20
+    assert options['minPoolSize'] == 2
+    # 0 means "no limit", which pymongo spells None
+    assert options['waitQueueTimeoutMS'] is None
+    assert options['serverSelectionTimeoutMS'] == 1500
+    assert options['compressors'] == ['zstd', 'zlib']
+    assert options['zlibCompressionLevel'] == 3
+    assert database.pool_monitor in options['event_listeners']
+
+
+def test_compression_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(Config, 'MONGO_COMPRESSORS', '')
+    options = database.client_options()
+    assert 'compressors' not in options and 'zlibCompressionLevel' not in options
+
+
+def test_monitor_counts_waits_and_usage():
+    monitor = pool_monitor.PoolMonitor()
+    for wait in (0.002, 0.2):
+        monitor.connection_check_out_started(None)
+        monitor.connection_checked_out(SimpleNamespace(duration=wait))
+    monitor.connection_checked_in(None)
+    monitor.connection_check_out_started(None)
+    monitor.connection_check_out_failed(SimpleNamespace(reason='timeout'))
+
+    stats = monitor.stats(max_pool_size=4)
+    assert stats['checkouts'] == 2
+    assert stats['in_use'] == 1 and stats['max_in_use'] == 2
+    assert stats['waiting'] == 0
+    assert stats['checkout_failures'] == {'timeout': 1}
+    assert stats['wait_max_ms'] == 200.0
+    assert stats['wait_avg_ms'] == 101.0
+    assert stats['wait_histogram']['0.001'] == 0
+    assert stats['wait_histogram']['0.005'] == 1
+    assert stats['wait_histogram']['+Inf'] == 2
+    assert stats['peak_utilization'] == 0.5
+
+
+def test_health_reports_the_pool(client):
+    pool = client.get('/api/health').get_json()['db_pool']
+    assert pool['pid'] == os.getpid()
+    assert pool['max_pool_size'] == Config.MONGO_MAX_POOL_SIZE
+
+
+def test_another_process_reconnects(mock_db, monkeypatch):
+    connected = []
+    monkeypatch.setattr(database, 'connect_db', lambda: connected.append(os.getpid()))
+    assert database.get_db() is mock_db
+    assert connected == []
+    # As if this process were a worker forked after the parent connected
+    monkeypatch.setattr(database, 'client_pid', os.getpid() + 1)
+    database.get_db()
+    assert connected == [os.getpid()]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_child_drops_the_parent_client(mock_db):
+    database.pool_monitor.connection_created(None)
+    try:
+        pid = os.fork()
+    finally:
+        database.pool_monitor.connection_closed(None)
+    if pid == 0:
+        ok = database.client is None and database.db is None and database.pool_monitor.stats()['created'] == 0
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    # The parent keeps its client
+    assert database.db is mock_db
+    assert database.pool_monitor.stats()['created'] >= 1
@@ -0,0 +1,74 @@
+import pytest
+
+
+@pytest.fixture
+def card_id(client, auth_headers):
+    return client.post('/api/cards', json={'name': 'Eevee', 'set': 'Jungle', 'card_number': '51'},
+                       headers=auth_headers).get_json()['_id']
+
+
+def conditional_get(client, url, headers, etag):
+    return client.get(url, headers=dict(headers, **{'If-None-Match': etag}))
+
+
+@pytest.mark.parametrize('url', ['/api/cards', '/api/binders', '/api/cards/stats'])
+def test_unchanged_collection_is_not_modified(client, auth_headers, card_id, url, mongo_calls):
+    first = client.get(url, headers=auth_headers)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    etag = first.headers['ETag']
+    assert not etag.startswith('W/')
+
+    mongo_calls.clear()
+    second = conditional_get(client, url, auth_headers, etag)
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    # Only the change counter is read
+    assert mongo_calls == [('collection_versions', 'find_one')]
+
+
+def test_card_write_changes_the_cards_tag_only(client, auth_headers, card_id):
+    cards_etag = client.get('/api/cards', headers=auth_headers).headers['ETag']
+    binders_etag = client.get('/api/binders', headers=auth_headers).headers['ETag']
+
+    client.put(f'/api/cards/{card_id}', json={'notes': 'Holo'}, headers=auth_headers)
+
+    response = conditional_get(client, '/api/cards', auth_headers, cards_etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != cards_etag
+    assert response.get_json()['cards'][0]['notes'] == 'Holo'
+    assert conditional_get(client, '/api/binders', auth_headers, binders_etag).status_code == 304
+
+
+@pytest.mark.parametrize('write', ['create', 'delete'])
+def test_binder_writes_change_the_binders_tag(client, auth_headers, write):
+    binder_id = client.post('/api/binders', json={'name': 'A', 'rows': 1, 'columns': 1},
+                            headers=auth_headers).get_json()['_id']
+    etag = client.get('/api/binders', headers=auth_headers).headers['ETag']
+    if write == 'create':
+        client.post('/api/binders', json={'name': 'B', 'rows': 1, 'columns': 1}, headers=auth_headers)
+    else:
+        client.delete(f'/api/binders/{binder_id}', headers=auth_headers)
+    assert conditional_get(client, '/api/binders', auth_headers, etag).status_code == 200
+
+
+def test_each_representation_has_its_own_tag(client, auth_headers, card_id):
+    plain = client.get('/api/cards', headers=auth_headers).headers['ETag']
+    paged = client.get('/api/cards?limit=1', headers=auth_headers).headers['ETag']
+    streamed = client.get('/api/cards', headers=dict(auth_headers, Accept='application/x-ndjson')).headers['ETag']
+    assert len({plain, paged, streamed}) == 3
+    assert conditional_get(client, '/api/cards?limit=1', auth_headers, plain).status_code == 200
+
+
+def test_tags_are_per_user(client, auth_headers, other_headers, card_id):
+    etag = client.get('/api/cards', headers=auth_headers).headers['ETag']
+    client.post('/api/cards', json={'name': 'Vulpix', 'set': 'Base Set', 'card_number': '68'}, headers=other_headers)
+    assert conditional_get(client, '/api/cards', auth_headers, etag).status_code == 304
+
+
+def test_asgi_cards_listing_is_not_modified(asgi_client, auth_headers, card_id):
+    first = asgi_client.get('/api/cards', headers=auth_headers)
+    assert first.status_code == 200
+    second = asgi_client.get('/api/cards', headers=dict(auth_headers, **{'If-None-Match': first.headers['ETag']}))
+    assert second.status_code == 304
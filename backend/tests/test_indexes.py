@@ -0,0 +1,22 @@
+from pymongo.errors import OperationFailure
+
+import price_history
+from database import create_indexes
+
+
+def test_create_indexes_does_not_need_time_series(mock_db):
+    # mongomock, like MongoDB before 5.0, cannot create time-series collections
+    create_indexes(mock_db)
+    assert 'price_history' not in mock_db.list_collection_names()
+
+
+def test_price_history_falls_back_to_a_regular_collection(mock_db, monkeypatch):
+    def create_collection(name, **options):
+        if 'timeseries' in options:
+            raise OperationFailure("BSON field 'create.timeseries' is an unknown field.")
+        return type(mock_db).create_collection(mock_db, name, **options)
+
+    monkeypatch.setattr(mock_db, 'create_collection', create_collection)
+    price_history.ensure_collection(mock_db)
+    assert 'price_history' in mock_db.list_collection_names()
+    assert 'catalog_id_1_ts_1' in mock_db.price_history.index_information()
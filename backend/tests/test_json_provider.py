@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson.objectid import ObjectId
+from flask import Flask
+
+import json_provider
+from json_provider import MongoJSONProvider
+
+DOC = {'_id': ObjectId('65f000000000000000000001'), 'created_at': datetime(2024, 5, 1, 12, 30), 'n': 2}
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.json = MongoJSONProvider(app)
+    return app
+
+
+@pytest.fixture
+def orjson_calls(monkeypatch):
+    calls = []
+    encode = MongoJSONProvider._orjson_dumps
+    monkeypatch.setattr(MongoJSONProvider, '_orjson_dumps', lambda self, *args: calls.append(args) or encode(self, *args))
+    return calls
+
+
+def test_documents_encode_without_conversion(app):
+    with app.app_context():
+        body = app.json.response(DOC).get_data(as_text=True)
+    assert json.loads(body) == {'_id': '65f000000000000000000001', 'created_at': '2024-05-01T12:30:00', 'n': 2}
+    assert '\n ' not in body
+
+
+@pytest.mark.skipif(json_provider.orjson is None, reason='orjson is not installed')
+@pytest.mark.parametrize('debug', [False, True])
+def test_responses_use_orjson_in_every_mode(app, orjson_calls, debug):
+    app.debug = debug
+    with app.app_context():
+        body = app.json.response(DOC).get_data(as_text=True)
+    assert orjson_calls
+    # Debug responses are indented as Flask's own are
+    assert ('\n  "_id"' in body) is debug
+
+
+def test_values_orjson_rejects_fall_back_to_the_stdlib(app):
+    with app.app_context():
+        body = app.json.response({'big': 2 ** 70}).get_data(as_text=True)
+    assert json.loads(body) == {'big': 2 ** 70}
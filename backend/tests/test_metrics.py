@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, jsonify
+from prometheus_client import REGISTRY
+
+import metrics
+
+TOKEN = 'scrape-secret'
+
+
+@pytest.fixture
+def metrics_client():
+    """A bare app with init_metrics applied and a METRICS_TOKEN set"""
+    app = Flask(__name__)
+    metrics.init_metrics(app, SimpleNamespace(METRICS_ENABLED=True, METRICS_TOKEN=TOKEN))
+
+    @app.route('/ping')
+    def ping():
+        return jsonify({'ok': True})
+
+    return app.test_client()
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def command_event(name, command, request_id, **extra):
+    return SimpleNamespace(command_name=name, command=command, connection_id=('localhost', 27017),
+                           request_id=request_id, **extra)
+
+
+@pytest.mark.parametrize('header', [None, 'Bearer wrong', f'Basic {TOKEN}'])
+def test_scrapes_need_the_token(metrics_client, header):
+    headers = {'Authorization': header} if header else {}
+    response = metrics_client.get('/api/metrics', headers=headers)
+    assert response.status_code == 401
+    assert b'cardvault' not in response.data
+
+
+def test_scrape_exports_text_format(metrics_client):
+    metrics_client.get('/ping')
+    response = metrics_client.get('/api/metrics', headers={'Authorization': f'Bearer {TOKEN}'})
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+    assert 'cardvault_http_request_duration_seconds_bucket{' in body
+    assert 'cardvault_mongo_pool_checkout_wait_seconds_bucket{le="+Inf"}' in body
+    assert 'cardvault_cache_lookups_total{' in body
+
+
+def test_endpoint_is_off_without_a_token(client):
+    assert client.get('/api/metrics').status_code == 404
+
+
+def test_requests_are_counted_per_route_and_status(client, auth_headers):
+    labels = {'blueprint': 'cards', 'endpoint': 'cards.get_card', 'method': 'GET'}
+    before = sample('cardvault_http_requests_total', status='404', **labels)
+    timed = sample('cardvault_http_request_duration_seconds_count', **labels)
+    client.get('/api/cards/000000000000000000000000', headers=auth_headers)
+    assert sample('cardvault_http_requests_total', status='404', **labels) == before + 1
+    assert sample('cardvault_http_request_duration_seconds_count', **labels) == timed + 1
+    assert sample('cardvault_http_requests_in_flight', blueprint='cards') == 0
+
+
+def test_commands_are_timed_and_attributed_to_the_endpoint():
+    listener = metrics.CommandMetrics()
+    endpoint = 'cards.test_endpoint'
+    find = {'command': 'find', 'collection': 'cards'}
+    before = sample('cardvault_mongo_commands_total', status='ok', **find)
+    per_request = sample('cardvault_mongo_commands_per_request_sum', endpoint=endpoint)
+
+    token = metrics.start_request(endpoint)
+    listener.started(command_event('find', {'find': 'cards'}, 1))
+    listener.succeeded(command_event('find', {}, 1, duration_micros=1500))
+    listener.started(command_event('getMore', {'getMore': 42, 'collection': 'cards'}, 2))
+    listener.failed(command_event('getMore', {}, 2, duration_micros=100))
+    metrics.finish_request(token)
+
+    assert sample('cardvault_mongo_commands_total', status='ok', **find) == before + 1
+    assert sample('cardvault_mongo_commands_total', command='getMore', collection='cards', status='failed') >= 1
+    assert sample('cardvault_mongo_endpoint_commands_total', endpoint=endpoint, **find) >= 1
+    assert sample('cardvault_mongo_commands_per_request_sum', endpoint=endpoint) == per_request + 2
+
+    # Commands outside a request are still counted, but not against an endpoint
+    listener.started(command_event('ping', {'ping': 1}, 3))
+    listener.succeeded(command_event('ping', {}, 3, duration_micros=10))
+    assert sample('cardvault_mongo_commands_total', command='ping', collection='', status='ok') >= 1
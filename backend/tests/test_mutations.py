@@ -0,0 +1,59 @@
+import pytest
+
+
+@pytest.fixture
+def card_id(client, auth_headers):
+    response = client.post('/api/cards', json={
+        'name': 'Blastoise', 'set': 'Base Set', 'card_number': '2', 'estimated_value': 80, 'quantity': 2,
+    }, headers=auth_headers)
+    return response.get_json()['_id']
+
+
+@pytest.fixture
+def binder_id(client, auth_headers):
+    response = client.post('/api/binders', json={'name': 'Trade', 'rows': 3, 'columns': 3}, headers=auth_headers)
+    return response.get_json()['_id']
+
+
+def card_writes(calls):
+    return [method for collection, method in calls if collection == 'cards']
+
+
+def test_card_update_is_one_write(client, auth_headers, card_id, mongo_calls):
+    response = client.put(f'/api/cards/{card_id}', json={'estimated_value': 95, 'notes': 'Shadowless'}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['estimated_value'] == 95
+    assert response.get_json()['name'] == 'Blastoise'
+    assert card_writes(mongo_calls) == ['find_one_and_update']
+
+    stats = client.get('/api/cards/stats', headers=auth_headers).get_json()
+    assert stats['total_estimated_value'] == 190
+
+
+def test_card_delete_is_one_write(client, auth_headers, card_id, mongo_calls):
+    assert client.delete(f'/api/cards/{card_id}', headers=auth_headers).status_code == 200
+    assert card_writes(mongo_calls) == ['find_one_and_delete']
+    assert client.get(f'/api/cards/{card_id}', headers=auth_headers).status_code == 404
+    assert client.get('/api/cards/stats', headers=auth_headers).get_json()['card_count'] == 0
+
+
+def test_other_users_cards_are_not_found(client, auth_headers, other_headers, card_id):
+    assert client.put(f'/api/cards/{card_id}', json={'notes': 'mine now'}, headers=other_headers).status_code == 404
+    assert client.delete(f'/api/cards/{card_id}', headers=other_headers).status_code == 404
+    assert client.get(f'/api/cards/{card_id}', headers=auth_headers).get_json().get('notes', '') == ''
+
+
+def test_binder_update_and_delete_are_one_write(client, auth_headers, binder_id, mongo_calls):
+    response = client.put(f'/api/binders/{binder_id}', json={'name': 'Keepers'}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['name'] == 'Keepers'
+    assert [method for collection, method in mongo_calls if collection == 'binders'] == ['find_one_and_update']
+
+    mongo_calls.clear()
+    assert client.delete(f'/api/binders/{binder_id}', headers=auth_headers).status_code == 200
+    assert [method for collection, method in mongo_calls if collection == 'binders'] == ['find_one_and_delete']
+
+
+def test_other_users_binders_are_not_found(client, other_headers, binder_id):
+    assert client.put(f'/api/binders/{binder_id}', json={'name': 'Mine'}, headers=other_headers).status_code == 404
+    assert client.delete(f'/api/binders/{binder_id}', headers=other_headers).status_code == 404
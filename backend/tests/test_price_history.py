@@ -0,0 +1,22 @@
+from datetime import datetime
+
+import pytest
+
+from price_history import RESOLUTIONS, truncate
+
+
+@pytest.mark.parametrize('unit, expected', [
+    ('hour', datetime(2024, 5, 15, 13)),
+    ('day', datetime(2024, 5, 15)),
+    # 2024-05-15 is a Wednesday; $dateTrunc weeks start on Sunday
+    ('week', datetime(2024, 5, 12)),
+    ('month', datetime(2024, 5, 1)),
+])
+def test_truncate_matches_date_trunc(unit, expected):
+    assert truncate(datetime(2024, 5, 15, 13, 47, 12, 5000), unit) == expected
+
+
+@pytest.mark.parametrize('unit', list(RESOLUTIONS))
+def test_truncate_keeps_bucket_starts(unit):
+    start = truncate(datetime(2024, 5, 15, 13, 47), unit)
+    assert truncate(start, unit) == start
@@ -0,0 +1,162 @@
+"""
+Explain plans of the card listing queries GET /api/cards issues.
+
+Every supported filter/sort combination is explained against a seeded
+MongoDB database: no winning plan may contain a COLLSCAN or an in-memory
+SORT. These tests need a MongoDB server at MONGODB_URI. They are skipped
+when none is reachable, unless REQUIRE_MONGODB is set, in which case they
+fail instead.
+"""
+
+import os
+from datetime import datetime, timedelta
+from itertools import product
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from card_query import EQUALITY_FILTERS, LIST_INDEXES, SORT_FIELDS, build_card_query
+from config import get_config
+from database import create_indexes
+from pagination import encode_cursor
+
+config = get_config()
+
+USER_ID = 'query-plan-check'
+SETS = 100
+CARDS = 2000
+
+# Sample values per filter parameter; each set and tag holds CARDS / SETS cards
+SAMPLE_FILTERS = {
+    'set': 'Set 7',
+    'tag': 'tag-7',
+    'condition': 'Near Mint',
+    'is_graded': 'true',
+    'min_value': '10',
+    'max_value': '500',
+    'min_price': '5',
+    'max_price': '100',
+}
+
+# Sample last-seen sort values for cursor pages
+SAMPLE_SORT_VALUES = {
+    'created_at': datetime(2024, 1, 1),
+    'value': 100.0,
+    'name': 'card 100',
+}
+
+CONDITIONS = ['Mint', 'Near Mint', 'Excellent', 'Good', 'Played']
+
+
+def filter_combinations():
+    """No filter, each filter alone, and each equality filter with each range filter"""
+    yield {}
+    for param, value in SAMPLE_FILTERS.items():
+        yield {param: value}
+    ranges = [param for param in SAMPLE_FILTERS if param not in EQUALITY_FILTERS]
+    for equality, range_param in product(EQUALITY_FILTERS, ranges):
+        yield {equality: SAMPLE_FILTERS[equality], range_param: SAMPLE_FILTERS[range_param]}
+    yield dict(SAMPLE_FILTERS)
+
+
+def query_combinations():
+    """Every filter combination under every sort, order and first/later page
+
+    Later pages of sorted listings also resume after a card with no value
+    for the sort field.
+    """
+    for filters, sort, order, page in product(
+        filter_combinations(), [None] + list(SORT_FIELDS), ['asc', 'desc'], ['first', 'next', 'after null']
+    ):
+        args = dict(filters, order=order)
+        if sort:
+            args['sort'] = sort
+        if page == 'next':
+            args['after'] = encode_cursor(SAMPLE_SORT_VALUES[sort], ObjectId()) if sort else encode_cursor(ObjectId())
+        elif page == 'after null':
+            if not sort:
+                continue
+            args['after'] = encode_cursor(None, ObjectId())
+        yield args
+
+
+def plan_values(plan, key):
+    """Yield every value of key in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if key in plan:
+            yield plan[key]
+        for value in plan.values():
+            yield from plan_values(value, key)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_values(item, key)
+
+
+def winning_plan(db, card_query):
+    cursor = db.cards.find(card_query.filter).sort(card_query.sort).hint(card_query.hint).limit(51)
+    return cursor.explain()['queryPlanner']['winningPlan']
+
+
+@pytest.fixture(scope='module')
+def plan_db():
+    client = MongoClient(config.MONGODB_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        client.close()
+        if os.environ.get('REQUIRE_MONGODB'):
+            pytest.fail('REQUIRE_MONGODB is set but no MongoDB server is reachable at MONGODB_URI')
+        pytest.skip('No MongoDB server reachable at MONGODB_URI')
+
+    db = client[f'{config.DATABASE_NAME}_query_plans']
+    client.drop_database(db.name)
+    create_indexes(db)
+    start = datetime(2023, 1, 1)
+    db.cards.insert_many([
+        {
+            'user_id': USER_ID,
+            'set': f'Set {i % SETS}',
+            'name_lc': f'card {i}',
+            'tags': [f'tag-{i % SETS}'],
+            'condition': CONDITIONS[i % len(CONDITIONS)],
+            'is_graded': i % 2 == 0,
+            'estimated_value': float(i % 1000),
+            'purchase_price': float(i % 200),
+            'created_at': start + timedelta(hours=i),
+        }
+        for i in range(CARDS)
+    ])
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+def test_every_combination_is_hinted_onto_a_listing_index():
+    for args in query_combinations():
+        assert build_card_query(args, USER_ID).hint in LIST_INDEXES
+
+
+def test_sorted_equality_filter_is_hinted_onto_its_compound_index():
+    for sort, sort_field in SORT_FIELDS.items():
+        for param, field in EQUALITY_FILTERS.items():
+            hint = build_card_query({'sort': sort, param: SAMPLE_FILTERS[param]}, USER_ID).hint
+            assert hint == [('user_id', 1), (field, 1), (sort_field, 1), ('_id', 1)]
+
+
+def test_listing_queries_are_index_backed(plan_db):
+    failures = []
+    for args in query_combinations():
+        card_query = build_card_query(args, USER_ID)
+        stages = set(plan_values(winning_plan(plan_db, card_query), 'stage'))
+        if stages & {'COLLSCAN', 'SORT'}:
+            failures.append((args, sorted(stages)))
+    assert not failures
+
+
+@pytest.mark.parametrize('sort', list(SORT_FIELDS))
+def test_sorted_set_listing_uses_the_set_index(plan_db, sort):
+    card_query = build_card_query({'set': SAMPLE_FILTERS['set'], 'sort': sort}, USER_ID)
+    key_patterns = list(plan_values(winning_plan(plan_db, card_query), 'keyPattern'))
+    assert key_patterns and all('set' in pattern for pattern in key_patterns)
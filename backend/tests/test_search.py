@@ -0,0 +1,149 @@
+"""
+Card search: prefix autocomplete runs on mongomock; relevance-ranked text
+search needs a MongoDB server at MONGODB_URI (skipped without one, unless
+REQUIRE_MONGODB is set).
+"""
+
+import os
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+import card_search
+from catalog import catalog_cache
+from config import get_config
+from database import create_indexes
+
+config = get_config()
+
+CARDS = [
+    {'name': 'Pikachu', 'set': 'Base Set', 'card_number': '58', 'notes': 'Yellow cheeks'},
+    {'name': 'Pichu', 'set': 'Neo Genesis', 'card_number': '12'},
+    {'name': 'Pidgey', 'set': 'Base Set', 'card_number': '57', 'tags': ['bird']},
+    {'name': 'Flabébé', 'set': 'Flashfire', 'card_number': '64'},
+    {'name': 'Mr. Mime', 'set': 'Jungle', 'card_number': '6', 'notes': 'Trade bait for a pikachu'},
+    {'name': 'Raichu', 'set': 'Base Set', 'card_number': '14'},
+]
+
+
+@pytest.fixture
+def cards(client, auth_headers):
+    return [client.post('/api/cards', json=card, headers=auth_headers).get_json() for card in CARDS]
+
+
+def search(client, auth_headers, **params):
+    response = client.get('/api/cards/search', query_string=params, headers=auth_headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def names(body):
+    return [card['name'] for card in body['cards']]
+
+
+def test_normalize_folds_case_accents_and_spacing():
+    assert card_search.normalize('  Flabébé   EX ') == 'flabebe ex'
+    assert card_search.normalize(None) == ''
+
+
+def test_prefix_matches_normalized_names_in_order(client, auth_headers, cards):
+    assert names(search(client, auth_headers, q='PI', mode='prefix')) == ['Pichu', 'Pidgey', 'Pikachu']
+    assert names(search(client, auth_headers, q='flabe', mode='prefix')) == ['Flabébé']
+
+
+def test_prefix_is_literal(client, auth_headers, cards):
+    assert names(search(client, auth_headers, q='mr. m', mode='prefix')) == ['Mr. Mime']
+    assert names(search(client, auth_headers, q='.', mode='prefix')) == []
+
+
+def test_prefix_on_set(client, auth_headers, cards):
+    body = search(client, auth_headers, q='base', mode='prefix', field='set')
+    assert sorted(names(body)) == ['Pidgey', 'Pikachu', 'Raichu']
+
+
+def test_prefix_pages_without_gaps(client, auth_headers, cards):
+    seen, after = [], None
+    while True:
+        params = dict(q='p', mode='prefix', limit=1, **({'after': after} if after else {}))
+        body = search(client, auth_headers, **params)
+        seen += names(body)
+        after = body['next_cursor']
+        if not after:
+            break
+    assert seen == ['Pichu', 'Pidgey', 'Pikachu']
+
+
+def test_results_hide_normalized_fields(client, auth_headers, cards):
+    card = search(client, auth_headers, q='raichu', mode='prefix')['cards'][0]
+    assert card['set'] == 'Base Set'
+    assert not set(card) & set(card_search.SEARCH_FIELDS.values())
+    listed = client.get('/api/cards', headers=auth_headers).get_json()['cards']
+    assert not any(set(card) & set(card_search.SEARCH_FIELDS.values()) for card in listed)
+
+
+def test_prefix_follows_renames_and_owner(client, auth_headers, other_headers, cards):
+    client.put(f"/api/cards/{cards[5]['_id']}", json={'name': 'Alolan Raichu'}, headers=auth_headers)
+    assert names(search(client, auth_headers, q='alolan', mode='prefix')) == ['Alolan Raichu']
+    assert names(search(client, auth_headers, q='rai', mode='prefix')) == []
+    assert names(search(client, other_headers, q='pi', mode='prefix')) == []
+
+
+@pytest.mark.parametrize('params', [
+    {}, {'q': ' '}, {'q': 'pi', 'mode': 'fuzzy'}, {'q': 'pi', 'mode': 'prefix', 'field': 'notes'},
+    {'q': 'pi', 'offset': 'x'}, {'q': 'pi', 'mode': 'prefix', 'after': 'garbage'},
+])
+def test_bad_requests(client, auth_headers, params):
+    assert client.get('/api/cards/search', query_string=params, headers=auth_headers).status_code == 400
+
+
+def test_backfill_adds_missing_search_fields(mock_db, user_id):
+    mock_db.cards.insert_one({'user_id': user_id, 'name': 'Ho-Oh', 'set': 'Neo Revelation'})
+    assert card_search.backfill_search_fields(mock_db) == 1
+    card = mock_db.cards.find_one({'name': 'Ho-Oh'})
+    assert (card['name_lc'], card['set_lc']) == ('ho-oh', 'neo revelation')
+    assert card_search.backfill_search_fields(mock_db) == 0
+
+
+@pytest.fixture
+def live_db(monkeypatch):
+    import database
+    client = MongoClient(config.MONGODB_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        client.close()
+        if os.environ.get('REQUIRE_MONGODB'):
+            pytest.fail('REQUIRE_MONGODB is set but no MongoDB server is reachable at MONGODB_URI')
+        pytest.skip('No MongoDB server reachable at MONGODB_URI')
+
+    db = client[f'{config.DATABASE_NAME}_search']
+    client.drop_database(db.name)
+    create_indexes(db)
+    monkeypatch.setattr(database, 'client', client)
+    monkeypatch.setattr(database, 'db', db)
+    monkeypatch.setattr(database, 'client_pid', os.getpid())
+    catalog_cache.clear()
+    yield db
+    catalog_cache.clear()
+    client.drop_database(db.name)
+    client.close()
+
+
+def test_text_search_is_ranked_and_paged(live_db):
+    from app import app
+    from auth import create_token
+    client = app.test_client()
+    user_id = str(live_db.users.insert_one({'username': 'searcher', 'password': 'unused'}).inserted_id)
+    headers = {'Authorization': f'Bearer {create_token(user_id)}'}
+    for card in CARDS:
+        client.post('/api/cards', json=card, headers=headers)
+
+    # A name match outweighs a mention in the notes
+    body = search(client, headers, q='pikachu', limit=1)
+    assert names(body) == ['Pikachu']
+    assert body['next_offset'] == 1
+    body = search(client, headers, q='pikachu', limit=1, offset=1)
+    assert names(body) == ['Mr. Mime']
+    assert body['next_offset'] is None
+    assert names(search(client, headers, q='bird')) == ['Pidgey']
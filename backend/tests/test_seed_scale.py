@@ -0,0 +1,105 @@
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import auth
+import seed_demo_data
+from data_access import card_field_error
+
+
+def scale_args(**overrides):
+    args = dict(users=7, cards_per_user=4, binders_per_user=2, prefix='seed-user-', password='seed123',
+                distinct_passwords=2, workers=2, batch_size=5, rebuild_indexes=False, clear=False, seed=1)
+    args.update(overrides)
+    return Namespace(**args)
+
+
+@pytest.fixture
+def worker_db(mock_db, monkeypatch):
+    monkeypatch.setattr(seed_demo_data, '_worker_db', mock_db)
+    return mock_db
+
+
+@pytest.fixture
+def in_process_pool(mock_db, monkeypatch):
+    """Run seed_scale_data's pool on threads against mock_db; mongomock cannot cross processes"""
+    class Pool(ThreadPoolExecutor):
+        def __init__(self, workers, mp_context=None, initializer=None, initargs=()):
+            super().__init__(workers)
+
+    monkeypatch.setattr(seed_demo_data, 'ProcessPoolExecutor', Pool)
+    monkeypatch.setattr(seed_demo_data, 'connect_db', lambda: mock_db)
+    monkeypatch.setattr(seed_demo_data, '_worker_db', mock_db)
+    monkeypatch.setattr(auth.config, 'BCRYPT_ROUNDS', 4)
+
+
+def chunk(first, last, batch_size=5, seed=1):
+    return (first, last, 'seed-user-', ['hash-a', 'hash-b'], 4, 2, batch_size, seed)
+
+
+def test_chunk_writes_valid_linked_cards(worker_db, monkeypatch):
+    batches = []
+    insert_many = worker_db.cards.insert_many
+
+    def recording_insert_many(documents, ordered=True):
+        batches.append((len(documents), ordered))
+        return insert_many(documents, ordered=ordered)
+
+    monkeypatch.setattr(worker_db.cards, 'insert_many', recording_insert_many)
+    assert seed_demo_data._seed_chunk(chunk(0, 3)) == {'users': 3, 'cards': 12, 'binders': 6}
+    assert batches == [(5, False), (5, False), (2, False)]
+
+    for card in worker_db.cards.find():
+        assert card_field_error(card) is None
+        assert worker_db.catalog.find_one({'_id': card['catalog_id']})
+    assert [user['password'] for user in worker_db.users.find().sort('username')] == ['hash-a', 'hash-b', 'hash-a']
+
+
+def test_binders_only_hold_their_owners_cards(worker_db):
+    seed_demo_data._seed_chunk(chunk(0, 3))
+    for binder in worker_db.binders.find():
+        owned = {str(card['_id']) for card in worker_db.cards.find({'user_id': binder['user_id']}, {'_id': 1})}
+        assert set(binder['cells'].values()) <= owned
+        assert binder['version'] == 0
+
+
+def test_chunks_are_reproducible(mock_db, monkeypatch):
+    def values(seed):
+        mock_db.users.delete_many({})
+        mock_db.cards.delete_many({})
+        monkeypatch.setattr(seed_demo_data, '_worker_db', mock_db)
+        seed_demo_data._seed_chunk(chunk(3, 5, seed=seed))
+        return [(card['estimated_value'], card['quantity']) for card in mock_db.cards.find().sort('_id')]
+
+    assert values(1) == values(1)
+    assert values(1) != values(2)
+
+
+def test_scale_run_hashes_each_password_once(in_process_pool, mock_db, monkeypatch):
+    hashed = []
+    hash_password = auth.hash_password
+    monkeypatch.setattr(auth, 'hash_password', lambda password: hashed.append(password) or hash_password(password))
+
+    seed_demo_data.seed_scale_data(scale_args())
+    assert sorted(hashed) == ['seed1230', 'seed1231']
+    assert mock_db.users.count_documents({}) == 7
+    assert mock_db.cards.count_documents({}) == 28
+    assert mock_db.binders.count_documents({}) == 14
+    assert len({user['password'] for user in mock_db.users.find()}) == 2
+
+
+def test_scale_run_rebuilds_indexes(in_process_pool, mock_db):
+    seed_demo_data.seed_scale_data(scale_args(rebuild_indexes=True))
+    assert 'cards_text' in mock_db.cards.index_information()
+
+
+def test_clear_removes_an_earlier_run(in_process_pool, mock_db):
+    mock_db.users.insert_one({'username': 'keep-me'})
+    seed_demo_data.seed_scale_data(scale_args())
+    with pytest.raises(SystemExit):
+        seed_demo_data.seed_scale_data(scale_args())
+
+    seed_demo_data.seed_scale_data(scale_args(users=2, clear=True))
+    assert mock_db.users.count_documents({}) == 3
+    assert mock_db.cards.count_documents({}) == 8
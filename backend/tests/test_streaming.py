@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def cards(client, auth_headers):
+    for i, value in enumerate([30.0, 10.0, 20.0]):
+        response = client.post('/api/cards', json={
+            'name': f'Card {i}', 'set': 'Base Set', 'card_number': str(i), 'estimated_value': value,
+        }, headers=auth_headers)
+        assert response.status_code == 201
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('query', [
+    '', '?fields=name', '?fields=name&sort=value', '?fields=set&sort=name&order=desc', '?sort=value&limit=2',
+])
+def test_ndjson_matches_json_listing(client, auth_headers, cards, query):
+    listed = client.get(f'/api/cards{query}', headers=auth_headers).get_json()['cards']
+    streamed = client.get(f'/api/cards{query}', headers=dict(auth_headers, Accept='application/x-ndjson'))
+    assert streamed.status_code == 200
+    assert streamed.mimetype == 'application/x-ndjson'
+    assert ndjson(streamed) == listed
+
+
+def test_ndjson_projection_omits_paging_fields(client, auth_headers, cards):
+    response = client.get('/api/cards?fields=name&sort=value&stream=1', headers=auth_headers)
+    streamed = ndjson(response)
+    assert [card['name'] for card in streamed] == ['Card 1', 'Card 2', 'Card 0']
+    assert all(set(card) == {'_id', 'name'} for card in streamed)
+
+
+def test_binder_listing_streams(client, auth_headers):
+    for name in ['First', 'Second']:
+        client.post('/api/binders', json={'name': name, 'rows': 3, 'columns': 3}, headers=auth_headers)
+    listed = client.get('/api/binders', headers=auth_headers).get_json()
+    streamed = client.get('/api/binders?stream=1', headers=auth_headers)
+    assert ndjson(streamed) == listed['binders']
+
+
+@pytest.mark.parametrize('query', ['?fields=name&sort=value', '?fields=set&sort=name&order=desc'])
+def test_asgi_ndjson_matches_json_listing(asgi_client, auth_headers, cards, query):
+    listed = asgi_client.get(f'/api/cards{query}', headers=auth_headers).json()['cards']
+    streamed = asgi_client.get(f'/api/cards{query}&stream=1', headers=auth_headers)
+    assert streamed.status_code == 200
+    assert [json.loads(line) for line in streamed.text.splitlines()] == listed
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+import delta_sync
+from config import Config
+from database import create_indexes
+
+
+@pytest.fixture
+def card_ids(client, auth_headers, mock_db):
+    ids = [client.post('/api/cards', json={'name': f'Card {n}', 'set': 'Gym Heroes', 'card_number': str(n)},
+                       headers=auth_headers).get_json()['_id'] for n in range(3)]
+    # Age the seed data past the safety window, so only later writes are "recent"
+    mock_db.cards.update_many({}, {'$set': {'updated_at': datetime.utcnow() - timedelta(minutes=1)}})
+    return ids
+
+
+def sync(client, headers, **params):
+    response = client.get('/api/sync', query_string=params, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_full_sync_then_only_changes(client, auth_headers, card_ids):
+    body = sync(client, auth_headers)
+    assert sorted(card['_id'] for card in body['cards']) == sorted(card_ids)
+    assert body['cards'][0]['name'].startswith('Card')
+    assert 'name_lc' not in body['cards'][0]
+    assert body['has_more'] is False
+
+    client.put(f'/api/cards/{card_ids[0]}', json={'notes': 'signed'}, headers=auth_headers)
+    client.delete(f'/api/cards/{card_ids[1]}', headers=auth_headers)
+    binder_id = client.post('/api/binders', json={'name': 'New', 'rows': 1, 'columns': 1},
+                            headers=auth_headers).get_json()['_id']
+
+    body = sync(client, auth_headers, since=body['next_token'])
+    assert [card['_id'] for card in body['cards']] == [card_ids[0]]
+    assert body['cards'][0]['notes'] == 'signed'
+    assert [binder['_id'] for binder in body['binders']] == [binder_id]
+    assert body['deleted'] == {'cards': [card_ids[1]], 'binders': []}
+
+
+def test_binder_deletes_leave_tombstones(client, auth_headers, card_ids):
+    binder_id = client.post('/api/binders', json={'name': 'Old', 'rows': 1, 'columns': 1},
+                            headers=auth_headers).get_json()['_id']
+    token = sync(client, auth_headers)['next_token']
+    client.delete(f'/api/binders/{binder_id}', headers=auth_headers)
+    assert sync(client, auth_headers, since=token)['deleted']['binders'] == [binder_id]
+
+
+def test_pages_until_has_more_is_false(client, auth_headers, card_ids):
+    seen, token = [], None
+    while True:
+        body = sync(client, auth_headers, limit=2, **({'since': token} if token else {}))
+        seen += [card['_id'] for card in body['cards']]
+        token = body['next_token']
+        if not body['has_more']:
+            break
+    assert sorted(seen) == sorted(card_ids)
+
+
+def test_other_users_changes_are_not_synced(client, auth_headers, other_headers, card_ids):
+    assert sync(client, other_headers)['cards'] == []
+    token = sync(client, other_headers)['next_token']
+    client.delete(f'/api/cards/{card_ids[0]}', headers=auth_headers)
+    assert sync(client, other_headers, since=token)['deleted'] == {'cards': [], 'binders': []}
+
+
+def test_token_older_than_tombstones_is_gone(client, auth_headers):
+    expired = datetime.utcnow() - timedelta(seconds=Config.SYNC_TOMBSTONE_TTL + 60)
+    token = delta_sync.encode_token({'cards': None, 'binders': None, 'deleted': (expired, None)})
+    response = client.get('/api/sync', query_string={'since': token}, headers=auth_headers)
+    assert response.status_code == 410
+    assert response.get_json()['full_sync'] is True
+
+
+@pytest.mark.parametrize('token', ['garbage', delta_sync.encode_token({'cards': None})])
+def test_malformed_token_is_a_bad_request(client, auth_headers, token):
+    assert client.get('/api/sync', query_string={'since': token}, headers=auth_headers).status_code == 400
+
+
+def test_token_round_trips():
+    positions = {'cards': (datetime(2024, 5, 1, 12, 0, 0, 123000), ObjectId()), 'binders': None,
+                 'deleted': (datetime(2024, 5, 1), None)}
+    assert delta_sync.decode_token(delta_sync.encode_token(positions)) == positions
+
+
+def test_tombstones_expire(mock_db):
+    create_indexes(mock_db)
+    index = next(index for index in mock_db.tombstones.index_information().values()
+                 if index['key'] == [('deleted_at', 1)])
+    assert index['expireAfterSeconds'] == Config.SYNC_TOMBSTONE_TTL
+
+
+def test_migrate_converts_iso_timestamps(mock_db, user_id):
+    card_id = mock_db.cards.insert_one({
+        'user_id': user_id, 'created_at': '2024-01-02T03:04:05Z', 'updated_at': '2024-02-03T04:05:06.123',
+    }).inserted_id
+    binder_id = mock_db.binders.insert_one({'user_id': user_id, 'created_at': '2024-01-02T03:04:05'}).inserted_id
+
+    assert delta_sync.migrate_timestamps(mock_db) == 2
+    card = mock_db.cards.find_one({'_id': card_id})
+    assert card['created_at'] == datetime(2024, 1, 2, 3, 4, 5)
+    assert card['updated_at'] == datetime(2024, 2, 3, 4, 5, 6, 123000)
+    assert mock_db.binders.find_one({'_id': binder_id})['updated_at'] == datetime(2024, 1, 2, 3, 4, 5)
+    assert delta_sync.migrate_timestamps(mock_db) == 0
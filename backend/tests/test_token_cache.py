@@ -0,0 +1,51 @@
+import time
+
+import jwt
+import pytest
+
+import auth
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+
+
+def test_verified_payload_is_reused(monkeypatch, user_id):
+    token = auth.create_token(user_id)
+    assert auth.verify_token(token)['user_id'] == user_id
+
+    def decode(*args, **kwargs):
+        raise AssertionError('cached tokens are not decoded again')
+
+    monkeypatch.setattr(auth.jwt, 'decode', decode)
+    assert auth.verify_token(token)['user_id'] == user_id
+
+
+def test_invalid_tokens_are_not_cached(user_id):
+    forged = jwt.encode({'user_id': user_id, 'exp': time.time() + 60}, 'not-the-secret-' * 3, algorithm='HS256')
+    assert auth.verify_token(forged) is None
+    assert auth.verify_token(forged) is None
+    assert auth.token_cache.stats()['size'] == 0
+
+
+def test_payload_is_not_kept_past_its_expiry(user_id):
+    token = jwt.encode({'user_id': user_id, 'exp': int(time.time()) + 1}, auth.config.JWT_SECRET_KEY, algorithm='HS256')
+    assert auth.verify_token(token) is not None
+    time.sleep(1.1)
+    assert auth.verify_token(token) is None
+
+
+@pytest.mark.parametrize('header, status', [(None, 401), ('Bearer', 401), ('Bearer garbage', 401)])
+def test_protected_routes_reject_bad_tokens(client, header, status):
+    headers = {'Authorization': header} if header else {}
+    assert client.get('/api/auth/me', headers=headers).status_code == status
+
+
+def test_me_is_served_from_the_user_cache(client, auth_headers, mongo_calls):
+    first = client.get('/api/auth/me', headers=auth_headers)
+    second = client.get('/api/auth/me', headers=auth_headers)
+    assert first.get_json() == second.get_json()
+    assert first.get_json()['user']['username'] == 'tester'
+    assert mongo_calls.count(('users', 'find_one')) == 1
@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+import uploads
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+@pytest.fixture
+def small_uploads(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads.config, 'UPLOAD_DIR', str(tmp_path))
+    monkeypatch.setattr(uploads.config, 'UPLOAD_MAX_BYTES', 1024)
+    monkeypatch.setattr(uploads, 'schedule_thumbnails', lambda path, digest: None)
+
+
+def test_oversized_multipart_is_rejected_before_parsing(client, auth_headers, small_uploads, monkeypatch):
+    parsed = []
+    monkeypatch.setattr(uploads, 'store', lambda stream: parsed.append(stream))
+    body = PNG + b'\x00' * (uploads.request_limit() + 1)
+    response = client.post('/api/upload', data={'file': (io.BytesIO(body), 'card.png')}, headers=auth_headers)
+    assert response.status_code == 413
+    assert not parsed
+
+
+def test_oversized_raw_body_is_rejected(client, auth_headers, small_uploads):
+    body = PNG + b'\x00' * (uploads.request_limit() + 1)
+    response = client.post('/api/upload', data=body, content_type='image/png', headers=auth_headers)
+    assert response.status_code == 413
+
+
+def test_upload_within_limit_is_stored_once(client, auth_headers, small_uploads):
+    first = client.post('/api/upload', data={'file': (io.BytesIO(PNG), 'card.png')}, headers=auth_headers)
+    second = client.post('/api/upload', data=PNG, content_type='image/png', headers=auth_headers)
+    assert first.status_code == 201
+    assert second.status_code == 200
+    assert second.get_json()['deduplicated'] is True
+    assert first.get_json()['url'] == second.get_json()['url']
+
+
+def test_bulk_import_is_not_capped_by_the_upload_limit(client, auth_headers, small_uploads):
+    rows = ''.join(f'Card {i},Base Set,{i}\n' for i in range(200))
+    response = client.post(
+        '/api/cards/bulk', data='name,set,card_number\n' + rows, content_type='text/csv', headers=auth_headers
+    )
+    assert response.status_code == 201
+    assert response.get_json()['inserted'] == 200
@@ -0,0 +1,201 @@
+"""
+Content-addressed storage for uploaded card images, with thumbnails.
+
+An upload is streamed to a temporary file in chunks while its SHA-256 is
+computed, then moved to originals/<aa>/<bb>/<digest>.<ext>; uploading the
+same bytes again finds the file already there and stores nothing. Files
+never change once written, so they can be served with year-long immutable
+cache headers and the digest as a strong ETag.
+
+Thumbnails at each UPLOAD_THUMBNAIL_SIZES width are rendered to WebP by a
+process pool after the upload has been answered, so request workers never
+spend time decoding or resizing. They need Pillow (in requirements.txt);
+without it uploads still work, thumbnail URLs redirect to the full-size
+original, and a warning is logged at startup.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from config import get_config
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - exercised only without Pillow
+    Image = None
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+if Image is None:
+    logger.warning("Pillow is not installed: card image thumbnails are disabled and serve the full-size original")
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_MIMETYPE = 'image/webp'
+
+# extension -> (mimetype, magic-number check on the first bytes)
+IMAGE_TYPES = {
+    'jpg': ('image/jpeg', lambda head: head.startswith(b'\xff\xd8\xff')),
+    'png': ('image/png', lambda head: head.startswith(b'\x89PNG\r\n\x1a\n')),
+    'gif': ('image/gif', lambda head: head[:6] in (b'GIF87a', b'GIF89a')),
+    'webp': ('image/webp', lambda head: head[:4] == b'RIFF' and head[8:12] == b'WEBP'),
+}
+
+
+class UploadError(ValueError):
+    """Raised when an upload is rejected; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# Room for the multipart boundaries and part headers around an image
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def request_limit() -> int:
+    """Largest upload request body, enforced before any of it is parsed or spooled"""
+    return config.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD
+
+
+def thumbnail_sizes() -> list:
+    return sorted(int(size) for size in config.UPLOAD_THUMBNAIL_SIZES.split(',') if size.strip())
+
+
+def is_digest(value: str) -> bool:
+    return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+def _sniff(head: bytes):
+    for extension, (_, matches) in IMAGE_TYPES.items():
+        if matches(head):
+            return extension
+    return None
+
+
+def original_path(digest: str, extension: str) -> str:
+    return os.path.join(config.UPLOAD_DIR, 'originals', digest[:2], digest[2:4], f'{digest}.{extension}')
+
+
+def thumbnail_path(digest: str, size: int) -> str:
+    return os.path.join(config.UPLOAD_DIR, 'thumbnails', digest[:2], digest[2:4], f'{digest}_{size}.webp')
+
+
+def find_original(digest: str):
+    """Return (path, mimetype) of a stored original, or (None, None)"""
+    for extension, (mimetype, _) in IMAGE_TYPES.items():
+        path = original_path(digest, extension)
+        if os.path.exists(path):
+            return path, mimetype
+    return None, None
+
+
+def store(stream) -> dict:
+    """Stream an upload to content-addressed storage
+
+    Returns {'digest', 'path', 'mimetype', 'size', 'created'}; created
+    is False when identical bytes were already stored. Raises UploadError
+    for empty, oversized or non-image bodies.
+    """
+    temp_dir = os.path.join(config.UPLOAD_DIR, 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > config.UPLOAD_MAX_BYTES:
+                    raise UploadError(f'Uploads are limited to {config.UPLOAD_MAX_BYTES} bytes', 413)
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                digest.update(chunk)
+                out.write(chunk)
+
+        if size == 0:
+            raise UploadError('Upload is empty')
+        extension = _sniff(head)
+        if extension is None:
+            raise UploadError(f"Unsupported image type; expected one of {', '.join(IMAGE_TYPES)}", 415)
+
+        digest = digest.hexdigest()
+        path = original_path(digest, extension)
+        created = not os.path.exists(path)
+        if created:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic, so a concurrent upload of the same bytes or a reader never sees a partial file
+            os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+    return {
+        'digest': digest,
+        'path': path,
+        'mimetype': IMAGE_TYPES[extension][0],
+        'size': size,
+        'created': created,
+    }
+
+
+def make_thumbnails(source: str, digest: str, sizes: list) -> list:
+    """Render the missing thumbnails of one image (runs in a pool process)"""
+    missing = [size for size in sizes if not os.path.exists(thumbnail_path(digest, size))]
+    if not missing:
+        return []
+
+    with Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding when the largest thumbnail allows it
+        image.draft('RGB', (max(missing), max(missing) * 2))
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        # Largest first, each resized from the previous one
+        for size in sorted(missing, reverse=True):
+            if image.width > size:
+                image = image.resize((size, max(1, round(image.height * size / image.width))), Image.LANCZOS)
+            path = thumbnail_path(digest, size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            image.save(temp_path, 'WEBP', quality=config.UPLOAD_THUMBNAIL_QUALITY)
+            os.replace(temp_path, path)
+    return missing
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: the pool processes must not inherit this process's MongoClient or threads
+            _executor = ProcessPoolExecutor(
+                max_workers=config.UPLOAD_THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Thumbnail error: {str(error)}")
+
+
+def schedule_thumbnails(path: str, digest: str) -> bool:
+    """Queue thumbnail rendering for a stored original; returns False without Pillow"""
+    if Image is None:
+        return False
+    future = _get_executor().submit(make_thumbnails, path, digest, thumbnail_sizes())
+    future.add_done_callback(_log_failure)
+    return True
@@ -0,0 +1,73 @@
+"""
+Per-user change counters backing conditional GETs.
+
+Every card or binder mutation bumps the user's counter for that collection
+in `collection_versions`. List endpoints derive a strong ETag from the
+counter and answer If-None-Match with 304 before touching the collection.
+"""
+
+from flask import Response, request
+from mongo_ops import call, run
+import hashlib
+
+CARDS = 'cards'
+BINDERS = 'binders'
+
+
+def bump_ops(user_id, kind: str):
+    """Record that the user's cards or binders changed"""
+    yield call('collection_versions', 'update_one', {'_id': user_id}, {'$inc': {kind: 1}}, upsert=True)
+
+
+def bump(db, user_id, kind: str):
+    run(bump_ops(user_id, kind), db)
+
+
+def current_ops(user_id, kind: str):
+    """Return the user's current counter for cards or binders"""
+    doc = yield call('collection_versions', 'find_one', {'_id': user_id}, {kind: 1})
+    return doc.get(kind, 0) if doc else 0
+
+
+def current(db, user_id, kind: str) -> int:
+    return run(current_ops(user_id, kind), db)
+
+
+def make_etag(kind: str, version: int, query_string: str, accept: str, accept_encoding: str) -> str:
+    """Build a collection ETag from its counter and the request details that change the body"""
+    variant = '|'.join([query_string, accept, accept_encoding])
+    variant = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:12]
+    return f'{kind}-{version}-{variant}'
+
+
+def request_etag(db, user_id, kind: str) -> str:
+    """Build the ETag for the current request's representation of a collection
+
+    The query string, Accept and Accept-Encoding headers are folded in, so
+    each page, field projection, streaming mode or compressed encoding gets
+    its own tag.
+    """
+    return make_etag(
+        kind,
+        current(db, user_id, kind),
+        request.query_string.decode('utf-8', 'replace'),
+        request.headers.get('Accept', ''),
+        request.headers.get('Accept-Encoding', ''),
+    )
+
+
+def not_modified(etag: str) -> bool:
+    """Check the request's If-None-Match against an ETag"""
+    return request.if_none_match.contains(etag)
+
+
+def not_modified_response(etag: str) -> Response:
+    """Empty 304 reply for a client that already holds the current representation"""
+    return tag_response(Response(status=304), etag)
+
+
+def tag_response(response, etag: str):
+    """Attach the ETag and make clients revalidate before reusing the body"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response